@@ -1,16 +1,38 @@
 # app/backup_logs.py
-from typing import Optional, List
-from datetime import datetime, timezone
+from typing import Optional, List, Literal, Tuple
+from datetime import date, datetime, timedelta, timezone
 from pydantic import BaseModel, Field
-from fastapi import APIRouter
-from redis import Redis
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response
+from redis.asyncio import Redis
+import os
 import json
+import time
+
+from app.metrics import redis_timed
+from app.backup_stats import APPLY_LUA, STATS_KEY, STATS_INDEX_KEY, rollup_ops, aggregate
 
 # Si la API corre en Windows (fuera de Docker), deja "localhost".
 # Si la API estuviera en un contenedor del mismo compose, usa host="redis".
 r = Redis(host="localhost", port=6379, db=0, decode_responses=True)
 
-BACKUP_LOG_KEY = "backups:logs"
+BACKUP_LOG_KEY = "backups:logs"   # lista de la versión anterior (se migra al arrancar)
+
+# Índices: sorted sets con score 0 y miembro "<epoch ms, 13 dígitos>|<id>", así el
+# orden lexicográfico es el temporal y ZRANGE BYLEX resuelve rangos de tiempo y
+# cursores en O(log n). Uno general y uno por stanza, por tipo y por stanza+tipo.
+# El documento JSON vive en un hash indexado por el mismo miembro.
+DATA_KEY = "backups:logs:data"
+IDS_KEY = "backups:logs:ids"      # <stanza>|<id> -> miembro (idempotencia)
+INDEX_KEY = "backups:logs:idx"
+
+# Retención: cantidad máxima de entradas (0 = sin límite) y antigüedad en días (0 = sin límite)
+BACKUP_LOG_MAX = int(os.getenv("BACKUP_LOG_MAX", "500"))
+BACKUP_LOG_RETENTION_DAYS = float(os.getenv("BACKUP_LOG_RETENTION_DAYS", "0"))
+MAX_PAGE = 1000
+MAX_BULK = int(os.getenv("BACKUP_LOG_MAX_BULK", "5000"))   # entradas por POST /backup/logs/bulk
+BULK_PIPELINE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
 
 class BackupLogIn(BaseModel):
     when: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
@@ -29,28 +51,257 @@ class BackupLogIn(BaseModel):
 class BackupLogOut(BackupLogIn):
     id: str
 
-router = APIRouter(prefix="/backup", tags=["backup-logs"])
+HIDDEN = ("wal_start", "wal_stop")   # no se exponen en las respuestas
+
+
+def _index_key(stanza: Optional[str] = None, type_: Optional[str] = None) -> str:
+    if stanza is not None and type_ is not None:
+        return f"{INDEX_KEY}:stanza:{stanza}:type:{type_}"
+    if stanza is not None:
+        return f"{INDEX_KEY}:stanza:{stanza}"
+    if type_ is not None:
+        return f"{INDEX_KEY}:type:{type_}"
+    return INDEX_KEY
+
+def _ms_key(ms: int) -> str:
+    return f"{max(ms, 0):013d}"
+
+def _log_id(entry: BackupLogIn) -> str:
+    return f"{int(entry.when.timestamp())}:{entry.label or entry.type}"
+
+def _member(entry: BackupLogIn, log_id: str) -> str:
+    return f"{_ms_key(int(entry.when.timestamp() * 1000))}|{entry.stanza}|{log_id}"
 
-@router.post("/log", response_model=BackupLogOut, response_model_exclude={"wal_start", "wal_stop"})
-def push_backup_log(entry: BackupLogIn):
-    base = int(entry.when.timestamp())
-    suffix = entry.label or entry.type
-    log_id = f"{base}:{suffix}"
 
-    payload = entry.model_dump()
+# Alta + agregados + retención en un solo viaje y de forma atómica. La llave de
+# idempotencia es <stanza>|<id>: si ya existe no se escribe nada y se devuelve lo
+# guardado (un reintento no duplica el log ni los agregados). Las entradas que
+# salen por retención se quitan de todos sus índices (stanza/tipo se leen del JSON
+# guardado); los agregados de backup_stats se conservan.
+# KEYS: data, ids, idx general, idx stanza, idx tipo, idx stanza+tipo
+# ARGV: miembro, json, máximo de entradas, miembro de corte por antigüedad ('' = no),
+#       hash de agregados, miembro del índice de agregados, operaciones (JSON),
+#       llave de idempotencia
+# Devuelve {1 si es nueva / 0 si ya estaba, json guardado}
+_ADD_LUA = APPLY_LUA + """
+local prev = redis.call('HGET', KEYS[2], ARGV[8])
+if prev then return {0, redis.call('HGET', KEYS[1], prev) or ARGV[2]} end
+redis.call('HSET', KEYS[2], ARGV[8], ARGV[1])
+apply_rollup(ARGV[5], cjson.decode(ARGV[7]))
+redis.call('ZADD', '""" + STATS_INDEX_KEY + """', 0, ARGV[6])
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+for i = 3, #KEYS do redis.call('ZADD', KEYS[i], 0, ARGV[1]) end
+local old = {}
+if ARGV[4] ~= '' then old = redis.call('ZRANGEBYLEX', KEYS[3], '-', '(' .. ARGV[4]) end
+local max = tonumber(ARGV[3])
+if max > 0 then
+  local extra = redis.call('ZCARD', KEYS[3]) - #old - max
+  if extra > 0 then
+    for _, m in ipairs(redis.call('ZRANGE', KEYS[3], #old, #old + extra - 1)) do table.insert(old, m) end
+  end
+end
+for _, m in ipairs(old) do
+  local doc = redis.call('HGET', KEYS[1], m)
+  if doc then
+    local d = cjson.decode(doc)
+    local s = KEYS[3] .. ':stanza:' .. d.stanza
+    redis.call('ZREM', s, m)
+    redis.call('ZREM', KEYS[3] .. ':type:' .. d.type, m)
+    redis.call('ZREM', s .. ':type:' .. d.type, m)
+    redis.call('HDEL', KEYS[2], d.stanza .. '|' .. d.id)
+  end
+  redis.call('HDEL', KEYS[1], m)
+  redis.call('ZREM', KEYS[3], m)
+end
+return {1, ARGV[2]}
+"""
+_add_script = r.register_script(_ADD_LUA)
+
+
+def _cutoff() -> str:
+    if BACKUP_LOG_RETENTION_DAYS <= 0:
+        return ""
+    return _ms_key(int((time.time() - BACKUP_LOG_RETENTION_DAYS * 86400) * 1000))
+
+def _add_call(entry: BackupLogIn, cutoff: str, client=None):
+    """Corutina del evalsha de alta; con client=pipeline solo lo encola."""
+    log_id = _log_id(entry)
+    payload = entry.model_dump(mode="json")   # fechas en ISO, listas para devolver tal cual
     payload["id"] = log_id
+    keys = [DATA_KEY, IDS_KEY, INDEX_KEY, _index_key(entry.stanza), _index_key(type_=entry.type),
+            _index_key(entry.stanza, entry.type)]
+    member = _member(entry, log_id)
+    stats_key, stats_member, ops = rollup_ops(payload, entry.when, member.split("|", 1)[0])
+    args = [member, json.dumps(payload), BACKUP_LOG_MAX, cutoff, stats_key, stats_member,
+            json.dumps(ops), f"{entry.stanza}|{log_id}"]
+    return _add_script(keys=keys, args=args, client=client)
 
-    r.lpush(BACKUP_LOG_KEY, json.dumps(payload, default=str))
-    r.ltrim(BACKUP_LOG_KEY, 0, 499)
-    return BackupLogOut(**payload)
+async def _store(entry: BackupLogIn) -> Tuple[bool, dict]:
+    """Guarda una entrada; devuelve (es_nueva, documento guardado)."""
+    new, doc = await redis_timed("evalsha:add", _add_call(entry, _cutoff()))
+    return bool(int(new)), json.loads(doc)
+
+async def store_many(entries: List[BackupLogIn]) -> List[Tuple[bool, dict]]:
+    """Como _store, pero en pipelines de BULK_PIPELINE entradas (un viaje por bloque)."""
+    out = []
+    cutoff = _cutoff()
+    for i in range(0, len(entries), BULK_PIPELINE):
+        pipe = r.pipeline(transaction=False)
+        for entry in entries[i:i + BULK_PIPELINE]:
+            await _add_call(entry, cutoff, client=pipe)   # solo encola (carga el script si hace falta)
+        for new, doc in await redis_timed("pipeline:evalsha:add", pipe.execute()):
+            out.append((bool(int(new)), json.loads(doc)))
+    return out
 
-@router.get("/logs", response_model=List[BackupLogOut], response_model_exclude={"wal_start", "wal_stop"})
-def list_backup_logs(limit: int = 50):
-    items = r.lrange(BACKUP_LOG_KEY, 0, max(limit, 1) - 1)
-    out: List[BackupLogOut] = []
-    for it in items:
+
+async def migrate_legacy_logs():
+    """Pasa las entradas de la lista anterior (LPUSH/LTRIM) a los índices y la borra."""
+    items = await r.lrange(BACKUP_LOG_KEY, 0, -1)
+    entries = []
+    for it in reversed(items):   # de la más vieja a la más nueva
         try:
-            out.append(BackupLogOut(**json.loads(it)))
+            entries.append(BackupLogIn(**json.loads(it)))
         except Exception:
             continue
+    await store_many(entries)
+    if items:
+        await r.delete(BACKUP_LOG_KEY)
+        print(f"Logs de backup migrados a índices ordenados: {len(entries)} de {len(items)}")
+
+
+def from_pgbackrest(info, node: str, dbname: str) -> List[BackupLogIn]:
+    """Entradas a partir de `pgbackrest info --output=json` (lista de stanzas)."""
+    out = []
+    for st in info if isinstance(info, list) else [info]:
+        for bk in st.get("backup") or []:
+            ts = bk.get("timestamp") or {}
+            size = bk.get("info") or {}
+            repo = size.get("repository") or {}
+            wal = bk.get("archive") or {}
+            start, stop = ts.get("start"), ts.get("stop")
+            out.append(BackupLogIn(
+                when=datetime.fromtimestamp(stop or start, timezone.utc),
+                node=node, stanza=st.get("name", ""), dbname=dbname,
+                type=bk.get("type", ""), label=bk.get("label"),
+                repo_size_bytes=repo.get("size"), db_backup_bytes=size.get("delta"),
+                duration_sec=(stop - start) if start is not None and stop is not None else None,
+                wal_start=wal.get("start"), wal_stop=wal.get("stop"), notes="pgbackrest info"))
     return out
+
+
+router = APIRouter(prefix="/backup", tags=["backup-logs"])
+
+class BulkIn(BaseModel):
+    items: List[BackupLogIn]
+
+class BulkOut(BaseModel):
+    received: int
+    inserted: int
+    duplicates: int
+    ids: List[str]
+
+
+def _bulk_result(results: List[Tuple[bool, dict]]) -> BulkOut:
+    inserted = sum(1 for new, _ in results if new)
+    return BulkOut(received=len(results), inserted=inserted, duplicates=len(results) - inserted,
+                   ids=[doc["id"] for _, doc in results])
+
+def _check_bulk(n: int):
+    if n > MAX_BULK:
+        raise HTTPException(status_code=413, detail=f"máximo {MAX_BULK} entradas por request")
+
+
+@router.post("/log", response_model=BackupLogOut, response_model_exclude=set(HIDDEN))
+async def push_backup_log(entry: BackupLogIn, response: Response):
+    """Alta idempotente: repetir la misma entrada (misma stanza e id) devuelve la
+    guardada con Idempotent-Replayed: true y no suma nada."""
+    new, doc = await _store(entry)
+    if not new:
+        response.headers["Idempotent-Replayed"] = "true"
+    return BackupLogOut(**doc)
+
+@router.post("/logs/bulk", response_model=BulkOut)
+async def push_backup_logs_bulk(body: BulkIn):
+    """Varias entradas en un request (mismas reglas de idempotencia que /log)."""
+    _check_bulk(len(body.items))
+    return _bulk_result(await store_many(body.items))
+
+@router.post("/logs/bulk/pgbackrest", response_model=BulkOut)
+async def push_backup_logs_pgbackrest(info: List[dict], node: str = Query(...), dbname: str = Query(...)):
+    """Backfill con la salida de `pgbackrest info --output=json` tal cual."""
+    try:
+        entries = from_pgbackrest(info, node, dbname)
+    except (ValueError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=422, detail=f"JSON de pgbackrest inválido: {e}")
+    _check_bulk(len(entries))
+    return _bulk_result(await store_many(entries))
+
+@router.get("/logs", response_model=List[BackupLogOut], response_model_exclude=set(HIDDEN),
+            responses={200: {"headers": {NEXT_CURSOR_HEADER: {
+                "description": "cursor de la página siguiente (ausente en la última)",
+                "schema": {"type": "string"}}}}})
+async def list_backup_logs(
+    limit: int = Query(50, ge=1, le=MAX_PAGE),
+    stanza: Optional[str] = None,
+    type: Optional[str] = None,
+    since: Optional[datetime] = Query(None, description="desde (inclusive)"),
+    until: Optional[datetime] = Query(None, description="hasta (inclusive)"),
+    cursor: Optional[str] = Query(None, description=f"valor de {NEXT_CURSOR_HEADER} de la página anterior"),
+):
+    """Logs del más nuevo al más viejo, filtrados por stanza/tipo/rango y paginados por cursor."""
+    # Cotas lexicográficas: '[' inclusiva, '(' exclusiva, '+'/'-' infinito
+    upper = "+"
+    if until is not None:
+        upper = "(" + _ms_key(int(until.timestamp() * 1000) + 1)
+    if cursor:
+        if "|" not in cursor or not cursor.split("|", 1)[0].isdigit():
+            raise HTTPException(status_code=400, detail="cursor inválido")
+        if upper == "+" or cursor < upper[1:]:
+            upper = "(" + cursor
+    lower = "-" if since is None else "[" + _ms_key(int(since.timestamp() * 1000))
+
+    members = await redis_timed("zrevrangebylex", r.zrevrangebylex(
+        _index_key(stanza, type), upper, lower, start=0, num=limit))
+    docs = await redis_timed("hmget", r.hmget(DATA_KEY, members)) if members else []
+
+    # Lo guardado ya pasó por BackupLogIn al escribirse: se arma la respuesta sin
+    # revalidar cada item; solo se quitan los campos ocultos.
+    out = []
+    for doc in docs:
+        if doc is None:   # recortado por retención entre las dos lecturas
+            continue
+        d = json.loads(doc)
+        for k in HIDDEN:
+            d.pop(k, None)
+        out.append(d)
+    headers = {NEXT_CURSOR_HEADER: members[-1]} if len(members) == limit else {}
+    return Response(json.dumps(out), media_type="application/json", headers=headers)
+
+
+@router.get("/stats")
+async def backup_stats(
+    stanza: Optional[str] = None,
+    type: Optional[str] = None,
+    since: Optional[date] = Query(None, description="día inicial (UTC, inclusive)"),
+    until: Optional[date] = Query(None, description="día final (UTC, inclusive)"),
+    by: Literal["total", "day"] = Query("total", description="un agregado por stanza+tipo o también por día"),
+):
+    """Tendencias de backups (tamaños, duración, p50/p90/p99, crecimiento del repo,
+    bytes/s) a partir de los agregados diarios; no relee los logs."""
+    lower = "-" if since is None else "[" + since.isoformat()
+    upper = "+" if until is None else "(" + (until + timedelta(days=1)).isoformat()
+    members = await redis_timed("zrangebylex", r.zrangebylex(STATS_INDEX_KEY, lower, upper))
+    wanted = []
+    for m in members:
+        day, rest = m.split("|", 1)
+        s, t = rest.rsplit("|", 1)
+        if (stanza is None or s == stanza) and (type is None or t == type):
+            wanted.append((m, (s, t, day) if by == "day" else (s, t)))
+    pipe = r.pipeline(transaction=False)
+    for m, _ in wanted:
+        pipe.hgetall(f"{STATS_KEY}:{m}")
+    hashes = await redis_timed("pipeline:hgetall", pipe.execute()) if wanted else []
+    groups: dict = {}
+    for (_, key), h in zip(wanted, hashes):
+        groups.setdefault(key, []).append(h)
+    return aggregate(groups)
@@ -0,0 +1,223 @@
+# app/backup_scheduler.py
+# Programador de backups con pgBackRest (reemplaza script_apoyo/backups_Simulacion.ps1).
+# Cada stanza tiene su tarea asyncio con calendario full/diff/incr; las stanzas
+# corren en paralelo y dentro de una stanza los backups van uno tras otro (pgBackRest
+# no admite dos a la vez). Tras cada ciclo se lee `pgbackrest info --output=json`
+# una sola vez y las entradas nuevas van directo a Redis (backup_logs, idempotente).
+#
+#   python -m app.backup_scheduler run                      # calendario (BACKUP_SCHEDULE)
+#   python -m app.backup_scheduler once --type full         # un backup por stanza
+#   python -m app.backup_scheduler simulate --delay 20      # la secuencia del .ps1
+#
+# Para probar sin Docker ni pgBackRest:
+#   PGBACKREST_CMD="python ../script_apoyo/fake_pgbackrest.py" python -m app.backup_scheduler simulate --delay 0
+import os
+import json
+import time
+import shlex
+import asyncio
+import argparse
+from typing import Dict, List
+
+from app.backup_logs import from_pgbackrest, store_many
+
+# Comando base; {node} se reemplaza por el nodo de la stanza
+PGBACKREST_CMD = os.getenv("PGBACKREST_CMD", "docker exec -u postgres {node} pgbackrest")
+# stanza@nodo/base separadas por coma
+BACKUP_STANZAS = os.getenv("BACKUP_STANZAS", "bases2-db@pg-bases2/bases2_proyectos")
+# segundos entre backups de cada tipo (0 = no se programa ese tipo)
+BACKUP_SCHEDULE = os.getenv("BACKUP_SCHEDULE", "full=604800,diff=86400,incr=3600")
+BACKUP_TIMEOUT = float(os.getenv("BACKUP_TIMEOUT", "3600"))   # segundos por comando
+BACKUP_RETRY = float(os.getenv("BACKUP_RETRY", "300"))   # reintento de un backup que falló
+BACKUP_SCHEDULER = os.getenv("BACKUP_SCHEDULER", "0") == "1"   # arrancarlo junto con la API
+
+TYPES = ("full", "diff", "incr")
+# Secuencia de días de backups_Simulacion.ps1
+SIMULATION = (("full",), ("incr",), ("incr", "diff"), ("incr",), ("incr", "diff"), ("diff", "full"))
+
+
+class PgBackRestError(RuntimeError):
+    pass
+
+
+class Stanza:
+    def __init__(self, name: str, node: str, dbname: str):
+        self.name, self.node, self.dbname = name, node, dbname
+        self.lock = asyncio.Lock()
+        self.watermark = 0            # timestamp.stop más reciente ya registrado
+        self.last: Dict[str, dict] = {}   # tipo -> resultado del último backup
+        self.due: Dict[str, float] = {}    # tipo -> próximo backup (time.monotonic)
+
+def parse_stanzas(spec: str) -> List[Stanza]:
+    out = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, rest = part.partition("@")
+        node, _, dbname = rest.partition("/")
+        out.append(Stanza(name, node or "pg-bases2", dbname or "bases2_proyectos"))
+    return out
+
+def parse_schedule(spec: str) -> Dict[str, float]:
+    out = {}
+    for part in spec.split(","):
+        if part.strip():
+            t, _, secs = part.partition("=")
+            if t.strip() not in TYPES:
+                raise ValueError(f"tipo de backup inválido en BACKUP_SCHEDULE: {t}")
+            if float(secs) > 0:
+                out[t.strip()] = float(secs)
+    return out
+
+
+class BackupScheduler:
+    def __init__(self, stanzas: List[Stanza], schedule: Dict[str, float], cmd: str = PGBACKREST_CMD,
+                 timeout: float = BACKUP_TIMEOUT, retry: float = BACKUP_RETRY):
+        self.stanzas, self.schedule, self.cmd, self.timeout = stanzas, schedule, cmd, timeout
+        self.retry = retry
+        self._tasks: List[asyncio.Task] = []
+
+    async def _pgbackrest(self, st: Stanza, *args: str) -> str:
+        argv = shlex.split(self.cmd.format(node=st.node)) + list(args)
+        proc = await asyncio.create_subprocess_exec(
+            *argv, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        try:
+            out, err = await asyncio.wait_for(proc.communicate(), self.timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise PgBackRestError(f"{args[-1]} de {st.name}: sin respuesta en {self.timeout:.0f}s")
+        if proc.returncode != 0:
+            raise PgBackRestError(f"{args[-1]} de {st.name} salió con {proc.returncode}: "
+                                  f"{(err or out).decode(errors='replace').strip()[-500:]}")
+        return out.decode()
+
+    async def backup(self, st: Stanza, type_: str):
+        t0 = time.monotonic()
+        result = {"at": time.time(), "ok": False}
+        try:
+            await self._pgbackrest(st, f"--stanza={st.name}", f"--type={type_}",
+                                   "--log-level-console=info", "--start-fast", "backup")
+            result["ok"] = True
+            print(f">> {type_} en {st.node} (stanza={st.name}) OK")
+        except PgBackRestError as e:
+            result["error"] = str(e)
+            print(f">> {type_} en {st.node} (stanza={st.name}) FALLÓ: {e}")
+        result["secs"] = round(time.monotonic() - t0, 3)
+        st.last[type_] = result
+
+    async def ingest(self, st: Stanza) -> int:
+        """Una lectura de `info` y registro de los backups terminados desde la última."""
+        info = json.loads(await self._pgbackrest(st, f"--stanza={st.name}", "--output=json", "info"))
+        entries = [e for e in from_pgbackrest(info, st.node, st.dbname)
+                   if e.stanza == st.name and e.when.timestamp() >= st.watermark]
+        if not entries:
+            return 0
+        results = await store_many(entries)   # repetidos (mismo id) no se duplican
+        # recién ahora: si Redis falla, la próxima lectura vuelve a traer estas entradas
+        st.watermark = max(e.when.timestamp() for e in entries)
+        inserted = sum(1 for new, _ in results if new)
+        for new, doc in results:
+            if new:
+                print(f"Log Redis id={doc['id']} label={doc['label']} type={doc['type']}")
+        return inserted
+
+    async def cycle(self, st: Stanza, types) -> int:
+        """Corre los backups pedidos de una stanza y registra el resultado."""
+        async with st.lock:
+            for t in types:
+                await self.backup(st, t)
+            try:
+                return await self.ingest(st)
+            except (PgBackRestError, ValueError) as e:
+                print(f"No se pudo leer info de {st.name}: {e}")
+                return 0
+
+    async def run_once(self, types) -> int:
+        return sum(await asyncio.gather(*(self.cycle(st, types) for st in self.stanzas)))
+
+    async def simulate(self, delay: float, plan=SIMULATION):
+        for day, types in enumerate(plan, 1):
+            await self.run_once(types)
+            if delay > 0 and day < len(plan):
+                print(f"Espera {delay:.0f} s (fin Dia {day})")
+                await asyncio.sleep(delay)
+
+    async def tick(self, st: Stanza) -> List[str]:
+        """Corre los tipos vencidos de una stanza. El que sale bien no vuelve a correr
+        hasta la próxima ventana; el que falla se reintenta a los `retry` segundos."""
+        now = time.monotonic()
+        types = [t for t in TYPES if t in self.schedule and st.due.get(t, now) <= now]
+        if not types:
+            return []
+        started = time.time()
+        try:
+            await self.cycle(st, types)
+        finally:
+            for t in types:
+                res = st.last.get(t, {})
+                ok = res.get("ok") and res.get("at", 0) >= started
+                st.due[t] = now + (self.schedule[t] if ok else min(self.retry, self.schedule[t]))
+        return types
+
+    async def _loop(self, st: Stanza):
+        now = time.monotonic()
+        for t, secs in self.schedule.items():
+            st.due.setdefault(t, now + secs)
+        try:
+            await self.ingest(st)   # registra lo que ya exista antes del primer ciclo
+        except (PgBackRestError, ValueError) as e:
+            print(f"No se pudo leer info de {st.name}: {e}")
+        while True:
+            await asyncio.sleep(max(0.0, min(st.due.values()) - time.monotonic()))
+            try:
+                await self.tick(st)
+            except Exception as e:   # Redis caído, etc.: se reintenta en el próximo ciclo
+                print(f"Ciclo de backups de {st.name} falló: {e}")
+
+    def start(self):
+        if self.schedule and not self._tasks:
+            self._tasks = [asyncio.create_task(self._loop(st)) for st in self.stanzas]
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {st.name: {"node": st.node, "last": st.last, "watermark": st.watermark}
+                for st in self.stanzas}
+
+
+scheduler = BackupScheduler(parse_stanzas(BACKUP_STANZAS), parse_schedule(BACKUP_SCHEDULE))
+
+
+async def _main(args):
+    from app.backup_logs import r
+    try:
+        if args.cmd == "once":
+            if set(args.type.split(",")) - set(TYPES):
+                raise SystemExit(f"tipos válidos: {', '.join(TYPES)}")
+            print(f"Entradas nuevas: {await scheduler.run_once(args.type.split(','))}")
+        elif args.cmd == "simulate":
+            print(f"=== Simulacion Backups ({', '.join(st.name for st in scheduler.stanzas)}) ===")
+            await scheduler.simulate(args.delay)
+            print("=== Simulacion completada ===")
+        else:
+            scheduler.start()
+            await asyncio.gather(*scheduler._tasks)
+    finally:
+        await r.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backups con pgBackRest registrados en Redis")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("run", help="corre el calendario de BACKUP_SCHEDULE")
+    once = sub.add_parser("once", help="un ciclo de backups en todas las stanzas")
+    once.add_argument("--type", default="full", help="tipos separados por coma, ej. incr,diff")
+    sim = sub.add_parser("simulate", help="secuencia de 6 días de backups_Simulacion.ps1")
+    sim.add_argument("--delay", type=float, default=20, help="segundos entre días")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,161 @@
+# app/backup_stats.py
+# Agregados de los logs de backup por stanza, tipo y día. Cada POST /backup/log
+# suma su entrada a un hash de Redis (conteo, sumas, mín/máx, primero/último tamaño
+# del repo y un sketch de percentiles), así GET /backup/stats no relee el log.
+#
+# El sketch es un histograma logarítmico (estilo DDSketch): el valor v cae en el
+# cubo ceil(log_gamma(v)) y cualquier percentil sale con error relativo <= ALPHA,
+# guardando un contador por cubo (unos cientos como mucho, aunque haya millones de logs).
+import math
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+STATS_KEY = "backups:stats"              # hash por <día>|<stanza>|<tipo> (día en UTC)
+STATS_INDEX_KEY = "backups:stats:keys"   # sorted set (lex) de los <día>|<stanza>|<tipo> existentes
+METRICS = ("repo_size_bytes", "db_backup_bytes", "duration_sec")
+PERCENTILES = (0.5, 0.9, 0.99)
+ALPHA = 0.01
+_GAMMA = (1 + ALPHA) / (1 - ALPHA)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+def bucket(v: float) -> str:
+    """Cubo del sketch para v ('z' agrupa los valores <= 0)."""
+    if v <= 0:
+        return "z"
+    return str(math.ceil(math.log(v) / _LOG_GAMMA))
+
+def bucket_value(b: str) -> float:
+    """Valor representativo del cubo (punto medio en escala relativa)."""
+    if b == "z":
+        return 0.0
+    return 2 * _GAMMA ** int(b) / (_GAMMA + 1)
+
+
+def stats_key(stanza: str, type_: str, day: str) -> str:
+    return f"{STATS_KEY}:{day}|{stanza}|{type_}"
+
+def rollup_ops(payload: dict, when: datetime, ts: str) -> Tuple[str, str, List[list]]:
+    """(hash, miembro del índice, operaciones [op, campo, valor]) de una entrada.
+
+    ts es el instante en epoch ms con ancho fijo (se compara como texto)."""
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc)
+    day = when.strftime("%Y-%m-%d")
+    ops: List[list] = [["incr", "count", 1]]
+    for m in METRICS:
+        v = payload.get(m)
+        if v is None:
+            continue
+        ops += [["incr", f"{m}:n", 1], ["incrf", f"{m}:sum", v], ["min", f"{m}:min", v],
+                ["max", f"{m}:max", v], ["incr", f"{m}:q:{bucket(v)}", 1]]
+    if payload.get("repo_size_bytes") is not None:
+        ops += [["first", "repo_first", ts, payload["repo_size_bytes"]],
+                ["last", "repo_last", ts, payload["repo_size_bytes"]]]
+    if payload.get("db_backup_bytes") is not None and payload.get("duration_sec"):
+        ops += [["incrf", "rate:bytes", payload["db_backup_bytes"]],
+                ["incrf", "rate:secs", payload["duration_sec"]]]
+    return stats_key(payload["stanza"], payload["type"], day), f"{day}|{payload['stanza']}|{payload['type']}", ops
+
+
+# Aplica las operaciones de rollup_ops sobre el hash `key`; lo usa el script de
+# alta de backup_logs solo cuando la entrada es nueva.
+APPLY_LUA = """
+local function apply_rollup(key, ops)
+  for _, op in ipairs(ops) do
+    local kind, f, v = op[1], op[2], op[3]
+    if kind == 'incr' then
+      redis.call('HINCRBY', key, f, v)
+    elseif kind == 'incrf' then
+      redis.call('HINCRBYFLOAT', key, f, v)
+    elseif kind == 'min' or kind == 'max' then
+      local cur = tonumber(redis.call('HGET', key, f))
+      if not cur or (kind == 'min' and v < cur) or (kind == 'max' and v > cur) then
+        redis.call('HSET', key, f, v)
+      end
+    else  -- first / last: v es el timestamp (ms, ancho fijo) y op[4] el valor
+      local cur = redis.call('HGET', key, f .. '_ts')
+      if not cur or (kind == 'first' and v < cur) or (kind == 'last' and v >= cur) then
+        redis.call('HSET', key, f .. '_ts', v, f, op[4])
+      end
+    end
+  end
+end
+"""
+
+
+class _Acc:
+    """Suma de varios hashes diarios (mismo formato que escribe APPLY_LUA)."""
+    def __init__(self):
+        self.count = 0
+        self.n = {m: 0 for m in METRICS}
+        self.sum = {m: 0.0 for m in METRICS}
+        self.min: Dict[str, Optional[float]] = {m: None for m in METRICS}
+        self.max: Dict[str, Optional[float]] = {m: None for m in METRICS}
+        self.q: Dict[str, Dict[str, int]] = {m: {} for m in METRICS}
+        self.first: Optional[Tuple[str, float]] = None
+        self.last: Optional[Tuple[str, float]] = None
+        self.rate_bytes = 0.0
+        self.rate_secs = 0.0
+
+    def add(self, h: Dict[str, str]):
+        self.count += int(h.get("count", 0))
+        for m in METRICS:
+            if f"{m}:n" not in h:
+                continue
+            self.n[m] += int(h[f"{m}:n"])
+            self.sum[m] += float(h[f"{m}:sum"])
+            lo, hi = float(h[f"{m}:min"]), float(h[f"{m}:max"])
+            self.min[m] = lo if self.min[m] is None else min(self.min[m], lo)
+            self.max[m] = hi if self.max[m] is None else max(self.max[m], hi)
+        for f, c in h.items():
+            m, sep, b = f.partition(":q:")
+            if sep:
+                self.q[m][b] = self.q[m].get(b, 0) + int(c)
+        if "repo_first_ts" in h:
+            first = (h["repo_first_ts"], float(h["repo_first"]))
+            last = (h["repo_last_ts"], float(h["repo_last"]))
+            self.first = first if self.first is None or first[0] < self.first[0] else self.first
+            self.last = last if self.last is None or last[0] >= self.last[0] else self.last
+        self.rate_bytes += float(h.get("rate:bytes", 0))
+        self.rate_secs += float(h.get("rate:secs", 0))
+
+    def _percentiles(self, m: str) -> Dict[str, Optional[float]]:
+        buckets = sorted(self.q[m].items(), key=lambda kv: -math.inf if kv[0] == "z" else int(kv[0]))
+        total = sum(c for _, c in buckets)
+        out: Dict[str, Optional[float]] = {}
+        for p in PERCENTILES:
+            rank, seen, value = p * (total - 1), 0, None
+            for b, c in buckets:
+                seen += c
+                if seen > rank:
+                    value = bucket_value(b)
+                    break
+            if value is not None:   # el sketch nunca sale del rango observado
+                value = min(max(value, self.min[m]), self.max[m])
+            out[f"p{int(p * 100)}"] = value
+        return out
+
+    def result(self) -> dict:
+        out: dict = {"count": self.count}
+        for m in METRICS:
+            n = self.n[m]
+            out[m] = {"n": n, "avg": self.sum[m] / n if n else None, "min": self.min[m],
+                      "max": self.max[m], **self._percentiles(m)} if n else {"n": 0}
+        out["repo_growth_bytes"] = (self.last[1] - self.first[1]) if self.first and self.last else None
+        out["bytes_per_sec"] = self.rate_bytes / self.rate_secs if self.rate_secs else None
+        return out
+
+
+def aggregate(groups: Dict[tuple, List[Dict[str, str]]]) -> List[dict]:
+    """{(stanza, tipo[, día]): [hash, ...]} -> lista de agregados."""
+    out = []
+    for key, hashes in sorted(groups.items()):
+        acc = _Acc()
+        for h in hashes:
+            acc.add(h)
+        head = {"stanza": key[0], "type": key[1]}
+        if len(key) > 2:
+            head["day"] = key[2]
+        out.append({**head, **acc.result()})
+    return out
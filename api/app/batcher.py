@@ -0,0 +1,112 @@
+# app/batcher.py
+# Micro-batching de escrituras individuales (POST /name_basics).
+# Junta las filas que llegan en una ventana corta y las manda como un solo
+# INSERT multi-fila con un solo commit; cada llamador recibe su propio resultado.
+import os
+import asyncio
+from typing import Dict, List, Tuple
+
+from app.db import run_write
+
+COALESCE = os.getenv("NB_COALESCE", "0") == "1"                  # opt-in
+COALESCE_MAX_ROWS = int(os.getenv("NB_COALESCE_MAX_ROWS", "200"))   # flush al juntar N filas
+COALESCE_MAX_MS = float(os.getenv("NB_COALESCE_MAX_MS", "5"))      # ... o a los T ms de la primera
+
+ROW = "(%s, %s, %s, %s)"
+
+
+def _multi(sql: str, n: int) -> str:
+    """Convierte el INSERT de una fila en uno de n filas (VALUES (..), (..), ...)."""
+    return sql.replace(ROW, ",\n".join([ROW] * n), 1)
+
+
+class _Lane:
+    def __init__(self, sql: str, keep_last: bool):
+        self.sql = sql
+        self.keep_last = keep_last   # upsert: gana la última; insert DO NOTHING: la primera
+        self.pending: List[Tuple[tuple, asyncio.Future]] = []
+        self.timer = None
+        self.lock = asyncio.Lock()   # un lote a la vez por carril: se respeta el orden de llegada
+
+
+class WriteCoalescer:
+    def __init__(self, insert_sql: str, upsert_sql: str,
+                 max_rows: int = COALESCE_MAX_ROWS, max_ms: float = COALESCE_MAX_MS):
+        self.lanes = {False: _Lane(insert_sql, keep_last=False),
+                      True: _Lane(upsert_sql, keep_last=True)}
+        self.max_rows = max_rows
+        self.max_wait = max_ms / 1000
+        self.tasks = set()
+        self.flushes = 0
+        self.rows = 0
+        self.fallbacks = 0
+
+    async def submit(self, params: tuple, upsert: bool) -> None:
+        """Encola una fila y espera a que su lote se confirme (o falle esa fila)."""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        lane = self.lanes[upsert]
+        lane.pending.append((params, fut))
+        if len(lane.pending) >= self.max_rows:
+            self._flush(lane)
+        elif lane.timer is None:
+            lane.timer = loop.call_later(self.max_wait, self._flush, lane)
+        await fut
+
+    def _flush(self, lane: _Lane):
+        if lane.timer is not None:
+            lane.timer.cancel()
+            lane.timer = None
+        items, lane.pending = lane.pending, []
+        if items:
+            task = asyncio.create_task(self._write(lane, items))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def _write(self, lane: _Lane, items: List[Tuple[tuple, asyncio.Future]]):
+        async with lane.lock:
+            await self._write_locked(lane, items)
+
+    async def _write_locked(self, lane: _Lane, items: List[Tuple[tuple, asyncio.Future]]):
+        # Una fila por nconst (ON CONFLICT DO UPDATE no acepta repetidos en la misma
+        # sentencia) y orden fijo por nconst para no cruzar locks entre lotes.
+        rows: Dict[str, tuple] = {}
+        for params, _ in items:
+            if lane.keep_last or params[0] not in rows:
+                rows[params[0]] = params
+        ordered = [rows[k] for k in sorted(rows)]
+        try:
+            await run_write(_multi(lane.sql, len(ordered)), [v for p in ordered for v in p])
+            self.flushes += 1
+            self.rows += len(items)
+            for _, fut in items:
+                if not fut.done():
+                    fut.set_result(None)
+        except Exception as e:
+            if len(items) == 1:
+                if not items[0][1].done():
+                    items[0][1].set_exception(e)
+                return
+            # una fila mala no tumba al resto: se reintenta fila por fila
+            self.fallbacks += 1
+            for params, fut in items:
+                try:
+                    await run_write(lane.sql, params)
+                    self.flushes += 1
+                    self.rows += 1
+                    if not fut.done():
+                        fut.set_result(None)
+                except Exception as row_error:
+                    if not fut.done():
+                        fut.set_exception(row_error)
+
+    async def close(self):
+        """Vacía lo pendiente y espera los lotes en curso (al apagar la app)."""
+        for lane in self.lanes.values():
+            self._flush(lane)
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"flushes": self.flushes, "rows": self.rows, "fallbacks": self.fallbacks,
+                "rows_per_flush": round(self.rows / self.flushes, 2) if self.flushes else None}
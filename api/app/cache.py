@@ -0,0 +1,93 @@
+# app/cache.py
+# Caché read-through de name_basics en el mismo Redis que usa backup_logs.
+import os
+import json
+from typing import Dict, List, Optional, Iterable
+
+from redis import RedisError
+
+from app.backup_logs import r
+from app.db import run_read, REPLICA_MAX_LAG
+from app.metrics import redis_timed
+
+CACHE_PREFIX = "nb:"
+CACHE_TTL = int(os.getenv("NB_CACHE_TTL", "300"))          # segundos para registros encontrados
+CACHE_NEG_TTL = int(os.getenv("NB_CACHE_NEG_TTL", "30"))   # segundos para "no existe"
+MISSING = "-"  # marcador de caché negativa
+# Tras una escritura la llave queda "sucia" el tiempo que la réplica puede ir atrasada;
+# mientras tanto se lee del primario y no se guarda en caché.
+DIRTY = "~"
+CACHE_DIRTY_TTL = int(os.getenv("NB_CACHE_DIRTY_TTL", str(int(REPLICA_MAX_LAG) + 1)))
+
+SELECT_MANY_SQL = """
+SELECT nconst, primaryName, birthYear, deathYear
+FROM name_basics
+WHERE nconst = ANY(%s);
+"""
+
+def _key(nconst: str) -> str:
+    return CACHE_PREFIX + nconst
+
+def _row(nconst, primary_name, birth_year, death_year) -> Dict:
+    return {"nconst": nconst, "primaryName": primary_name,
+            "birthYear": birth_year, "deathYear": death_year}
+
+async def get_many(nconsts: List[str]) -> Dict[str, Optional[Dict]]:
+    """Devuelve {nconst: registro o None}. Primero Redis (MGET), lo que falte va a
+    Postgres en una sola consulta y se guarda con TTL; los inexistentes quedan en
+    caché negativa con un TTL más corto. Si Redis falla se lee directo de la base."""
+    nconsts = list(dict.fromkeys(nconsts))
+    out: Dict[str, Optional[Dict]] = {}
+    try:
+        cached = await redis_timed("mget", r.mget([_key(n) for n in nconsts])) if nconsts else []
+    except RedisError:
+        cached = [None] * len(nconsts)
+
+    pending, dirty = [], []
+    for n, v in zip(nconsts, cached):
+        if v is None:
+            pending.append(n)
+        elif v == DIRTY:
+            dirty.append(n)
+        else:
+            out[n] = None if v == MISSING else json.loads(v)
+    if dirty:
+        fresh = {row[0]: _row(*row) for row in await run_read(SELECT_MANY_SQL, (dirty,), primary=True)}
+        for n in dirty:
+            out[n] = fresh.get(n)
+    if not pending:
+        return out
+
+    found = {row[0]: _row(*row) for row in await run_read(SELECT_MANY_SQL, (pending,))}
+    # NX: si mientras se leía la réplica un invalidate() dejó DIRTY (o alguien ya
+    # llenó la llave), no se pisa; si no, la fila vieja quedaría todo el TTL.
+    try:
+        pipe = r.pipeline(transaction=False)
+        for n in pending:
+            if n in found:
+                pipe.set(_key(n), json.dumps(found[n]), ex=CACHE_TTL, nx=True)
+            else:
+                pipe.set(_key(n), MISSING, ex=CACHE_NEG_TTL, nx=True)
+        await redis_timed("pipeline:set", pipe.execute())
+    except RedisError:
+        pass
+    for n in pending:
+        out[n] = found.get(n)
+    return out
+
+async def get_one(nconst: str) -> Optional[Dict]:
+    return (await get_many([nconst]))[nconst]
+
+async def invalidate(nconsts: Iterable[str]) -> None:
+    """Reemplaza las entradas (positivas o negativas) por el marcador DIRTY tras una
+    escritura confirmada, para no rellenar la caché desde una réplica atrasada."""
+    keys = [_key(n) for n in set(nconsts)]
+    if not keys:
+        return
+    try:
+        pipe = r.pipeline(transaction=False)
+        for k in keys:
+            pipe.set(k, DIRTY, ex=CACHE_DIRTY_TTL)
+        await redis_timed("pipeline:invalidate", pipe.execute())
+    except RedisError:
+        pass
@@ -1,13 +1,19 @@
 # app/db.py
 import os
-from psycopg import errors
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from psycopg import errors, OperationalError
 
 from dotenv import load_dotenv
 # Import del pool con fallback (arriba del todo)
 try:
-    from psycopg.pool import ConnectionPool          # psycopg 3.2+ con extra "pool"
+    from psycopg.pool import AsyncConnectionPool, PoolTimeout   # psycopg 3.2+ con extra "pool"
 except Exception:
-    from psycopg_pool import ConnectionPool          # fallback
+    from psycopg_pool import AsyncConnectionPool, PoolTimeout   # fallback
+
+from app.metrics import (POOL_WAIT, SQL_EXECUTE, SQL_COMMIT, FAILOVERS, READ_FALLBACKS,
+                         REPLICA_LAG, timed, register_pools)
 
 
 load_dotenv()
@@ -15,30 +21,190 @@ DB_URL = os.getenv("DATABASE_URL")
 if not DB_URL:
     raise RuntimeError("DATABASE_URL no configurada")
 
-pool = ConnectionPool(conninfo=DB_URL, min_size=1, max_size=10)
+# Réplica para lecturas (pg-replica, puerto 5433). Si no se define, todo va al primario.
+DB_READ_URL = os.getenv("DATABASE_READ_URL")
+# Retraso máximo (segundos) aceptado en la réplica antes de mandar lecturas al primario
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", "5"))
+# Cada cuánto se vuelve a medir el retraso (segundos)
+REPLICA_LAG_CHECK = float(os.getenv("REPLICA_LAG_CHECK", "2"))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+
+
+class _WrongRole(Exception):
+    pass
+
+async def _check_primary(conn):
+    """Al sacar una conexión del pool de escritura: debe ser primario."""
+    cur = await conn.execute("SELECT pg_is_in_recovery();")
+    ro = (await cur.fetchone())[0]
+    await conn.rollback()
+    if ro:
+        raise _WrongRole("conexión de escritura apunta a un standby")
+
+async def _check_alive(conn):
+    """Para la réplica basta con que responda (si la promovieron, igual sirve para leer)."""
+    await conn.execute("SELECT 1;")
+    await conn.rollback()
+
+
+# Se abren en el lifespan de la app (open_pools / close_pools)
+pool = AsyncConnectionPool(conninfo=DB_URL, min_size=1, max_size=POOL_MAX,
+                           check=_check_primary, open=False)
+read_pool = (AsyncConnectionPool(conninfo=DB_READ_URL, min_size=1, max_size=POOL_MAX,
+                                 check=_check_alive, timeout=3, open=False)
+             if DB_READ_URL else None)
+register_pools({"primary": pool, "replica": read_pool})
+
+async def open_pools():
+    await pool.open()
+    if read_pool is not None:
+        await read_pool.open()
+
+async def close_pools():
+    if read_pool is not None:
+        await read_pool.close()
+    await pool.close()
+
+def _label(p) -> str:
+    return "replica" if p is not None and p is read_pool else "primary"
+
+@asynccontextmanager
+async def _connection(p):
+    """pool.connection() registrando cuánto se esperó por la conexión."""
+    t0 = time.perf_counter()
+    async with p.connection() as conn:
+        POOL_WAIT.labels(pool=_label(p)).observe(time.perf_counter() - t0)
+        yield conn
+
+
+# --------------------------------------------------------------------
+# Estado de la réplica (retraso medido cada REPLICA_LAG_CHECK segundos)
+# --------------------------------------------------------------------
+# Si la réplica ya reprodujo todo lo recibido, el retraso es 0 aunque el primario
+# esté inactivo; si no, es el tiempo desde la última transacción reproducida.
+LAG_SQL = """
+SELECT pg_is_in_recovery(),
+       CASE WHEN NOT pg_is_in_recovery()
+              OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+       END;
+"""
+
+class _ReplicaState:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.checked_at = 0.0
+        self.ok = read_pool is not None
+        self.standby = None
+        self.lag = None
+        self.error = None
 
-def run_write(sql, params):
+    async def refresh(self, force: bool = False):
+        if read_pool is None:
+            return
+        if not force and time.monotonic() - self.checked_at < REPLICA_LAG_CHECK:
+            return
+        if self.lock.locked():
+            return  # otra tarea ya está midiendo
+        async with self.lock:
+            try:
+                async with _connection(read_pool) as conn:
+                    cur = await conn.execute(LAG_SQL)
+                    self.standby, lag = await cur.fetchone()
+                self.lag = float(lag)
+                self.ok = self.lag <= REPLICA_MAX_LAG
+                self.error = None
+                REPLICA_LAG.set(self.lag)
+            except Exception as e:
+                self.ok, self.lag, self.error = False, None, str(e)
+                REPLICA_LAG.set(-1)
+            finally:
+                self.checked_at = time.monotonic()
+
+replica = _ReplicaState()
+
+async def _reader():
+    """Pool para lecturas: la réplica si está sana y al día, si no el primario."""
+    await replica.refresh()
+    return read_pool if replica.ok else pool
+
+
+async def _write(sql, params, many: bool):
+    async with _connection(pool) as conn, conn.cursor() as cur:
+        async with timed(SQL_EXECUTE, pool="primary", op="executemany" if many else "execute"):
+            if many:
+                await cur.executemany(sql, params)
+            else:
+                await cur.execute(sql, params)
+        async with timed(SQL_COMMIT, pool="primary"):
+            await conn.commit()
+
+async def run_write(sql, params):
     try:
-        with pool.connection() as conn, conn.cursor() as cur:
-            cur.execute(sql, params)
-            conn.commit()
+        await _write(sql, params, many=False)
     except errors.ReadOnlySqlTransaction:
-        # el pool estaba pegado al standby → recrear una vez
-        pool.close()
-        pool.open()  # o crea uno nuevo si prefieres
-        with pool.connection() as conn, conn.cursor() as cur:
-            cur.execute(sql, params)
-            conn.commit()
-
-def run_write_many(sql, params_seq):
+        # la conexión quedó en un standby: el check al sacarla la descarta → reintento 1 vez
+        FAILOVERS.labels(op="execute").inc()
+        await _write(sql, params, many=False)
+
+async def run_write_many(sql, params_seq):
     """Batch con executemany y el mismo patrón de reintento 1 vez."""
     try:
-        with pool.connection() as conn, conn.cursor() as cur:
-            cur.executemany(sql, params_seq)
-            conn.commit()
+        await _write(sql, params_seq, many=True)
+    except errors.ReadOnlySqlTransaction:
+        FAILOVERS.labels(op="executemany").inc()
+        await _write(sql, params_seq, many=True)
+
+async def _copy_apply(stage_sql, copy_sql, rows, apply_sql):
+    async with _connection(pool) as conn, conn.cursor() as cur:
+        async with timed(SQL_EXECUTE, pool="primary", op="copy"):
+            await cur.execute(stage_sql)
+            async with cur.copy(copy_sql) as copy:
+                for row in rows:
+                    await copy.write_row(row)
+        async with timed(SQL_EXECUTE, pool="primary", op="execute"):
+            await cur.execute(apply_sql)
+            out = await cur.fetchall() if cur.description else []
+        async with timed(SQL_COMMIT, pool="primary"):
+            await conn.commit()
+        return out
+
+async def run_copy_apply(stage_sql, copy_sql, rows, apply_sql):
+    """Carga `rows` con COPY en una tabla de staging (creada por `stage_sql`) y aplica
+    `apply_sql` en la misma transacción; devuelve sus filas (RETURNING).
+    Mismo patrón de reintento 1 vez que run_write."""
+    try:
+        return await _copy_apply(stage_sql, copy_sql, rows, apply_sql)
     except errors.ReadOnlySqlTransaction:
-        pool.close()
-        pool.open()
-        with pool.connection() as conn, conn.cursor() as cur:
-            cur.executemany(sql, params_seq)
-            conn.commit()
+        FAILOVERS.labels(op="copy").inc()
+        return await _copy_apply(stage_sql, copy_sql, rows, apply_sql)
+
+async def _read(target, sql, params):
+    async with _connection(target) as conn, conn.cursor() as cur:
+        async with timed(SQL_EXECUTE, pool=_label(target), op="read"):
+            await cur.execute(sql, params)
+            return await cur.fetchall()
+
+async def run_read(sql, params=None, primary: bool = False):
+    """Lectura simple: devuelve todas las filas. Va a la réplica salvo que esté caída,
+    atrasada o se pida `primary=True` (leer lo recién escrito)."""
+    target = pool if primary else await _reader()
+    try:
+        return await _read(target, sql, params)
+    except (OperationalError, PoolTimeout):
+        if target is pool:
+            raise
+        # la réplica falló a mitad: se marca y se reintenta en el primario
+        READ_FALLBACKS.inc()
+        await replica.refresh(force=True)
+        return await _read(pool, sql, params)
+
+async def read_status() -> dict:
+    """Rol del nodo que atiende lecturas y retraso de la réplica (para /health)."""
+    ro = (await run_read("SELECT pg_is_in_recovery();"))[0][0]
+    return {
+        "role": "standby" if ro else "primary",
+        "reads": "replica" if read_pool is not None and replica.ok else "primary",
+        "replica_lag_sec": replica.lag,
+        "replica_error": replica.error,
+    }
@@ -0,0 +1,380 @@
+# app/imdb.py
+# Lecturas del resto del esquema que llena carga_masiva (title_basics, principals,
+# ratings, episodes, crew) y búsqueda de títulos/personas. Cada endpoint es una
+# sola consulta (los relacionados van en JOIN/array_agg, sin N+1), las listas se
+# paginan por llave (seek) con un cursor opaco en lugar de OFFSET y la respuesta se
+# guarda ya serializada en Redis con su ETag: si el cliente manda If-None-Match y
+# coincide, responde 304 sin tocar la base. Las analíticas por género y año leen
+# los resúmenes agg_* (script.sql) que carga_masiva refresca al terminar.
+# Con IMDB_LAYOUT=partitioned (script_particionado.sql) principals y akas guardan
+# ids enteros: se convierten aquí y la API sigue hablando de tt.../nm....
+import os
+import re
+import json
+import base64
+import hashlib
+from typing import Awaitable, Callable, Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response
+from redis import RedisError
+
+from app.backup_logs import r
+from app.db import run_read
+from app.metrics import redis_timed
+from app.models import TitleOut, FilmographyPage, EpisodesPage, SearchOut, GenreStatsOut, TopRatedOut
+
+CACHE_PREFIX = "imdb:"
+IMDB_CACHE_TTL = int(os.getenv("IMDB_CACHE_TTL", "300"))         # la carga es masiva, no por request
+IMDB_CACHE_NEG_TTL = int(os.getenv("IMDB_CACHE_NEG_TTL", "30"))  # para los 404
+MAX_PAGE = 500
+NOT_FOUND = "404"
+LAST = 2147483647   # episodios sin temporada/número van al final
+IMDB_LAYOUT = os.getenv("IMDB_LAYOUT", "plain")   # el mismo que se usó en carga_masiva
+PARTITIONED = IMDB_LAYOUT == "partitioned"
+
+TITLE_SQL = """
+SELECT t.tconst, t.titleType, t.primaryTitle, t.originalTitle, t.isAdult,
+       t.startYear, t.endYear, t.runtimeMinutes,
+       COALESCE((SELECT array_agg(g.genre ORDER BY g.genre) FROM basics_genres g WHERE g.tconst = t.tconst), '{}'),
+       r.averageRating, r.numVotes,
+       COALESCE((SELECT array_agg(d.nconst ORDER BY d.nconst) FROM crew_directors d WHERE d.tconst = t.tconst), '{}'),
+       COALESCE((SELECT array_agg(w.nconst ORDER BY w.nconst) FROM crew_writers w WHERE w.tconst = t.tconst), '{}')
+FROM title_basics t
+LEFT JOIN ratings r ON r.tconst = t.tconst
+WHERE t.tconst = %s;
+"""
+# Usa idx_pr_nconst_seek (nconst, tconst, ordering). El cursor lleva el tconst
+# en texto en los dos esquemas.
+FILMOGRAPHY_SQL = """
+SELECT p.tconst, p.ordering, p.category, p.job, p.characters,
+       t.titleType, t.primaryTitle, t.startYear, r.averageRating, r.numVotes
+FROM principals p
+JOIN title_basics t ON t.tconst = p.tconst
+LEFT JOIN ratings r ON r.tconst = p.tconst
+WHERE p.nconst = %s AND (p.tconst, p.ordering) > (%s, %s)
+ORDER BY p.tconst, p.ordering
+LIMIT %s;
+"""
+if PARTITIONED:
+    # imdb_num(constante) se resuelve al planear: sigue usando el índice
+    FILMOGRAPHY_SQL = """
+SELECT t.tconst, p.ordering, p.category, p.job, p.characters,
+       t.titleType, t.primaryTitle, t.startYear, r.averageRating, r.numVotes
+FROM principals p
+JOIN title_basics t ON t.tconst = imdb_id('tt', p.tconst)
+LEFT JOIN ratings r ON r.tconst = t.tconst
+WHERE p.nconst = imdb_num(%s) AND (p.tconst, p.ordering) > (COALESCE(imdb_num(%s), -1), %s)
+ORDER BY p.tconst, p.ordering
+LIMIT %s;
+"""
+# Usa idx_ep_parent_seek (parentTconst, COALESCE(season), COALESCE(episode), tconst)
+EPISODES_SQL = f"""
+SELECT e.tconst, e.seasonNumber, e.episodeNumber, t.primaryTitle, t.startYear,
+       r.averageRating, r.numVotes
+FROM episodes e
+LEFT JOIN title_basics t ON t.tconst = e.tconst
+LEFT JOIN ratings r ON r.tconst = e.tconst
+WHERE e.parentTconst = %s
+  AND (COALESCE(e.seasonNumber, {LAST}), COALESCE(e.episodeNumber, {LAST}), e.tconst) > (%s, %s, %s)
+ORDER BY COALESCE(e.seasonNumber, {LAST}), COALESCE(e.episodeNumber, {LAST}), e.tconst
+LIMIT %s;
+"""
+
+# Búsqueda (columnas *_tsv e índices idx_search_* de script.sql): candidatos por
+# texto completo (tsvector 'simple', el último término como prefijo si prefix=true)
+# y por trigramas (pg_trgm, tolera errores de tipeo), cada fuente con LIMIT para
+# que un término muy común no obligue a puntuar millones de filas.
+#   * trigramas: ORDER BY distancia (<->) LIMIT, que el GiST resuelve en orden
+#     (KNN) sin puntuar todas las coincidencias: son los más parecidos.
+#   * texto completo: LIMIT sin ORDER BY. Ordenar por ts_rank obligaría a leer y
+#     puntuar todas las filas que coinciden (millones con "the"); así se toman
+#     las primeras que devuelve el GIN y solo esas se puntúan. Con términos muy
+#     comunes los mejores pueden no estar entre ellas: los trae la fuente de
+#     trigramas (el texto más parecido a la consulta completa).
+# Luego se puntúa ts_rank (sobre el tsvector guardado) + similarity (+ bono si
+# empieza igual) y se deja un resultado por llave. bench_search.py mide los planes.
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "200"))
+MAX_SEARCH = 50
+
+AKA_TCONST = "imdb_id('tt', a.titleId)" if PARTITIONED else "a.titleId"
+SEARCH_TITLES_SQL = f"""
+WITH q AS (SELECT to_tsquery('simple', %(tsq)s) AS tsq),
+cand AS (
+    (SELECT t.tconst, t.primaryTitle AS matched, t.primaryTitle_tsv AS doc FROM title_basics t, q
+     WHERE t.primaryTitle_tsv @@ q.tsq
+     LIMIT %(cand)s)
+    UNION ALL
+    (SELECT {AKA_TCONST}, a.title, a.title_tsv FROM akas a, q
+     WHERE a.title_tsv @@ q.tsq
+     LIMIT %(cand)s)
+    UNION ALL
+    (SELECT t.tconst, t.primaryTitle, t.primaryTitle_tsv FROM title_basics t
+     WHERE %(trgm)s AND lower(t.primaryTitle) %% %(lq)s
+     ORDER BY lower(t.primaryTitle) <-> %(lq)s LIMIT %(cand)s)
+    UNION ALL
+    (SELECT {AKA_TCONST}, a.title, a.title_tsv FROM akas a
+     WHERE %(trgm)s AND lower(a.title) %% %(lq)s
+     ORDER BY lower(a.title) <-> %(lq)s LIMIT %(cand)s)
+),
+scored AS (
+    SELECT DISTINCT ON (c.tconst) c.tconst, c.matched,
+           ts_rank(c.doc, q.tsq) + similarity(lower(c.matched), %(lq)s)
+           + CASE WHEN starts_with(lower(c.matched), %(lq)s) THEN 0.5 ELSE 0 END AS score
+    FROM cand c, q
+    ORDER BY c.tconst, score DESC
+)
+SELECT s.tconst, t.primaryTitle, s.matched, t.titleType, t.startYear,
+       r.averageRating, r.numVotes, s.score
+FROM scored s
+JOIN title_basics t ON t.tconst = s.tconst
+LEFT JOIN ratings r ON r.tconst = s.tconst
+ORDER BY s.score DESC, r.numVotes DESC NULLS LAST, s.tconst
+LIMIT %(limit)s;
+"""
+SEARCH_NAMES_SQL = """
+WITH q AS (SELECT to_tsquery('simple', %(tsq)s) AS tsq),
+cand AS (
+    (SELECT n.nconst FROM name_basics n, q
+     WHERE n.primaryName_tsv @@ q.tsq
+     LIMIT %(cand)s)
+    UNION
+    (SELECT n.nconst FROM name_basics n
+     WHERE %(trgm)s AND lower(n.primaryName) %% %(lq)s
+     ORDER BY lower(n.primaryName) <-> %(lq)s LIMIT %(cand)s)
+)
+SELECT n.nconst, n.primaryName, n.birthYear, n.deathYear,
+       ts_rank(n.primaryName_tsv, q.tsq) + similarity(lower(n.primaryName), %(lq)s)
+       + CASE WHEN starts_with(lower(n.primaryName), %(lq)s) THEN 0.5 ELSE 0 END AS score
+FROM cand c
+JOIN name_basics n ON n.nconst = c.nconst, q
+ORDER BY score DESC, n.nconst
+LIMIT %(limit)s;
+"""
+
+# Analítica: agg_genre_year guarda sumas por (género, año) y los promedios salen
+# aquí, también al juntar años. El top de varios años sale de los top por año
+# (agg_top_rated): quien está en el top N del rango está en el top N de su año.
+MAX_TOP = 50   # AGG_TOP_N de agg_refresh
+YEAR_MAX = 32767
+
+GENRE_STATS_SQL = """
+SELECT genre, CASE WHEN %(by_year)s THEN startYear END,
+       sum(titles)::bigint, sum(rated)::bigint, sum(votes)::bigint, sum(ratingSum), sum(weightedSum)
+FROM agg_genre_year
+WHERE (%(genre)s::text IS NULL OR genre = %(genre)s)
+  AND startYear BETWEEN %(y0)s AND %(y1)s
+GROUP BY 1, 2
+ORDER BY 1, 2;
+"""
+TOP_RATED_SQL = """
+SELECT tconst, primaryTitle, startYear, averageRating, numVotes
+FROM agg_top_rated
+WHERE genre = %(genre)s AND startYear BETWEEN %(y0)s AND %(y1)s
+ORDER BY averageRating DESC, numVotes DESC, tconst
+LIMIT %(limit)s;
+"""
+
+router = APIRouter(tags=["imdb"])
+
+
+# --------------------------------------------------------------------
+# Cursor y caché de respuestas
+# --------------------------------------------------------------------
+def _encode_cursor(key: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: Optional[str], first: list) -> list:
+    if not cursor:
+        return first
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        key = None
+    if not isinstance(key, list) or len(key) != len(first) or any(
+            type(k) is not type(f) for k, f in zip(key, first)):
+        raise HTTPException(status_code=400, detail="cursor inválido")
+    return key
+
+def _rating(avg, votes) -> Optional[dict]:
+    return None if avg is None else {"averageRating": float(avg), "numVotes": votes}
+
+def _etag(body: str) -> str:
+    return '"' + hashlib.sha1(body.encode()).hexdigest()[:20] + '"'
+
+def _not_modified(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    return bool(inm) and (inm.strip() == "*" or etag in (t.strip() for t in inm.split(",")))
+
+async def _cached(request: Request, key: str, load: Callable[[], Awaitable[Optional[dict]]]) -> Response:
+    """Respuesta desde Redis ("<etag>\\n<json>") o desde la base; load() devuelve
+    None para 404. Si Redis falla se sirve directo de la base."""
+    key = CACHE_PREFIX + key
+    try:
+        hit = await redis_timed("get", r.get(key))
+    except RedisError:
+        hit = None
+    if hit is not None:
+        etag, _, body = hit.partition("\n")
+    else:
+        data = await load()
+        if data is None:
+            etag, body = NOT_FOUND, ""
+        else:
+            body = json.dumps(data, separators=(",", ":"))
+            etag = _etag(body)
+        try:
+            await redis_timed("set", r.set(key, f"{etag}\n{body}",
+                                           ex=IMDB_CACHE_TTL if body else IMDB_CACHE_NEG_TTL))
+        except RedisError:
+            pass
+    if etag == NOT_FOUND:
+        raise HTTPException(status_code=404, detail="No encontrado")
+    headers = {"ETag": etag}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+# --------------------------------------------------------------------
+# Endpoints
+# --------------------------------------------------------------------
+@router.get("/titles/{tconst}", response_model=TitleOut)
+async def get_title(tconst: str, request: Request):
+    """Título con géneros, calificación, directores y guionistas (una consulta)."""
+    async def load():
+        rows = await run_read(TITLE_SQL, (tconst,))
+        if not rows:
+            return None
+        (tc, ttype, primary, original, adult, sy, ey, runtime, genres, avg, votes,
+         directors, writers) = rows[0]
+        return {"tconst": tc, "titleType": ttype, "primaryTitle": primary, "originalTitle": original,
+                "isAdult": adult, "startYear": sy, "endYear": ey, "runtimeMinutes": runtime,
+                "genres": genres, "rating": _rating(avg, votes),
+                "directors": directors, "writers": writers}
+    return await _cached(request, f"title:{tconst}", load)
+
+@router.get("/names/{nconst}/filmography", response_model=FilmographyPage)
+async def get_filmography(nconst: str, request: Request,
+                          limit: int = Query(100, ge=1, le=MAX_PAGE),
+                          cursor: Optional[str] = Query(None, description="campo next de la página anterior")):
+    """Títulos en los que participa nconst (principals), por tconst y ordering."""
+    after = _decode_cursor(cursor, ["", -1])
+
+    async def load():
+        rows = await run_read(FILMOGRAPHY_SQL, (nconst, after[0], after[1], limit + 1))
+        items = [{"tconst": tc, "ordering": o, "category": cat, "job": job, "characters": chars,
+                  "titleType": ttype, "primaryTitle": title, "startYear": sy, "rating": _rating(avg, votes)}
+                 for tc, o, cat, job, chars, ttype, title, sy, avg, votes in rows[:limit]]
+        nxt = _encode_cursor([items[-1]["tconst"], items[-1]["ordering"]]) if len(rows) > limit else None
+        return {"items": items, "next": nxt}
+    return await _cached(request, f"film:{nconst}:{limit}:{cursor or ''}", load)
+
+@router.get("/titles/{tconst}/episodes", response_model=EpisodesPage)
+async def get_episodes(tconst: str, request: Request,
+                       limit: int = Query(100, ge=1, le=MAX_PAGE),
+                       cursor: Optional[str] = Query(None, description="campo next de la página anterior")):
+    """Episodios de una serie (parentTconst) por temporada y número."""
+    after = _decode_cursor(cursor, [-1, -1, ""])
+
+    async def load():
+        rows = await run_read(EPISODES_SQL, (tconst, after[0], after[1], after[2], limit + 1))
+        items = [{"tconst": tc, "seasonNumber": s, "episodeNumber": e, "primaryTitle": title,
+                  "startYear": sy, "rating": _rating(avg, votes)}
+                 for tc, s, e, title, sy, avg, votes in rows[:limit]]
+        nxt = None
+        if len(rows) > limit:
+            last = items[-1]
+            nxt = _encode_cursor([LAST if last["seasonNumber"] is None else last["seasonNumber"],
+                                  LAST if last["episodeNumber"] is None else last["episodeNumber"],
+                                  last["tconst"]])
+        return {"items": items, "next": nxt}
+    return await _cached(request, f"episodes:{tconst}:{limit}:{cursor or ''}", load)
+
+
+def _tsquery(q: str, prefix: bool) -> str:
+    """Términos de q unidos con & (solo caracteres de palabra: nada que to_tsquery
+    pueda interpretar); con prefix el último se busca como prefijo."""
+    words = re.findall(r"\w+", q.lower())
+    if not words:
+        return ""
+    if prefix:
+        words[-1] += ":*"
+    return " & ".join(words)
+
+def search_params(q: str, prefix: bool, limit: int) -> Optional[dict]:
+    """Parámetros de SEARCH_TITLES_SQL / SEARCH_NAMES_SQL (None si q no tiene términos)."""
+    tsq = _tsquery(q, prefix)
+    if not tsq:
+        return None
+    lq = " ".join(q.lower().split())
+    return {"tsq": tsq, "lq": lq, "cand": SEARCH_CANDIDATES, "limit": limit,
+            # con menos de 3 letras los trigramas no discriminan: solo texto completo
+            "trgm": len(lq) >= 3 and not prefix}
+
+@router.get("/search", response_model=SearchOut)
+async def search(request: Request,
+                 q: str = Query(..., min_length=1, max_length=200),
+                 type: Literal["all", "title", "name"] = "all",
+                 prefix: bool = Query(False, description="autocompletar: el último término es un prefijo"),
+                 limit: int = Query(10, ge=1, le=MAX_SEARCH)):
+    """Títulos (primaryTitle y AKAs) y personas por relevancia."""
+    params = search_params(q, prefix, limit)
+    if params is None:
+        raise HTTPException(status_code=400, detail="q no tiene términos buscables")
+    lq = params["lq"]
+
+    async def load():
+        out = {"titles": [], "names": []}
+        if type in ("all", "title"):
+            out["titles"] = [
+                {"tconst": tc, "primaryTitle": title, "matched": matched, "titleType": ttype,
+                 "startYear": sy, "rating": _rating(avg, votes), "score": round(score, 4)}
+                for tc, title, matched, ttype, sy, avg, votes, score in await run_read(SEARCH_TITLES_SQL, params)]
+        if type in ("all", "name"):
+            out["names"] = [
+                {"nconst": nc, "primaryName": name, "birthYear": by, "deathYear": dy, "score": round(score, 4)}
+                for nc, name, by, dy, score in await run_read(SEARCH_NAMES_SQL, params)]
+        return out
+    return await _cached(request, f"search:{type}:{int(prefix)}:{limit}:{lq}", load)
+
+
+def _year_range(year_from: Optional[int], year_to: Optional[int]) -> dict:
+    """Sin límites entran también los títulos sin año (startYear 0 en agg_*)."""
+    if year_from is not None and year_to is not None and year_from > year_to:
+        raise HTTPException(status_code=400, detail="year_from debe ser <= year_to")
+    return {"y0": 0 if year_from is None else year_from, "y1": YEAR_MAX if year_to is None else year_to}
+
+@router.get("/analytics/genres", response_model=GenreStatsOut)
+async def genre_stats(request: Request,
+                      genre: Optional[str] = Query(None, max_length=64),
+                      year_from: Optional[int] = Query(None, ge=1),
+                      year_to: Optional[int] = Query(None, ge=1),
+                      by: Literal["total", "year"] = "total"):
+    """Títulos, votos y calificación promedio (simple y ponderada por votos) por género."""
+    params = {"genre": genre, "by_year": by == "year", **_year_range(year_from, year_to)}
+
+    async def load():
+        items = []
+        for g, year, titles, rated, votes, rsum, wsum in await run_read(GENRE_STATS_SQL, params):
+            items.append({"genre": g, "startYear": year or None, "titles": titles, "rated": rated,
+                          "votes": votes,
+                          "avgRating": round(float(rsum) / rated, 2) if rated else None,
+                          "weightedRating": round(float(wsum) / votes, 2) if votes else None})
+        return {"items": items}
+    return await _cached(request, f"agg:genres:{by}:{params['y0']}:{params['y1']}:{genre or ''}", load)
+
+@router.get("/analytics/top", response_model=TopRatedOut)
+async def top_rated(request: Request,
+                    genre: str = Query(..., min_length=1, max_length=64),
+                    year_from: Optional[int] = Query(None, ge=1),
+                    year_to: Optional[int] = Query(None, ge=1),
+                    limit: int = Query(10, ge=1, le=MAX_TOP)):
+    """Mejor calificados de un género en el rango de años (con un mínimo de votos)."""
+    params = {"genre": genre, "limit": limit, **_year_range(year_from, year_to)}
+
+    async def load():
+        items = [{"tconst": tc, "primaryTitle": title, "startYear": sy or None, "rating": _rating(avg, votes)}
+                 for tc, title, sy, avg, votes in await run_read(TOP_RATED_SQL, params)]
+        return {"genre": genre, "items": items}
+    return await _cached(request, f"agg:top:{limit}:{params['y0']}:{params['y1']}:{genre}", load)
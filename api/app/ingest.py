@@ -0,0 +1,111 @@
+# app/ingest.py
+# Lectura incremental de cuerpos NDJSON / CSV para POST /name_basics/stream.
+# Nada se materializa completo: se lee el request por pedazos, se valida fila
+# por fila y se entregan lotes acotados listos para COPY.
+import os
+import csv
+import json
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.models import NameBasicIn
+
+CSV_COLUMNS = ("nconst", "primaryName", "birthYear", "deathYear")
+STREAM_MAX_LINE = int(os.getenv("NB_STREAM_MAX_LINE", "65536"))   # bytes por línea
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line: int = STREAM_MAX_LINE
+                     ) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """Parte el cuerpo en líneas (numeradas desde 1, en bytes) sin juntarlo en memoria.
+    Cada pedazo se recorre una sola vez; una línea de más de max_line bytes se deja
+    de guardar y se entrega como None para que parse_rows la rechace."""
+    parts: List[bytes] = []
+    size = 0
+    lineno = 0
+    async for chunk in chunks:
+        start = 0
+        while True:
+            nl = chunk.find(b"\n", start)
+            piece = chunk[start:] if nl < 0 else chunk[start:nl]
+            size += len(piece)
+            if size <= max_line:
+                parts.append(piece)
+            else:
+                parts = []
+            if nl < 0:
+                break
+            lineno += 1
+            yield lineno, b"".join(parts) if size <= max_line else None
+            parts, size, start = [], 0, nl + 1
+    if size:
+        yield lineno + 1, b"".join(parts) if size <= max_line else None
+
+
+def _from_ndjson(line: str) -> Dict:
+    obj = json.loads(line)
+    if not isinstance(obj, dict):
+        raise ValueError("se esperaba un objeto JSON por línea")
+    return obj
+
+def _from_csv(line: str, columns) -> Dict:
+    # Una fila por línea (sin saltos de línea dentro de campos entre comillas).
+    values = next(csv.reader([line]))
+    if len(values) > len(columns):
+        raise ValueError(f"{len(values)} columnas, se esperaban {len(columns)}")
+    row = dict(zip(columns, values))
+    for k in ("birthYear", "deathYear"):
+        if row.get(k) in ("", r"\N"):
+            row[k] = None
+    return row
+
+
+async def parse_rows(fmt: str, lines: AsyncIterator[Tuple[int, Optional[bytes]]]
+                     ) -> AsyncIterator[Tuple[int, Optional[NameBasicIn], Optional[str]]]:
+    """Devuelve (línea, fila válida, None) o (línea, None, error). En CSV la primera
+    línea se toma como encabezado si su primer campo es 'nconst'. Las líneas
+    demasiado largas o con UTF-8 inválido se rechazan como cualquier otra fila."""
+    columns = CSV_COLUMNS
+    first = True
+    async for lineno, raw in lines:
+        try:
+            if raw is None:
+                raise ValueError(f"línea de más de {STREAM_MAX_LINE} bytes")
+            try:
+                line = raw.decode("utf-8").rstrip("\r")
+            except UnicodeDecodeError as e:
+                raise ValueError(f"UTF-8 inválido en el byte {e.start + 1}") from None
+            if not line.strip():
+                continue
+            if fmt == "csv":
+                if first and line.split(",", 1)[0].strip().strip('"') == "nconst":
+                    first = False
+                    columns = tuple(c.strip() for c in next(csv.reader([line])))
+                    continue
+                data = _from_csv(line, columns)
+            else:
+                data = _from_ndjson(line)
+            yield lineno, NameBasicIn(**data), None
+        except ValidationError as e:
+            err = "; ".join(f"{'.'.join(map(str, x['loc']))}: {x['msg']}" for x in e.errors())
+            yield lineno, None, err
+        except ValueError as e:
+            yield lineno, None, str(e)
+        first = False
+
+
+async def chunked(rows, size: int) -> AsyncIterator[Tuple[List, List]]:
+    """Agrupa la salida de parse_rows en lotes de `size` filas válidas.
+    Cada lote es (filas, rechazos [(línea, error)]) y se entrega apenas se llena."""
+    ok: List[NameBasicIn] = []
+    rejects: List[Tuple[int, str]] = []
+    async for lineno, item, err in rows:
+        if item is None:
+            rejects.append((lineno, err))
+        else:
+            ok.append(item)
+        if len(ok) >= size or len(rejects) >= size:
+            yield ok, rejects
+            ok, rejects = [], []
+    if ok or rejects:
+        yield ok, rejects
@@ -1,8 +1,27 @@
 # app/main.py
-from fastapi import FastAPI, HTTPException
-from app.models import NameBasicIn, BatchIn
-from app.db import run_write, run_write_many, pool  # importa db.py
-from app.backup_logs import router as backup_logs_router
+import os
+import json
+import time
+import tempfile
+from typing import List, Optional
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
+from app.models import NameBasicIn, BatchIn, NameBasicOut, NameBasicsOut, validate_batch_fast
+from app.db import run_write, run_copy_apply, read_status, open_pools, close_pools  # importa db.py
+from app.backup_logs import router as backup_logs_router, r as redis_client, migrate_legacy_logs
+from app import cache
+from app.imdb import router as imdb_router
+from app.backup_scheduler import scheduler as backup_scheduler, BACKUP_SCHEDULER
+from app.batcher import WriteCoalescer, COALESCE
+from app.ingest import iter_lines, parse_rows, chunked
+from app.metrics import REQUEST_LATENCY, render as render_metrics
+
+MAX_MULTI_GET = 500
+STREAM_CHUNK_ROWS = int(os.getenv("NB_STREAM_CHUNK_ROWS", "5000"))  # filas por COPY en /stream
+FAST_VALIDATE = os.getenv("NB_FAST_VALIDATE", "1") == "1"          # validación rápida de /batch
 
 
 INSERT_SQL = """
@@ -19,36 +38,212 @@ SET primaryName = EXCLUDED.primaryName,
     deathYear   = EXCLUDED.deathYear;
 """
 
-app = FastAPI(title="Name Basics API", version="1.0.0")
+# Batch: COPY a una tabla temporal (vive lo que la conexión del pool; se vacía en
+# cada commit) y un solo INSERT ... SELECT. RETURNING (xmax = 0) distingue
+# filas nuevas (true) de actualizadas (false).
+STAGE_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS name_basics_stage (
+    nconst varchar(20), primaryName varchar(512), birthYear smallint, deathYear smallint
+) ON COMMIT DELETE ROWS;
+"""
+STAGE_COPY_SQL = "COPY name_basics_stage (nconst, primaryName, birthYear, deathYear) FROM STDIN"
+MERGE_INSERT_SQL = """
+INSERT INTO name_basics (nconst, primaryName, birthYear, deathYear)
+SELECT nconst, primaryName, birthYear, deathYear FROM name_basics_stage
+ON CONFLICT (nconst) DO NOTHING
+RETURNING true;
+"""
+MERGE_UPSERT_SQL = """
+INSERT INTO name_basics (nconst, primaryName, birthYear, deathYear)
+SELECT nconst, primaryName, birthYear, deathYear FROM name_basics_stage
+ON CONFLICT (nconst) DO UPDATE
+SET primaryName = EXCLUDED.primaryName,
+    birthYear   = EXCLUDED.birthYear,
+    deathYear   = EXCLUDED.deathYear
+RETURNING (xmax = 0);
+"""
+
+# Micro-batching opcional de POST /name_basics (NB_COALESCE=1)
+coalescer = WriteCoalescer(INSERT_SQL, UPSERT_SQL) if COALESCE else None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await open_pools()
+    try:
+        await migrate_legacy_logs()
+    except Exception as e:  # Redis caído no impide arrancar la API
+        print(f"No se pudieron migrar los logs de backup: {e}")
+    if BACKUP_SCHEDULER:
+        backup_scheduler.start()
+    yield
+    await backup_scheduler.stop()
+    if coalescer is not None:
+        await coalescer.close()
+    await close_pools()
+    await redis_client.aclose()
+
+app = FastAPI(title="Name Basics API", version="1.0.0", lifespan=lifespan)
 app.include_router(backup_logs_router)
+app.include_router(imdb_router)
+
+
+@app.middleware("http")
+async def request_latency(request: Request, call_next):
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # la ruta declarada (/name_basics/{nconst}) y no la URL, para no explotar etiquetas
+        route = request.scope.get("route")
+        REQUEST_LATENCY.labels(method=request.method,
+                               route=route.path if route is not None else "sin_ruta",
+                               status=str(status)).observe(time.perf_counter() - t0)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 
 @app.get("/health")
-def health():
-    # opcional: muestra rol actual
+async def health():
+    # rol del nodo que atiende lecturas (réplica si está al día) y su retraso
     try:
-        with pool.connection() as conn, conn.cursor() as cur:
-            cur.execute("SELECT pg_is_in_recovery();")
-            ro = cur.fetchone()[0]
-        return {"status": "ok", "role": "standby" if ro else "primary"}
+        out = {"status": "ok", **(await read_status())}
+        if coalescer is not None:
+            out["coalesce"] = coalescer.stats()
+        if BACKUP_SCHEDULER:
+            out["backups"] = backup_scheduler.stats()
+        return out
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/name_basics")
-def insert_one(item: NameBasicIn, upsert: bool = True):
+async def insert_one(item: NameBasicIn, upsert: bool = True):
     sql = UPSERT_SQL if upsert else INSERT_SQL
+    params = (item.nconst, item.primaryName, item.birthYear, item.deathYear)
     try:
-        run_write(sql, (item.nconst, item.primaryName, item.birthYear, item.deathYear))
+        if coalescer is not None:
+            await coalescer.submit(params, upsert)
+        else:
+            await run_write(sql, params)
+        await cache.invalidate([item.nconst])
         return {"inserted": True, "upsert": upsert, "nconst": item.nconst}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/name_basics/batch")
-def insert_batch(batch: BatchIn):
-    sql = UPSERT_SQL if batch.upsert else INSERT_SQL
+async def _merge(rows, upsert: bool):
+    """COPY a staging + un solo INSERT ... SELECT sobre tuplas (nconst, primaryName,
+    birthYear, deathYear). Devuelve (únicos, insertados, actualizados)."""
+    # un nconst repetido en el payload: con upsert gana el último, sin upsert el primero
+    unique = {}
+    for row in rows:
+        if upsert or row[0] not in unique:
+            unique[row[0]] = row
+    sql = MERGE_UPSERT_SQL if upsert else MERGE_INSERT_SQL
+    result = await run_copy_apply(STAGE_SQL, STAGE_COPY_SQL, unique.values(), sql)
+    await cache.invalidate(unique)
+    inserted = sum(1 for (new,) in result if new)
+    return len(unique), inserted, len(result) - inserted
+
+# El body se valida a mano (validate_batch_fast) o con BatchIn según NB_FAST_VALIDATE;
+# el esquema se declara aparte para que /docs lo siga mostrando.
+_BATCH_SCHEMA = BatchIn.model_json_schema(ref_template="#/components/schemas/{model}")
+_BATCH_SCHEMA.pop("$defs", None)
+
+@app.post("/name_basics/batch", openapi_extra={"requestBody": {
+    "required": True, "content": {"application/json": {"schema": _BATCH_SCHEMA}}}})
+async def insert_batch(request: Request):
+    try:
+        body = await request.json()
+    except json.JSONDecodeError as e:
+        # mismo error que da FastAPI con un body declarado
+        raise RequestValidationError([{"type": "json_invalid", "loc": ("body", e.pos),
+                                       "msg": "JSON decode error", "input": {},
+                                       "ctx": {"error": e.msg}}])
+    try:
+        if FAST_VALIDATE:
+            rows, upsert = validate_batch_fast(body)
+        else:
+            batch = BatchIn.model_validate(body, from_attributes=True)
+            rows = [(it.nconst, it.primaryName, it.birthYear, it.deathYear) for it in batch.items]
+            upsert = batch.upsert
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)], body=body)
+    try:
+        unique, inserted, updated = await _merge(rows, upsert)
+        return {"count": len(rows), "upsert": upsert, "unique": unique,
+                "inserted": inserted, "updated": updated}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/name_basics/stream")
+async def insert_stream(request: Request, upsert: bool = True, format: Optional[str] = None,
+                        chunk_rows: int = Query(STREAM_CHUNK_ROWS, ge=1, le=100_000)):
+    """Ingesta de NDJSON o CSV (nconst,primaryName,birthYear,deathYear) de cualquier tamaño.
+    El cuerpo se lee por pedazos y se carga por lotes de `chunk_rows` filas (un commit
+    por lote). La respuesta es NDJSON: una línea por rechazo, una por lote y un total."""
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format debe ser 'csv' o 'ndjson'")
+
+    # El resumen se escribe a un archivo temporal (en memoria hasta 1 MB) y se devuelve
+    # al final: el cuerpo tiene que leerse completo antes de empezar la respuesta, porque
+    # StreamingResponse escucha la desconexión con receive() y se comería el request.
+    out = tempfile.SpooledTemporaryFile(max_size=1 << 20, mode="w+", encoding="utf-8")
+    totals = {"rows": 0, "rejected": 0, "unique": 0, "inserted": 0, "updated": 0,
+              "chunks": 0, "failed_chunks": 0}
+    rows = parse_rows(fmt, iter_lines(request.stream()))
+    async for items, rejects in chunked(rows, chunk_rows):
+        for lineno, err in rejects:
+            out.write(json.dumps({"line": lineno, "error": err}) + "\n")
+        totals["rejected"] += len(rejects)
+        if not items:
+            continue
+        totals["chunks"] += 1
+        totals["rows"] += len(items)
+        try:
+            unique, inserted, updated = await _merge(
+                ((it.nconst, it.primaryName, it.birthYear, it.deathYear) for it in items), upsert)
+        except Exception as e:
+            # el lote completo queda sin cargar; se informa y se sigue con el resto
+            totals["failed_chunks"] += 1
+            out.write(json.dumps({"chunk": totals["chunks"], "rows": len(items), "error": str(e)}) + "\n")
+            continue
+        totals["unique"] += unique
+        totals["inserted"] += inserted
+        totals["updated"] += updated
+        out.write(json.dumps({"chunk": totals["chunks"], "rows": len(items),
+                              "inserted": inserted, "updated": updated}) + "\n")
+    out.write(json.dumps({"done": True, "upsert": upsert, **totals}) + "\n")
+    out.seek(0)
+
+    def summary():
+        with out:
+            yield from out
+
+    return StreamingResponse(summary(), media_type="application/x-ndjson")
+
+@app.get("/name_basics", response_model=NameBasicsOut)
+async def get_many(nconst: List[str] = Query(..., max_length=MAX_MULTI_GET)):
+    # ej. /name_basics?nconst=nm0000001&nconst=nm0000002
+    try:
+        found = await cache.get_many(nconst)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"items": [v for v in found.values() if v is not None],
+            "missing": [k for k, v in found.items() if v is None]}
+
+@app.get("/name_basics/{nconst}", response_model=NameBasicOut)
+async def get_one(nconst: str):
     try:
-        params_seq = [(it.nconst, it.primaryName, it.birthYear, it.deathYear) for it in batch.items]
-        run_write_many(sql, params_seq)
-        return {"count": len(batch.items), "upsert": batch.upsert}
+        item = await cache.get_one(nconst)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if item is None:
+        raise HTTPException(status_code=404, detail=f"{nconst} no existe")
+    return item
@@ -0,0 +1,77 @@
+# app/metrics.py
+# Métricas estilo Prometheus (GET /metrics): latencia por ruta, espera del pool,
+# tiempo de execute/commit, estado de los pools, failovers y latencia de Redis.
+import time
+from contextlib import asynccontextmanager
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+
+# Cubos pensados para la API: de 0.5 ms a 10 s
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_LATENCY = Histogram(
+    "api_request_seconds", "Latencia de cada request (ruta declarada, no la URL)",
+    ["method", "route", "status"], buckets=BUCKETS)
+POOL_WAIT = Histogram(
+    "db_pool_wait_seconds", "Espera para obtener una conexión con pool.connection()",
+    ["pool"], buckets=BUCKETS)
+SQL_EXECUTE = Histogram(
+    "db_execute_seconds", "Tiempo de execute/executemany/copy", ["pool", "op"], buckets=BUCKETS)
+SQL_COMMIT = Histogram(
+    "db_commit_seconds", "Tiempo de commit", ["pool"], buckets=BUCKETS)
+FAILOVERS = Counter(
+    "db_failover_retries_total", "Escrituras reintentadas tras ReadOnlySqlTransaction", ["op"])
+READ_FALLBACKS = Counter(
+    "db_read_fallbacks_total", "Lecturas que fallaron en la réplica y se repitieron en el primario")
+REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds", "Último retraso medido de la réplica (-1 si no responde)")
+REDIS_LATENCY = Histogram(
+    "redis_command_seconds", "Latencia de comandos/pipelines de Redis", ["command"], buckets=BUCKETS)
+
+
+@asynccontextmanager
+async def timed(histogram, **labels):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(**labels).observe(time.perf_counter() - t0)
+
+async def redis_timed(command: str, awaitable):
+    """await de un comando de Redis registrando su latencia."""
+    t0 = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        REDIS_LATENCY.labels(command=command).observe(time.perf_counter() - t0)
+
+
+class _PoolCollector:
+    """Lee pool.get_stats() en cada scrape (tamaño, conexiones libres, esperando)."""
+    STATS = {
+        "pool_min": "db_pool_min", "pool_max": "db_pool_max", "pool_size": "db_pool_size",
+        "pool_available": "db_pool_idle", "requests_waiting": "db_pool_waiting",
+    }
+
+    def __init__(self, pools):
+        self.pools = pools  # {"primary": pool, "replica": read_pool}
+
+    def collect(self):
+        families = {name: GaugeMetricFamily(name, f"pool.get_stats()['{key}']", labels=["pool"])
+                    for key, name in self.STATS.items()}
+        for label, p in self.pools.items():
+            if p is None:
+                continue
+            stats = p.get_stats()
+            for key, name in self.STATS.items():
+                if key in stats:
+                    families[name].add_metric([label], stats[key])
+        yield from families.values()
+
+def register_pools(pools):
+    REGISTRY.register(_PoolCollector(pools))
+
+
+def render():
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -1,5 +1,5 @@
-from typing import Optional, List
-from pydantic import BaseModel, Field, constr
+from typing import Any, Optional, List, Tuple
+from pydantic import BaseModel, Field, ValidationError, constr
 
 class NameBasicIn(BaseModel):
     nconst: constr(strip_whitespace=True, min_length=2, max_length=20)
@@ -10,3 +10,150 @@ class NameBasicIn(BaseModel):
 class BatchIn(BaseModel):
     items: List[NameBasicIn]
     upsert: bool = True  # si True, hace ON CONFLICT DO UPDATE
+
+
+# --------------------------------------------------------------------
+# Validación rápida de batches
+# --------------------------------------------------------------------
+# Revisa el JSON crudo item por item sin construir un NameBasicIn por fila y
+# devuelve directamente las tuplas para el COPY. Solo acepta en el camino rápido
+# lo que NameBasicIn aceptaría sin convertir nada (str dentro de los largos tras
+# strip, int dentro del rango o null); cualquier otro caso pasa por el modelo, así
+# las coerciones y los errores (tipo, mensaje y loc) son exactamente los mismos.
+def validate_batch_fast(body: Any) -> Tuple[List[tuple], bool]:
+    """Valida un BatchIn crudo (dict de json.loads) y devuelve (filas, upsert).
+    Lanza ValidationError con los mismos errores que BatchIn, con loc ("items", i, campo)."""
+    if (type(body) is not dict or type(body.get("items")) is not list
+            or type(body.get("upsert", True)) is not bool):
+        batch = BatchIn.model_validate(body, from_attributes=True)  # lanza el error estándar
+        return [(it.nconst, it.primaryName, it.birthYear, it.deathYear) for it in batch.items], batch.upsert
+
+    rows: List[tuple] = []
+    append = rows.append
+    errors = []
+    # chequeos en línea (sin llamadas por campo): es el bucle caliente
+    for i, item in enumerate(body["items"]):
+        if type(item) is dict:
+            nconst = item.get("nconst")
+            name = item.get("primaryName")
+            by = item.get("birthYear")
+            dy = item.get("deathYear")
+            if type(nconst) is str and type(name) is str:
+                nconst = nconst.strip()
+                name = name.strip()
+                if (2 <= len(nconst) <= 20 and 1 <= len(name) <= 512
+                        and (by is None or (type(by) is int and 0 <= by <= 9999))
+                        and (dy is None or (type(dy) is int and 0 <= dy <= 9999))):
+                    append((nconst, name, by, dy))
+                    continue
+        try:
+            it = NameBasicIn.model_validate(item, from_attributes=True)
+            rows.append((it.nconst, it.primaryName, it.birthYear, it.deathYear))
+        except ValidationError as e:
+            for err in e.errors(include_url=False):
+                errors.append({**err, "loc": ("items", i, *err["loc"])})
+    if errors:
+        raise ValidationError.from_exception_data(BatchIn.__name__, errors)
+    return rows, body.get("upsert", True)
+
+
+class NameBasicOut(BaseModel):
+    nconst: str
+    primaryName: str
+    birthYear: Optional[int] = None
+    deathYear: Optional[int] = None
+
+class NameBasicsOut(BaseModel):
+    items: List[NameBasicOut]
+    missing: List[str]  # nconst pedidos que no existen
+
+
+# --------------------------------------------------------------------
+# Consultas de solo lectura sobre el resto del esquema (app/imdb.py)
+# --------------------------------------------------------------------
+class RatingOut(BaseModel):
+    averageRating: float
+    numVotes: int
+
+class TitleOut(BaseModel):
+    tconst: str
+    titleType: str
+    primaryTitle: str
+    originalTitle: str
+    isAdult: bool
+    startYear: Optional[int] = None
+    endYear: Optional[int] = None
+    runtimeMinutes: Optional[int] = None
+    genres: List[str]
+    rating: Optional[RatingOut] = None
+    directors: List[str]
+    writers: List[str]
+
+class FilmographyItem(BaseModel):
+    tconst: str
+    ordering: int
+    category: str
+    job: Optional[str] = None
+    characters: Optional[str] = None
+    titleType: str
+    primaryTitle: str
+    startYear: Optional[int] = None
+    rating: Optional[RatingOut] = None
+
+class FilmographyPage(BaseModel):
+    items: List[FilmographyItem]
+    next: Optional[str] = None  # cursor de la página siguiente (null en la última)
+
+class EpisodeItem(BaseModel):
+    tconst: str
+    seasonNumber: Optional[int] = None
+    episodeNumber: Optional[int] = None
+    primaryTitle: Optional[str] = None
+    startYear: Optional[int] = None
+    rating: Optional[RatingOut] = None
+
+class EpisodesPage(BaseModel):
+    items: List[EpisodeItem]
+    next: Optional[str] = None
+
+class TitleHit(BaseModel):
+    tconst: str
+    primaryTitle: str
+    matched: str  # texto que coincidió (primaryTitle o un AKA)
+    titleType: str
+    startYear: Optional[int] = None
+    rating: Optional[RatingOut] = None
+    score: float
+
+class NameHit(BaseModel):
+    nconst: str
+    primaryName: str
+    birthYear: Optional[int] = None
+    deathYear: Optional[int] = None
+    score: float
+
+class SearchOut(BaseModel):
+    titles: List[TitleHit]
+    names: List[NameHit]
+
+class GenreStat(BaseModel):
+    genre: str
+    startYear: Optional[int] = None  # solo con by=year (null = sin año)
+    titles: int
+    rated: int
+    votes: int
+    avgRating: Optional[float] = None
+    weightedRating: Optional[float] = None  # ponderado por numVotes
+
+class GenreStatsOut(BaseModel):
+    items: List[GenreStat]
+
+class TopRatedItem(BaseModel):
+    tconst: str
+    primaryTitle: str
+    startYear: Optional[int] = None
+    rating: RatingOut
+
+class TopRatedOut(BaseModel):
+    genre: str
+    items: List[TopRatedItem]
@@ -0,0 +1,117 @@
+# bench_api.py
+# Benchmark de la API con la misma mezcla de tareas que locustfile.py
+# (3 inserts individuales por cada batch de LOCUST_BATCH_SIZE), pero con un
+# cliente asyncio para medir la API y no al generador de carga.
+#
+#   pip install -r requirements.txt   (incluye httpx)
+#   python bench_api.py --host http://localhost:8000 --users 100 --duration 30 --out after.json
+#   python bench_api.py --host http://localhost:8000 --users 100 --compare before.json
+#
+# Los registros y la espera entre tareas (between(1.0, 2.0)) salen de synthetic.py,
+# igual que en locustfile; con --wait 0 no espera, para medir el máximo de
+# requests/s con esos usuarios.
+import json
+import time
+import random
+import asyncio
+import argparse
+from typing import Dict, List, Optional
+
+import httpx
+
+from synthetic import BATCH_SIZE, WAIT, synthetic_record, synthetic_batch
+
+TASKS = [("POST /name_basics", 3), ("POST /name_basics/batch", 1)]
+
+
+async def _user(client: httpx.AsyncClient, stop_at: float, wait, lat: Dict[str, List[float]],
+                errors: Dict[str, int]):
+    names = [n for n, w in TASKS for _ in range(w)]
+    while time.perf_counter() < stop_at:
+        name = random.choice(names)
+        if name == "POST /name_basics":
+            req = client.post("/name_basics", json=synthetic_record())
+        else:
+            items = synthetic_batch(BATCH_SIZE)
+            req = client.post("/name_basics/batch", json={"items": items, "upsert": True})
+        t0 = time.perf_counter()
+        try:
+            resp = await req
+            ok = resp.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        lat[name].append(time.perf_counter() - t0)
+        if not ok:
+            errors[name] += 1
+        if wait:
+            await asyncio.sleep(random.uniform(*wait))
+
+
+def _pct(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def _summary(lat: Dict[str, List[float]], errors: Dict[str, int], elapsed: float) -> Dict:
+    out = {}
+    everything = [v for vs in lat.values() for v in vs]
+    for name, vs in list(lat.items()) + [("Aggregated", everything)]:
+        out[name] = {
+            "requests": len(vs),
+            "failures": errors.get(name, 0) if name != "Aggregated" else sum(errors.values()),
+            "rps": len(vs) / elapsed if elapsed else 0.0,
+            "p50_ms": _pct(vs, 50) * 1000,
+            "p99_ms": _pct(vs, 99) * 1000,
+        }
+    return out
+
+def _print(summary: Dict, base: Optional[Dict] = None):
+    print(f"{'endpoint':<28} {'reqs':>8} {'fallos':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, s in summary.items():
+        line = (f"{name:<28} {s['requests']:>8} {s['failures']:>7} {s['rps']:>9.1f} "
+                f"{s['p50_ms']:>9.1f} {s['p99_ms']:>9.1f}")
+        if base and name in base:
+            b = base[name]
+            line += (f"   req/s x{s['rps'] / b['rps']:.2f}" if b["rps"] else "")
+            line += (f"  p99 x{s['p99_ms'] / b['p99_ms']:.2f}" if b["p99_ms"] else "")
+        print(line)
+
+
+async def run(host: str, users: int, duration: float, wait) -> Dict:
+    lat = {n: [] for n, _ in TASKS}
+    errors = {n: 0 for n, _ in TASKS}
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=host, timeout=30, limits=limits) as client:
+        t0 = time.perf_counter()
+        stop_at = t0 + duration
+        await asyncio.gather(*(_user(client, stop_at, wait, lat, errors) for _ in range(users)))
+        elapsed = time.perf_counter() - t0
+    return _summary(lat, errors, elapsed)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de requests/s y p99 de la API")
+    ap.add_argument("--host", default="http://localhost:8000")
+    ap.add_argument("--users", type=int, default=100, help="usuarios concurrentes")
+    ap.add_argument("--duration", type=float, default=30, help="segundos de prueba")
+    ap.add_argument("--wait", default=",".join(f"{w:g}" for w in WAIT),
+                    help="espera entre tareas 'min,max' en s (0 = sin espera)")
+    ap.add_argument("--out", help="guarda el resumen en JSON")
+    ap.add_argument("--compare", help="JSON de una corrida anterior para comparar")
+    args = ap.parse_args()
+
+    wait = tuple(float(x) for x in args.wait.split(",")) if args.wait != "0" else None
+    summary = asyncio.run(run(args.host, args.users, args.duration, wait))
+    base = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            base = json.load(f)
+    _print(summary, base)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# bench_locust.py
+# Corre locustfile.py sin interfaz (headless) en escenarios fijos de usuarios y
+# LOCUST_BATCH_SIZE, guarda throughput, p50/p95/p99 y tasa de errores en JSON y,
+# con --baseline, falla (exit 1) si el throughput de algún escenario cae más de
+# --threshold respecto a la corrida de referencia.
+#
+#   pip install locust
+#   python bench_locust.py --start-api --out base.json                 # primera vez
+#   python bench_locust.py --start-api --baseline base.json            # en cada cambio
+#   python bench_locust.py --scenarios 50x50,200x1000 --duration 60 --host http://localhost:8000
+#
+# Con --start-api levanta uvicorn app.main:app con el .env/entorno actual (Postgres
+# local de docker-compose) y lo apaga al terminar.
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+from typing import Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SCENARIOS = "50x50,100x50,100x500"   # usuarios x LOCUST_BATCH_SIZE
+ENDPOINTS = ("POST /name_basics", "POST /name_basics/batch", "Aggregated")
+
+
+def _scenarios(spec: str) -> List[Dict]:
+    out = []
+    for part in spec.split(","):
+        users, batch = part.strip().lower().split("x")
+        out.append({"name": f"u{users}_b{batch}", "users": int(users), "batch": int(batch)})
+    return out
+
+
+def _read_stats(path: str) -> Dict:
+    """Lee <prefijo>_stats.csv de Locust (tiempos en ms)."""
+    out = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row["Name"] not in ENDPOINTS:
+                continue
+            reqs = int(row["Request Count"])
+            fails = int(row["Failure Count"])
+            out[row["Name"]] = {
+                "requests": reqs,
+                "failures": fails,
+                "error_rate": fails / reqs if reqs else 0.0,
+                "rps": float(row["Requests/s"]),
+                "p50_ms": float(row["50%"] or 0),
+                "p95_ms": float(row["95%"] or 0),
+                "p99_ms": float(row["99%"] or 0),
+            }
+    return out
+
+
+def run_scenario(sc: Dict, host: str, duration: int, spawn_rate: float, workdir: str) -> Dict:
+    prefix = os.path.join(workdir, sc["name"])
+    env = dict(os.environ, LOCUST_BATCH_SIZE=str(sc["batch"]))
+    cmd = [sys.executable, "-m", "locust", "-f", os.path.join(HERE, "locustfile.py"),
+           "--headless", "--only-summary", "--host", host,
+           "-u", str(sc["users"]), "-r", str(spawn_rate or sc["users"]), "-t", f"{duration}s",
+           "--csv", prefix]
+    print(f"== {sc['name']}: {sc['users']} usuarios, batch {sc['batch']}, {duration}s")
+    # Locust sale con 1 si hubo fallas; igual se leen las estadísticas
+    subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, check=False)
+    return {**sc, "duration_s": duration, "stats": _read_stats(prefix + "_stats.csv")}
+
+
+def _start_api(port: int):
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                             "--log-level", "warning"], cwd=HERE)
+    for _ in range(60):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=2)
+            return proc
+        except Exception:
+            time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("la API no respondió en /health")
+
+
+def _print(results: List[Dict], base: Dict):
+    print(f"\n{'escenario':<14} {'endpoint':<26} {'req/s':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'err%':>6}")
+    for r in results:
+        for name, s in r["stats"].items():
+            line = (f"{r['name']:<14} {name:<26} {s['rps']:>8.1f} {s['p50_ms']:>7.0f} "
+                    f"{s['p95_ms']:>7.0f} {s['p99_ms']:>7.0f} {s['error_rate'] * 100:>6.2f}")
+            prev = base.get(r["name"], {}).get("stats", {}).get(name)
+            if prev and prev["rps"]:
+                line += f"   req/s x{s['rps'] / prev['rps']:.2f}"
+            print(line)
+
+
+def _regressions(results: List[Dict], base: Dict, threshold: float):
+    out = []
+    for r in results:
+        cur = r["stats"].get("Aggregated")
+        prev = base.get(r["name"], {}).get("stats", {}).get("Aggregated")
+        if cur and prev and prev["rps"] and cur["rps"] < prev["rps"] * (1 - threshold):
+            out.append((r["name"], cur["rps"], prev["rps"]))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark headless de locustfile.py")
+    ap.add_argument("--host", default="http://127.0.0.1:8000")
+    ap.add_argument("--scenarios", default=DEFAULT_SCENARIOS, help="lista usuarios x batch, ej. 50x50,100x500")
+    ap.add_argument("--duration", type=int, default=60, help="segundos por escenario")
+    ap.add_argument("--spawn-rate", type=float, default=0, help="usuarios/s al arrancar (0 = todos de una)")
+    ap.add_argument("--start-api", action="store_true", help="levanta uvicorn app.main:app en el puerto de --host")
+    ap.add_argument("--out", help="guarda los resultados en JSON")
+    ap.add_argument("--baseline", help="JSON de referencia para detectar regresiones")
+    ap.add_argument("--threshold", type=float, default=0.10,
+                    help="caída máxima aceptada de req/s (0.10 = 10%%)")
+    args = ap.parse_args()
+
+    api = _start_api(int(args.host.rsplit(":", 1)[1].split("/")[0])) if args.start_api else None
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            results = [run_scenario(sc, args.host, args.duration, args.spawn_rate, tmp)
+                       for sc in _scenarios(args.scenarios)]
+    finally:
+        if api is not None:
+            api.terminate()
+            api.wait(timeout=30)
+
+    base = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            base = {r["name"]: r for r in json.load(f)["scenarios"]}
+    _print(results, base)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"host": args.host, "scenarios": results}, f, indent=2)
+
+    if args.baseline:
+        bad = _regressions(results, base, args.threshold)
+        for name, cur, prev in bad:
+            print(f"REGRESIÓN {name}: {cur:.1f} req/s vs {prev:.1f} de base ({(1 - cur / prev) * 100:.0f}% menos)")
+        if bad:
+            sys.exit(1)
+        print(f"Sin regresiones de más de {args.threshold:.0%} respecto a {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# bench_search.py
+# Latencia de GET /search medida en la base (sin API ni Redis): corre
+# SEARCH_TITLES_SQL y SEARCH_NAMES_SQL con EXPLAIN (ANALYZE, BUFFERS) para una lista
+# de consultas, con los mismos parámetros que arma el endpoint, y reporta el tiempo
+# de planificación + ejecución (p50/p95/máx) contra el objetivo de 50 ms.
+#
+#   python bench_search.py                            # consultas de ejemplo
+#   python bench_search.py --sample 200 --repeat 3    # títulos/nombres reales al azar
+#   python bench_search.py --plan "star wars"         # plan completo de una consulta
+#
+# Usa DATABASE_READ_URL si está definida (como las lecturas de la API), si no
+# DATABASE_URL (con el mismo search_path). Correr después de carga_masiva, con los
+# idx_search_* ya creados.
+import os
+import sys
+import json
+import argparse
+from typing import Dict, List, Tuple
+
+import psycopg
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app.imdb import SEARCH_TITLES_SQL, SEARCH_NAMES_SQL, search_params  # noqa: E402
+
+# (q, prefix): términos comunes, raros, con errores de tipeo y autocompletar
+QUERIES = [("the", False), ("love", False), ("star wars", False), ("the godfather", False),
+           ("godfater", False), ("shawshenk redemption", False), ("amelie", False),
+           ("tom hanks", False), ("scorsese", False), ("star wa", True), ("the lord of", True),
+           ("mar", True)]
+SQL = {"titles": SEARCH_TITLES_SQL, "names": SEARCH_NAMES_SQL}
+
+
+def _sample(conn, n: int) -> List[Tuple[str, bool]]:
+    """Consultas sacadas de la base: 1 a 3 palabras de títulos y nombres al azar,
+    la mitad como prefijo (la última palabra cortada)."""
+    rows = conn.execute("""
+        (SELECT primaryTitle FROM title_basics TABLESAMPLE SYSTEM (1) LIMIT %(n)s)
+        UNION ALL
+        (SELECT primaryName FROM name_basics TABLESAMPLE SYSTEM (1) LIMIT %(n)s)
+    """, {"n": (n + 1) // 2}).fetchall()
+    out = []
+    for i, (text,) in enumerate(rows):
+        words = text.split()[:1 + i % 3]
+        if i % 2 and len(words[-1]) > 3:
+            words[-1] = words[-1][:len(words[-1]) // 2 + 1]
+            out.append((" ".join(words), True))
+        else:
+            out.append((" ".join(words), False))
+    return out[:n]
+
+def _explain(conn, sql: str, params: dict, analyze: bool = True, fmt: str = "JSON"):
+    opts = "ANALYZE, BUFFERS, " if analyze else ""
+    return conn.execute(f"EXPLAIN ({opts}FORMAT {fmt}) {sql}", params).fetchall()
+
+def _ms(conn, sql: str, params: dict) -> float:
+    plan = _explain(conn, sql, params)[0][0]
+    plan = plan[0] if isinstance(plan, list) else json.loads(plan)[0]
+    return plan["Planning Time"] + plan["Execution Time"]
+
+def _pct(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE de las consultas de /search")
+    parser.add_argument("--dsn", default=os.getenv("DATABASE_READ_URL") or os.getenv("DATABASE_URL"))
+    parser.add_argument("--sample", type=int, default=0, help="consultas al azar desde la base (0 = QUERIES)")
+    parser.add_argument("--repeat", type=int, default=3, help="corridas por consulta (se toma la mejor)")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=50.0, help="objetivo en ms por consulta")
+    parser.add_argument("--plan", metavar="Q", help="imprime el plan de títulos y nombres para Q")
+    parser.add_argument("--prefix", action="store_true", help="con --plan: Q como autocompletar")
+    args = parser.parse_args()
+    if not args.dsn:
+        raise SystemExit("definir DATABASE_URL o --dsn")
+
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        if args.plan:
+            params = search_params(args.plan, args.prefix, args.limit)
+            if params is None:
+                raise SystemExit("q no tiene términos buscables")
+            for kind, sql in SQL.items():
+                print(f"--- {kind}")
+                for (line,) in _explain(conn, sql, params, fmt="TEXT"):
+                    print(line)
+            return
+
+        queries = _sample(conn, args.sample) if args.sample else QUERIES
+        times: Dict[str, List[float]] = {k: [] for k in SQL}
+        over = []
+        print(f"{'consulta':<32} {'prefijo':>7} {'títulos ms':>11} {'nombres ms':>11}")
+        for q, prefix in queries:
+            params = search_params(q, prefix, args.limit)
+            if params is None:
+                continue
+            row = {}
+            for kind, sql in SQL.items():
+                _ms(conn, sql, params)   # calienta caché de páginas y plan
+                row[kind] = min(_ms(conn, sql, params) for _ in range(max(1, args.repeat)))
+                times[kind].append(row[kind])
+                if row[kind] > args.budget:
+                    over.append((q, prefix, kind, row[kind]))
+            print(f"{q[:32]:<32} {'sí' if prefix else 'no':>7} {row['titles']:>11.2f} {row['names']:>11.2f}")
+
+        print()
+        for kind, values in times.items():
+            if values:
+                print(f"{kind:<8} n={len(values):<5} p50={_pct(values, 50):8.2f} ms  "
+                      f"p95={_pct(values, 95):8.2f} ms  máx={max(values):8.2f} ms")
+        if over:
+            print(f"\n{len(over)} consultas sobre {args.budget:.0f} ms:")
+            for q, prefix, kind, ms in over:
+                print(f"  {kind:<7} {ms:8.2f} ms  {q!r}{' (prefijo)' if prefix else ''}")
+            sys.exit(1)
+        print(f"\ntodas bajo {args.budget:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
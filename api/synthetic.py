@@ -0,0 +1,62 @@
+# synthetic.py
+# Generadores de registros de name_basics compartidos por locustfile.py y
+# bench_api.py (sin importar locust: su monkey-patching de gevent rompe asyncio).
+import os
+import random
+import itertools
+from typing import List, Dict, Optional
+
+FIRST = ["Ana","Luis","María","Carlos","Sofía","Jorge","Elena","Mateo","Lucía","Diego"]
+LAST  = ["García","Hernández","Martínez","López","González","Pérez","Rodríguez","Sánchez","Ramírez","Flores"]
+
+
+# --- Config ---
+# Espera de cada usuario entre tareas, en segundos (between(...) de locust)
+WAIT = (1.0, 2.0)
+BATCH_SIZE = int(os.getenv("LOCUST_BATCH_SIZE", "50"))
+# name.basics.tsv de carga_masiva/generar_imdb.py; si se define, se envían esas filas
+NAME_BASICS_TSV = os.getenv("LOCUST_NAME_BASICS", "")
+
+# Un offset aleatorio por proceso para evitar colisiones si corres en distribuido
+_BASE_OFFSET = random.randint(0, 9_000_000)
+_counter = itertools.count(start=_BASE_OFFSET)
+
+def _nconst_next() -> str:
+    """Genera nm + 7 dígitos, evitando (en lo posible) colisiones por proceso."""
+    i = next(_counter) % 10_000_000  # aseguramos 7 dígitos
+    return f"nm{i:07d}"
+
+def random_person_name():
+    return f"{random.choice(FIRST)} {random.choice(LAST)}"
+
+def _tsv_records():
+    """Recorre name.basics.tsv en ciclo (streaming, sin cargarlo en memoria)."""
+    def _int(v: str) -> Optional[int]:
+        return None if v == "\\N" else int(v)
+    while True:
+        with open(NAME_BASICS_TSV, encoding="utf-8") as f:
+            next(f)  # encabezado
+            for line in f:
+                nconst, name, by, dy = line.rstrip("\n").split("\t")[:4]
+                yield {"nconst": nconst, "primaryName": name, "birthYear": _int(by), "deathYear": _int(dy)}
+
+_tsv = _tsv_records() if NAME_BASICS_TSV else None
+
+def synthetic_record() -> Dict:
+    if _tsv is not None:
+        return next(_tsv)
+    by = random.randint(1850, 2010)
+    # 75% sin deathYear; si lo tiene, que sea >= birthYear
+    if random.random() < 0.75:
+        dy: Optional[int] = None
+    else:
+        dy = random.randint(max(by, 1900), 2024)
+    return {
+        "nconst": _nconst_next(),
+        "primaryName": random_person_name(),
+        "birthYear": by,
+        "deathYear": dy,
+    }
+
+def synthetic_batch(k: int) -> List[Dict]:
+    return [synthetic_record() for _ in range(k)]
@@ -0,0 +1,8 @@
+# tests/conftest.py
+# Las pruebas importan `app` desde api/ sin levantar Postgres ni Redis: los pools
+# se crean cerrados y cada prueba reemplaza lo que necesita.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "host=localhost dbname=bases2_proyectos")
@@ -0,0 +1,89 @@
+# tests/test_backup_scheduler.py
+# BackupScheduler contra script_apoyo/fake_pgbackrest.py; Redis se reemplaza por un dict.
+import os
+import sys
+import json
+import shlex
+import asyncio
+
+import pytest
+
+from app import backup_scheduler as bs
+
+FAKE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                    "script_apoyo", "fake_pgbackrest.py")
+
+
+class FakeStore:
+    def __init__(self):
+        self.docs = {}     # label -> entrada registrada
+        self.down = False  # simula Redis caído
+
+    async def store_many(self, entries):
+        if self.down:
+            raise ConnectionError("redis caído")
+        out = []
+        for e in entries:
+            new = e.label not in self.docs
+            self.docs.setdefault(e.label, e)
+            out.append((new, {"id": e.label, "label": e.label, "type": e.type}))
+        return out
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    state = tmp_path / "pgbackrest.json"
+    monkeypatch.setenv("FAKE_PGBACKREST_STATE", str(state))
+    monkeypatch.setenv("FAKE_PGBACKREST_SECONDS", "0")
+    monkeypatch.setenv("FAKE_PGBACKREST_FAIL", "0")
+    store = FakeStore()
+    monkeypatch.setattr(bs, "store_many", store.store_many)
+    sched = bs.BackupScheduler(bs.parse_stanzas("s1@pg1/db"), {"full": 3600}, retry=0,
+                               cmd=f"{shlex.quote(sys.executable)} {shlex.quote(FAKE)}")
+    return sched, sched.stanzas[0], store, state
+
+def _backups(state):
+    raw = state.read_text() if state.exists() else ""
+    return json.loads(raw).get("s1", []) if raw.strip() else []
+
+
+def test_watermark_advances_only_after_success(env, monkeypatch):
+    sched, st, store, state = env
+    monkeypatch.setenv("FAKE_PGBACKREST_FAIL", "1")
+    assert asyncio.run(sched.tick(st)) == ["full"]
+    assert st.watermark == 0 and not store.docs and not st.last["full"]["ok"]
+
+    monkeypatch.setenv("FAKE_PGBACKREST_FAIL", "0")
+    assert asyncio.run(sched.tick(st)) == ["full"]
+    stop = _backups(state)[-1]["timestamp"]["stop"]
+    assert st.watermark == stop and list(store.docs) == [_backups(state)[-1]["label"]]
+
+def test_watermark_waits_for_redis(env):
+    sched, st, store, state = env
+    store.down = True
+    with pytest.raises(ConnectionError):
+        asyncio.run(sched.tick(st))
+    assert len(_backups(state)) == 1 and st.watermark == 0   # el backup quedó, el registro no
+    store.down = False
+    assert asyncio.run(sched.ingest(st)) == 1
+    assert st.watermark == _backups(state)[-1]["timestamp"]["stop"]
+
+def test_failed_run_is_retried_and_not_recorded(env, monkeypatch):
+    sched, st, store, state = env
+    monkeypatch.setenv("FAKE_PGBACKREST_FAIL", "1")
+    asyncio.run(sched.tick(st))
+    assert not _backups(state) and not store.docs
+    assert st.due["full"] <= bs.time.monotonic()        # retry=0: vence de nuevo ya
+
+    monkeypatch.setenv("FAKE_PGBACKREST_FAIL", "0")
+    assert asyncio.run(sched.tick(st)) == ["full"]       # el reintento
+    assert len(_backups(state)) == 1 and len(store.docs) == 1
+    assert st.due["full"] > bs.time.monotonic() + 3000  # ahora sí espera la ventana
+
+def test_rerun_in_same_window_does_nothing(env):
+    sched, st, store, state = env
+    assert asyncio.run(sched.tick(st)) == ["full"]
+    watermark, docs = st.watermark, dict(store.docs)
+    assert asyncio.run(sched.tick(st)) == []
+    assert len(_backups(state)) == 1
+    assert st.watermark == watermark and store.docs == docs
+    assert asyncio.run(sched.ingest(st)) == 0            # releer info no duplica
@@ -0,0 +1,92 @@
+# tests/test_batcher.py
+# WriteCoalescer con un run_write falso: qué se manda a la base y qué recibe cada llamador.
+import asyncio
+
+import pytest
+
+from app import batcher
+
+SQL = "INSERT INTO t VALUES (%s, %s, %s, %s) ON CONFLICT DO NOTHING"
+
+
+class FakeDB:
+    def __init__(self, bad=()):
+        self.bad = set(bad)   # nconst que la base rechaza
+        self.calls = []       # (filas por sentencia, instante)
+
+    async def run_write(self, sql, params):
+        n = sql.count("(%s, %s, %s, %s)")
+        self.calls.append((n, asyncio.get_running_loop().time()))
+        await asyncio.sleep(0)
+        for nconst in params[::4]:
+            if nconst in self.bad:
+                raise ValueError(f"fila rechazada: {nconst}")
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeDB()
+    monkeypatch.setattr(batcher, "run_write", fake.run_write)
+    return fake
+
+def _row(i):
+    return (f"nm{i:07d}", f"Persona {i}", None, None)
+
+async def _submit_all(co, rows):
+    return await asyncio.gather(*(co.submit(r, upsert=False) for r in rows), return_exceptions=True)
+
+
+def test_each_caller_gets_its_result(db):
+    async def run():
+        co = batcher.WriteCoalescer(SQL, SQL, max_rows=10, max_ms=50)
+        out = await _submit_all(co, [_row(i) for i in range(5)])
+        await co.close()
+        return co, out
+    co, out = asyncio.run(run())
+    assert out == [None] * 5
+    assert [n for n, _ in db.calls] == [5]
+    assert co.stats()["rows"] == 5 and co.stats()["fallbacks"] == 0
+
+def test_failed_batch_falls_back_to_rows(db):
+    db.bad = {"nm0000002", "nm0000004"}
+    async def run():
+        co = batcher.WriteCoalescer(SQL, SQL, max_rows=10, max_ms=5)
+        out = await _submit_all(co, [_row(i) for i in range(6)])
+        await co.close()
+        return co, out
+    co, out = asyncio.run(run())
+    assert [n for n, _ in db.calls] == [6, 1, 1, 1, 1, 1, 1]
+    for i, res in enumerate(out):
+        if f"nm{i:07d}" in db.bad:
+            assert isinstance(res, ValueError) and f"nm{i:07d}" in str(res)
+        else:
+            assert res is None
+    assert co.stats()["fallbacks"] == 1 and co.stats()["rows"] == 4
+
+def test_flush_on_size_limit(db):
+    async def run():
+        co = batcher.WriteCoalescer(SQL, SQL, max_rows=3, max_ms=10_000)
+        t0 = asyncio.get_running_loop().time()
+        out = await asyncio.wait_for(_submit_all(co, [_row(i) for i in range(6)]), 1)
+        await co.close()
+        return t0, out
+    t0, out = asyncio.run(run())
+    assert out == [None] * 6
+    assert [n for n, _ in db.calls] == [3, 3]
+    assert all(t - t0 < 1 for _, t in db.calls)   # no esperó los 10 s del timer
+
+def test_flush_on_time_limit(db):
+    async def run():
+        co = batcher.WriteCoalescer(SQL, SQL, max_rows=100, max_ms=50)
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        first = asyncio.ensure_future(_submit_all(co, [_row(1), _row(2)]))
+        await asyncio.sleep(0.02)
+        assert not db.calls                        # todavía dentro de la ventana
+        await first
+        later = await _submit_all(co, [_row(3)])   # ventana nueva, lote aparte
+        await co.close()
+        return t0, first.result() + later
+    t0, out = asyncio.run(run())
+    assert out == [None] * 3
+    assert [n for n, _ in db.calls] == [2, 1]
+    assert db.calls[0][1] - t0 >= 0.045
@@ -0,0 +1,37 @@
+# tests/test_cache.py
+# Caché de name_basics contra un Redis en memoria (fakeredis) y una lectura de
+# réplica simulada.   pip install pytest fakeredis && python -m pytest tests
+import asyncio
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app import cache
+
+
+def _setup(monkeypatch, during_read=None):
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(cache, "r", r)
+
+    async def run_read(sql, params, primary=False):
+        if during_read is not None:
+            await during_read()
+        return [(n, f"Name {n}", 1970, None) for n in params[0] if n != "nm404"]
+    monkeypatch.setattr(cache, "run_read", run_read)
+    return r
+
+def test_fill_caches_replica_rows(monkeypatch):
+    r = _setup(monkeypatch)
+    out = asyncio.run(cache.get_many(["nm1", "nm404"]))
+    assert out["nm1"]["primaryName"] == "Name nm1" and out["nm404"] is None
+    assert asyncio.run(r.get(cache._key("nm404"))) == cache.MISSING
+    assert asyncio.run(r.get(cache._key("nm1"))) is not None
+
+def test_fill_does_not_overwrite_concurrent_invalidate(monkeypatch):
+    # invalidate() llega entre el MGET (llave vacía) y el llenado desde la réplica
+    r = _setup(monkeypatch, during_read=lambda: cache.invalidate(["nm1", "nm404"]))
+    asyncio.run(cache.get_many(["nm1", "nm404", "nm2"]))
+    assert asyncio.run(r.get(cache._key("nm1"))) == cache.DIRTY
+    assert asyncio.run(r.get(cache._key("nm404"))) == cache.DIRTY
+    assert asyncio.run(r.get(cache._key("nm2"))) is not None
@@ -0,0 +1,33 @@
+# tests/test_ingest.py
+# Lectura por líneas de POST /name_basics/stream sin levantar la API.
+import asyncio
+
+from app import ingest
+
+
+async def _chunks(*parts: bytes):
+    for p in parts:
+        yield p
+
+def _parse(fmt: str, *parts: bytes, max_line: int = ingest.STREAM_MAX_LINE):
+    async def run():
+        return [x async for x in ingest.parse_rows(fmt, ingest.iter_lines(_chunks(*parts), max_line))]
+    return asyncio.run(run())
+
+def test_lines_split_across_chunks():
+    out = _parse("csv", b"nconst,primaryName\nnm00", b"00001,Ana\r\n\nnm0000002,Luis")
+    assert [(n, item.nconst) for n, item, _ in out] == [(2, "nm0000001"), (4, "nm0000002")]
+
+def test_invalid_utf8_rejects_only_that_row():
+    out = _parse("ndjson", b'{"nconst": "nm0000001", "primaryName": "Ana"}\n',
+                 b'{"nconst": "nm0000002", "primaryName": "\xff"}\n',
+                 b'{"nconst": "nm0000003", "primaryName": "Luis"}')
+    assert [n for n, item, _ in out if item] == [1, 3]
+    assert out[1][0] == 2 and "UTF-8" in out[1][2]
+
+def test_long_line_is_rejected():
+    long = b'{"nconst": "nm0000001", "primaryName": "' + b"a" * 500 + b'"}'
+    out = _parse("ndjson", long[:100], long[100:] + b"\n", b'{"nconst": "nm0000002", "primaryName": "Ana"}',
+                 max_line=200)
+    assert out[0][1] is None and "bytes" in out[0][2]
+    assert out[1][0] == 2 and out[1][1].nconst == "nm0000002"
@@ -0,0 +1,51 @@
+# tests/test_models.py
+# validate_batch_fast frente a la validación de siempre (BatchIn, un NameBasicIn por item).
+import pytest
+from pydantic import ValidationError
+
+from app.models import BatchIn, validate_batch_fast
+
+OK = {"nconst": " nm0000001 ", "primaryName": " Ana ", "birthYear": 1980, "deathYear": None}
+BAD_ITEMS = [
+    OK,
+    {"nconst": "n", "primaryName": "Ana"},                       # nconst corto
+    {"nconst": "nm" + "0" * 30, "primaryName": "Ana"},            # nconst largo
+    {"nconst": "nm0000002", "primaryName": "   "},                # nombre vacío tras strip
+    {"nconst": "nm0000003", "primaryName": "x" * 513},
+    {"nconst": "nm0000004"},                                      # falta primaryName
+    {"nconst": 5, "primaryName": "Ana"},                          # tipo incorrecto
+    {"nconst": "nm0000006", "primaryName": "Ana", "birthYear": -1},
+    {"nconst": "nm0000007", "primaryName": "Ana", "birthYear": 10000},
+    {"nconst": "nm0000008", "primaryName": "Ana", "deathYear": "dos mil"},
+    {"nconst": "nm0000009", "primaryName": "Ana", "birthYear": 1.5},
+    {"nconst": None, "primaryName": None, "birthYear": "x", "deathYear": -5},
+    "no es un objeto",
+    None,
+    {"nconst": "nm0000011", "primaryName": "Ana", "birthYear": "1990", "deathYear": 2000.0},
+]
+
+
+def _errors(fn, body):
+    with pytest.raises(ValidationError) as e:
+        fn(body)
+    return [(err["loc"], err["type"], err["msg"]) for err in e.value.errors(include_url=False)]
+
+def _slow(body):
+    batch = BatchIn.model_validate(body, from_attributes=True)  # como lo valida FastAPI
+    return [(it.nconst, it.primaryName, it.birthYear, it.deathYear) for it in batch.items], batch.upsert
+
+def test_invalid_rows_same_errors():
+    body = {"items": BAD_ITEMS, "upsert": False}
+    fast = _errors(validate_batch_fast, body)
+    assert fast == _errors(_slow, body)
+    assert {loc[1] for loc, _, _ in fast} == set(range(1, 14))
+
+@pytest.mark.parametrize("body", [[], {"items": "x"}, {"items": [OK], "upsert": "si"}, {}])
+def test_invalid_body_same_errors(body):
+    assert _errors(validate_batch_fast, body) == _errors(_slow, body)
+
+def test_valid_rows_same_result():
+    body = {"items": [OK, BAD_ITEMS[-1], {"nconst": "nm0000012", "primaryName": "Luis"},
+                      {"nconst": "nm0000010", "primaryName": "Ana", "birthYear": True}]}
+    assert validate_batch_fast(body) == _slow(body)
+    assert validate_batch_fast(body)[0][0] == ("nm0000001", "Ana", 1980, None)
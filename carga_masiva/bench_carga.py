@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+
+# --------------------------------------------------------------------
+# Benchmark de carga_masiva sobre un subconjunto sintético de IMDb
+# --------------------------------------------------------------------
+# Genera (si hace falta) los TSV con generar_imdb, vacía las tablas con --reset,
+# corre la carga y guarda filas/s por tabla en JSON. Con --baseline falla
+# (exit 1) si alguna tabla o el total cae más de --threshold respecto a la base.
+#
+#   python bench_carga.py --data /tmp/imdb_bench --reset --out carga.json
+#   python bench_carga.py --data /tmp/imdb_bench --reset --baseline carga_base.json
+#
+# OJO: --reset hace TRUNCATE de las tablas de IMDb en PGSCHEMA.
+
+TABLES = ("title_basics", "basics_genres", "name_basics", "name_professions", "name_known_for",
+          "akas", "aka_types", "aka_attributes", "crew_directors", "crew_writers",
+          "episodes", "principals", "ratings")
+
+
+def _reset(cm):
+    import psycopg2
+    conn = psycopg2.connect(**cm.DB_CONFIG)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE " + ", ".join(cm._qualified(t) for t in TABLES) + " CASCADE")
+            cur.execute(f"DROP TABLE IF EXISTS {cm._qualified(cm.CHECKPOINT_TABLE)}")
+            cur.execute(f"DROP TABLE IF EXISTS {cm._qualified(cm.DELTA_TABLE)}")
+        conn.commit()
+    finally:
+        conn.close()
+    # sin datos, un manifiesto viejo haría que --delta no cargue nada
+    shutil.rmtree(cm.DELTA_DIR, ignore_errors=True)
+
+
+def _summary(stats: dict) -> dict:
+    secs = max(stats["load_secs"], 1e-9)
+    tables = {t: {"inserted": ins, "orphans": orph, "skipped": skip, "rows_per_sec": ins / secs}
+              for t, (ins, orph, skip) in stats["tables"].items()}
+    inserted = sum(t["inserted"] for t in tables.values())
+    return {"tables": tables,
+            "total": {"inserted": inserted, "rows_per_sec": inserted / secs,
+                      "load_secs": stats["load_secs"], "total_secs": stats["total_secs"]},
+            "phases": stats["phases"]}
+
+
+def _regressions(result: dict, base: dict, threshold: float):
+    """Devuelve [(nombre, actual, base)] de lo que cayó más de `threshold`."""
+    pairs = [("total", result["total"], base.get("total"))]
+    pairs += [(t, r, base.get("tables", {}).get(t)) for t, r in result["tables"].items()]
+    out = []
+    for name, cur, prev in pairs:
+        if prev and prev.get("rows_per_sec") and cur["rows_per_sec"] < prev["rows_per_sec"] * (1 - threshold):
+            out.append((name, cur["rows_per_sec"], prev["rows_per_sec"]))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de filas/s de carga_masiva")
+    parser.add_argument("--data", default=os.path.join("data_sintetica"),
+                        help="carpeta de los TSV (se generan si no existen)")
+    parser.add_argument("--titles", type=int, default=50_000)
+    parser.add_argument("--names", type=int, default=40_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mode", choices=("values", "copy"), default="copy")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--defer-indexes", action="store_true")
+    parser.add_argument("--reset", action="store_true", help="TRUNCATE de las tablas antes de cargar")
+    parser.add_argument("--out", help="guarda el resultado en JSON")
+    parser.add_argument("--baseline", help="JSON de referencia para detectar regresiones")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="caída máxima aceptada de filas/s (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    data = os.path.abspath(args.data)
+    if not os.path.exists(os.path.join(data, "title.basics.tsv")):
+        from generar_imdb import generar
+        print(f"Generando datos sintéticos en {data} ...")
+        generar(data, args.titles, args.names, args.seed)
+
+    # BASE_DIR se lee al importar (también en los procesos hijos en Windows)
+    os.environ["IMDB_DATA_DIR"] = data
+    import carga_masiva as cm
+
+    if args.reset:
+        _reset(cm)
+    stats: dict = {}
+    msg = cm.carga_masiva(args.mode, args.workers or cm.WORKERS, None, False,
+                          args.defer_indexes, cm.PREFILTER, stats=stats)
+    if not stats:
+        print(msg)
+        sys.exit(2)
+
+    result = {"scenario": {"data": data, "mode": args.mode, "workers": args.workers or cm.WORKERS,
+                           "defer_indexes": args.defer_indexes},
+              **_summary(stats)}
+    print(f"\n{'tabla':<18} {'insertadas':>11} {'filas/s':>12}")
+    for t, r in list(result["tables"].items()) + [("TOTAL", result["total"])]:
+        print(f"{t:<18} {r['inserted']:>11} {r['rows_per_sec']:>12,.0f}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            base = json.load(f)
+        bad = _regressions(result, base, args.threshold)
+        for name, cur, prev in bad:
+            print(f"REGRESIÓN {name}: {cur:,.0f} filas/s vs {prev:,.0f} de base "
+                  f"({(1 - cur / prev) * 100:.0f}% menos)")
+        if bad:
+            sys.exit(1)
+        print(f"Sin regresiones de más de {args.threshold:.0%} respecto a {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import os
+import csv
+import sys
+import time
+import argparse
+
+from carga_masiva import (
+    BASE_DIR, NULL, READ_BLOCK,
+    _iter_tsv, _tsv_header, _typed, _copy, _explode,
+    _none, _to_int, _to_bool_01, _to_year, _split_csv,
+)
+
+# --------------------------------------------------------------------
+# Microbenchmark del lector de title.basics.tsv (no usa la base de datos)
+# --------------------------------------------------------------------
+# Compara el camino anterior (csv.DictReader + _none/_to_int por campo) con el
+# lector por bloques, tanto con conversión a valores Python (modo values) como
+# a texto para COPY. Solo mide parseo y conversión, sin enviar nada.
+
+try:
+    csv.field_size_limit(sys.maxsize)
+except OverflowError:
+    csv.field_size_limit(2**31 - 1)
+
+COLS = ("tconst", "titleType", "primaryTitle", "originalTitle", "isAdult",
+        "startYear", "endYear", "runtimeMinutes")
+KINDS = ("raw", "text!", "text!", "text!", "bool01", "int", "int", "int")
+
+
+def _old(path: str) -> int:
+    n = 0
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            tconst = row["tconst"]
+            primarytitle = _none(row["primaryTitle"]) or NULL
+            tb = (tconst, _none(row["titleType"]) or NULL, primarytitle,
+                  _none(row["originalTitle"]) or NULL, _to_bool_01(row["isAdult"]),
+                  _to_year(row["startYear"]), _to_year(row["endYear"]),
+                  _to_int(row["runtimeMinutes"]))
+            bg = [(tconst, primarytitle, g) for g in _split_csv(row.get("genres"))]
+            n += 1
+    return n
+
+
+def _new(path: str, convert, block: int) -> int:
+    header = _tsv_header(path)
+    idx = [header.index(c) for c in COLS]
+    genres = header.index("genres")
+    n = 0
+    for _, rows in _iter_tsv(path, block=block):
+        cols = list(zip(*rows))
+        tb = [convert(k, cols[i]) for k, i in zip(KINDS, idx)]
+        bg = _explode(cols[genres], cols[idx[0]], cols[idx[2]])
+        n += len(rows)
+    return n
+
+
+def _measure(name: str, fn, repeat: int):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        n = fn()
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    print(f"{name:<22} {n:>10} filas  {best:8.3f}s  {n / best if best else 0:>12,.0f} filas/s")
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Microbenchmark del lector TSV de carga_masiva")
+    ap.add_argument("--file", default=os.path.join(BASE_DIR, "title.basics.tsv"),
+                    help="TSV con el formato de title.basics")
+    ap.add_argument("--repeat", type=int, default=3, help="repeticiones (se toma la mejor)")
+    ap.add_argument("--block", type=int, default=READ_BLOCK, help="bytes por bloque de lectura")
+    args = ap.parse_args()
+
+    print(f"Archivo: {args.file} ({os.path.getsize(args.file) / 1e6:.1f} MB)")
+    base = _measure("csv.DictReader", lambda: _old(args.file), args.repeat)
+    for name, conv in (("bloques -> values", _typed), ("bloques -> COPY", _copy)):
+        t = _measure(name, lambda: _new(args.file, conv, args.block), args.repeat)
+        print(f"{'':<22} x{base / t:.2f} respecto a csv.DictReader")
+
+
+if __name__ == "__main__":
+    main()
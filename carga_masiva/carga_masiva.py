@@ -1,7 +1,13 @@
 import os
-import csv
-import sys
-from typing import List, Tuple, Optional
+import io
+import re
+import time
+import hashlib
+import argparse
+from typing import Dict, List, Tuple, Optional
+
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 import psycopg2
 from psycopg2.extras import execute_values
@@ -26,16 +32,62 @@ BASE_DIR = os.getenv(
     os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data"))
 )
 
-# CSV grandes
-try:
-    csv.field_size_limit(sys.maxsize)
-except OverflowError:
-    csv.field_size_limit(2**31 - 1)
-
 # Tamaños de lote
 BATCH_SMALL = 2000
 BATCH_MED   = 4000
 
+# Modo de envío al servidor:
+#   "values" -> execute_values (camino original)
+#   "copy"   -> COPY ... FROM STDIN hacia la tabla temporal
+LOAD_MODE = os.getenv("IMDB_LOAD_MODE", "values")
+
+# En modo copy los lotes son más grandes; el buffer en memoria queda acotado
+# por filas (IMDB_COPY_BATCH) y por bytes (IMDB_COPY_BUFFER_MB), lo que llegue primero.
+BATCH_COPY        = int(os.getenv("IMDB_COPY_BATCH", "50000"))
+COPY_BUFFER_BYTES = int(os.getenv("IMDB_COPY_BUFFER_MB", "16")) * 1024 * 1024
+
+# Carga en paralelo: procesos (cada uno con su conexión) y tamaño de los trozos
+# en que se parten los TSV grandes (title.principals.tsv, title.akas.tsv, ...).
+WORKERS     = int(os.getenv("IMDB_WORKERS", str(min(4, os.cpu_count() or 1))))
+CHUNK_BYTES = int(os.getenv("IMDB_CHUNK_MB", "256")) * 1024 * 1024
+
+# Índices/FKs diferidos durante la carga y memoria para reconstruirlos
+DEFER_INDEXES        = os.getenv("IMDB_DEFER_INDEXES", "0") == "1"
+MAINTENANCE_WORK_MEM = os.getenv("IMDB_MAINTENANCE_WORK_MEM", "512MB")
+# Los índices de búsqueda (idx_search_*: GIN del tsvector y GiST de pg_trgm) de
+# una tabla vacía que se va a llenar se difieren: mantenerlos fila a fila durante
+# la carga cuesta más que recrearlos. Sobre tablas con datos se dejan (la carga es parcial).
+DEFER_SEARCH         = os.getenv("IMDB_DEFER_SEARCH", "1") == "1"
+SEARCH_INDEX_PREFIX  = "idx_search_"
+# Tarea -> tabla con índices de búsqueda que llena
+SEARCH_TABLES = {"title_basics": "title_basics", "name_basics": "name_basics", "akas": "akas"}
+
+# Filtra filas huérfanas en el cliente con los tconst/nconst ya cargados
+# (en vez de un EXISTS por fila en el servidor)
+PREFILTER = os.getenv("IMDB_PREFILTER", "1") == "1"
+
+# Esquema de akas/aka_*/principals: "plain" (script.sql) o "partitioned"
+# (script_particionado.sql: ids enteros y particiones por rango del título)
+LAYOUT = os.getenv("IMDB_LAYOUT", "plain")
+
+# Modo delta (--delta): compara cada TSV con el manifiesto local de la corrida
+# anterior (hashes por tramos de ~IMDB_DELTA_RANGE_KB y por fila, en DELTA_DIR) y
+# solo aplica altas, cambios y bajas. Si una tarea tiene más de DELTA_MAX_KEYS
+# llaves cambiadas no se filtra en memoria: se recorre el archivo entero (los
+# upserts dejan igual lo que no cambió).
+DELTA             = os.getenv("IMDB_DELTA", "0") == "1"
+DELTA_MAX_KEYS    = int(os.getenv("IMDB_DELTA_MAX_KEYS", "2000000"))
+DELTA_DIR         = os.getenv("IMDB_MANIFEST_DIR", os.path.join(BASE_DIR, ".manifest"))
+DELTA_RANGE_BYTES = int(os.getenv("IMDB_DELTA_RANGE_KB", "32")) * 1024
+
+# Resúmenes de analítica (agg_* de script.sql) al terminar la carga:
+#   auto        -> incremental si solo ratings cambió (o solo se cargó), completo si no
+#   full        -> siempre completo (los dos resúmenes en paralelo)
+#   incremental -> solo los (género, año) de los ratings que cambiaron
+#   off         -> no se tocan
+AGGREGATES = os.getenv("IMDB_AGGREGATES", "auto")
+AGG_SUMMARIES = ("genre_year", "top_rated")
+
 # --------------------------------------------------------------------
 # Helpers
 # --------------------------------------------------------------------
@@ -54,6 +106,11 @@ def _to_int(x: Optional[str]) -> Optional[int]:
     except (ValueError, TypeError):
         return None
 
+# Para COPY: el entero normalizado (como lo lee _to_int: espacios, signo) o `default`
+def _int_text(x: Optional[str], default: str) -> str:
+    n = _to_int(x)
+    return default if n is None else str(n)
+
 def _to_float(x: Optional[str]) -> Optional[float]:
     x = _none(x)
     if x is None:
@@ -94,576 +151,1338 @@ def _stage_fill(cur, temp_name: str, rows: list, page_size: int = 1000):
     execute_values(cur, f"INSERT INTO {temp_name} VALUES %s", rows, page_size=page_size)
     return len(rows)
 
+def _stage_copy(cur, temp_name: str, cols: Tuple[str, ...], buf: io.StringIO):
+    buf.seek(0)
+    cur.copy_expert(f"COPY {temp_name} ({', '.join(cols)}) FROM STDIN", buf)
+
+def _exists(table: str, cond: str) -> str:
+    return f"EXISTS (SELECT 1 FROM {_qualified(table)} p WHERE {cond})"
+
+# Con LAYOUT=partitioned estas columnas guardan la parte numérica del id
+# (tt0000001 -> 1); el valor es el prefijo para volver a armarlo.
+INT_IDS = {
+    "akas":           {"titleid": "tt"},
+    "aka_types":      {"titleid": "tt"},
+    "aka_attributes": {"titleid": "tt"},
+    "principals":     {"tconst": "tt", "nconst": "nm"},
+}
+
+def _int_ids(table: str) -> Dict[str, str]:
+    return INT_IDS.get(table, {}) if LAYOUT == "partitioned" else {}
+
+# `expr` es un id en texto; devuelve algo comparable con table.col
+def _id_in(table: str, col: str, expr: str) -> str:
+    return f"{SCHEMA}.imdb_num({expr})" if col in _int_ids(table) else expr
+
+# `expr` es un valor de table.col; devuelve el id en texto (como en title_basics)
+def _id_out(table: str, col: str, expr: str) -> str:
+    prefix = _int_ids(table).get(col)
+    return expr if prefix is None else f"{SCHEMA}.imdb_id('{prefix}', {expr})"
+
 # --------------------------------------------------------------------
-# Loaders
+# Lector TSV
 # --------------------------------------------------------------------
-# Inserta primero title_basics y luego basics_genres; basics_genres se filtra por EXISTS.
-# Rellena NOT NULL con defaults si vienen \N.
-def _load_title_basics_and_genres(cur, conn) -> Tuple[int, int]:
-    path = os.path.join(BASE_DIR, "title.basics.tsv")
-    tb_rows, bg_rows = [], []
-    ins_tb = ins_bg = 0
-
-    with open(path, "r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f, delimiter="\t")
-        for row in reader:
-            tconst = row["tconst"]
-            titletype = _none(row["titleType"]) or r"\N"
-            primarytitle = _none(row["primaryTitle"]) or r"\N"
-            originaltitle = _none(row["originalTitle"]) or r"\N"
-            isadult = _to_bool_01(row["isAdult"])
-            startyear = _to_year(row["startYear"])
-            endyear = _to_year(row["endYear"])
-            runtimeminutes = _to_int(row["runtimeMinutes"])
-
-            tb_rows.append((tconst, titletype, primarytitle, originaltitle,
-                            isadult, startyear, endyear, runtimeminutes))
-
-            for g in _split_csv(row.get("genres")):
-                bg_rows.append((tconst, primarytitle, g))
-
-            if len(tb_rows) >= BATCH_SMALL:
-                sql_tb = f"""
-                    INSERT INTO {_qualified("title_basics")}
-                    (tconst, titletype, primarytitle, originaltitle, isadult,
-                     startyear, endyear, runtimeminutes)
-                    VALUES %s
-                    ON CONFLICT (tconst) DO NOTHING
-                """
-                ins_tb += _execute_values(cur, sql_tb, tb_rows, page_size=1000)
-                tb_rows.clear()
-                conn.commit()
-
-            if len(bg_rows) >= BATCH_MED:
-                if tb_rows:
-                    sql_tb = f"""
-                        INSERT INTO {_qualified("title_basics")}
-                        (tconst, titletype, primarytitle, originaltitle, isadult,
-                         startyear, endyear, runtimeminutes)
-                        VALUES %s
-                        ON CONFLICT (tconst) DO NOTHING
-                    """
-                    ins_tb += _execute_values(cur, sql_tb, tb_rows, page_size=1000)
-                    tb_rows.clear()
-                    conn.commit()
-
-                _stage(cur, "tmp_bg", "tconst varchar(20), primarytitle text, genre varchar(64)")
-                _stage_fill(cur, "tmp_bg", bg_rows, page_size=2000)
-                cur.execute(f"""
-                    INSERT INTO {_qualified("basics_genres")} (tconst, primarytitle, genre)
-                    SELECT tconst, primarytitle, genre
-                    FROM tmp_bg t
-                    WHERE EXISTS (SELECT 1 FROM {_qualified("title_basics")} b WHERE b.tconst = t.tconst)
-                    ON CONFLICT (tconst, genre) DO NOTHING
-                """)
-                ins_bg += len(bg_rows)
-                bg_rows.clear()
-                conn.commit()
-
-    if tb_rows:
-        sql_tb = f"""
-            INSERT INTO {_qualified("title_basics")}
-            (tconst, titletype, primarytitle, originaltitle, isadult,
-             startyear, endyear, runtimeminutes)
-            VALUES %s
-            ON CONFLICT (tconst) DO NOTHING
-        """
-        ins_tb += _execute_values(cur, sql_tb, tb_rows, page_size=1000)
-        tb_rows.clear()
-        conn.commit()
+# Lee un TSV de IMDb en el rango de bytes [start, end) por bloques de ~READ_BLOCK
+# bytes y devuelve (offset tras el bloque, filas), cada fila como lista de campos
+# en el orden del encabezado. Una línea pertenece al rango si empieza dentro de
+# él, así los trozos no se pisan. Se separa por tabuladores sin interpretar
+# comillas (los TSV de IMDb no las escapan) ni recortar espacios.
+READ_BLOCK = 1 << 20
+NULL = r"\N"
+
+def _tsv_header(path: str) -> List[str]:
+    with open(path, "rb") as f:
+        return f.readline().rstrip(b"\r\n").decode("utf-8").split("\t")
+
+def _iter_tsv(path: str, start: int = 0, end: Optional[int] = None, block: int = READ_BLOCK):
+    with open(path, "rb") as f:
+        width = len(f.readline().split(b"\t"))
+        if start > f.tell():
+            f.seek(start - 1)
+            f.readline()  # descarta la línea que empezó antes del rango
+        pos = f.tell()
+        while end is None or pos < end:
+            data = f.read(block if end is None else min(block, end - pos))
+            if not data:
+                break
+            if not data.endswith(b"\n"):
+                data += f.readline()  # la última línea empezó dentro del rango: es nuestra
+            pos += len(data)
+            yield pos, _parse_rows(data, width)
+
+# Líneas completas -> filas de `width` campos (las cortas se completan con \N)
+def _parse_rows(data: bytes, width: int) -> List[List[str]]:
+    text = data.decode("utf-8")
+    if "\r" in text:
+        text = text.replace("\r\n", "\n")
+    rows = [line.split("\t") for line in text.split("\n")]
+    if rows[-1] == [""]:
+        rows.pop()
+    for r in rows:
+        if len(r) < width:
+            r.extend([NULL] * (width - len(r)))
+    return rows
+
+# _none() sobre toda la columna; solo la llama si hay que recortar o anular.
+def _nones(col) -> list:
+    return [v if v and v != NULL and not v[0].isspace() and not v[-1].isspace() else _none(v)
+            for v in col]
+
+# Conversión por columnas según el tipo declarado de cada una:
+#   raw    -> tal cual (llaves)           text!  -> NOT NULL: vacío o \N se guarda como '\N'
+#   text   -> \N o vacío = NULL           int / int0 -> entero (como _to_int) o NULL / 0
+#   bool01 -> '1' = true                  float0 -> real o 0.0
+#   tt / nm -> parte numérica del id (LAYOUT=partitioned; la forma ya se validó)
+# Todo se limpia como _none() (strip; vacío o \N = NULL) salvo raw/tt/nm.
+# _typed da valores Python (execute_values); _copy da texto listo para COPY.
+def _typed(kind: str, col) -> list:
+    if kind == "raw":
+        return list(col)
+    if kind == "text":
+        return _nones(col)
+    if kind == "text!":
+        return [v or NULL for v in _nones(col)]
+    if kind == "int":
+        return [int(v) if v.isdigit() and v.isascii() else _to_int(v) for v in col]
+    if kind == "int0":
+        return [int(v) if v.isdigit() and v.isascii() else _to_int(v) or 0 for v in col]
+    if kind == "bool01":
+        return [v == "1" if v == "1" or v == "0" else _none(v) == "1" for v in col]
+    if kind == "float0":
+        return [_to_float(v) or 0.0 for v in col]
+    if kind in ("tt", "nm"):
+        return [None if v == NULL else int(v[2:]) for v in col]
+    raise ValueError(f"tipo de columna desconocido: {kind}")
+
+def _copy(kind: str, col) -> list:
+    if kind == "raw":
+        return [v.replace("\\", "\\\\") if "\\" in v else v for v in col]
+    if kind == "text":
+        return [NULL if v is None else v.replace("\\", "\\\\") if "\\" in v else v
+                for v in _nones(col)]
+    if kind == "text!":
+        return ["\\\\N" if v is None else v.replace("\\", "\\\\") if "\\" in v else v
+                for v in _nones(col)]
+    if kind == "int":
+        return [v if v.isdigit() and v.isascii() else _int_text(v, NULL) for v in col]
+    if kind == "int0":
+        return [v if v.isdigit() and v.isascii() else _int_text(v, "0") for v in col]
+    if kind == "bool01":
+        return ["t" if b else "f" for b in _typed(kind, col)]
+    if kind == "float0":
+        return [str(x) for x in _typed(kind, col)]
+    if kind in ("tt", "nm"):
+        return [v if v == NULL else str(int(v[2:])) for v in col]
+    raise ValueError(f"tipo de columna desconocido: {kind}")
+
+# Expande una columna con listas separadas por coma (genres, knownForTitles, ...)
+# en filas hijas: devuelve las columnas de los padres repetidas + la de valores.
+# `keep` (opcional) salta las filas cuyo padre se descartó.
+def _explode(values, *parents, keep: Optional[List[bool]] = None) -> List[list]:
+    out = [[] for _ in range(len(parents) + 1)]
+    vals = out[-1]
+    for i, v in enumerate(values):
+        if v == NULL or not v or (keep is not None and not keep[i]):
+            continue
+        for part in v.split(","):
+            if part:
+                for o, p in zip(out, parents):
+                    o.append(p[i])
+                vals.append(part)
+    return out
+
+# Parte un archivo en rangos de ~chunk_bytes; el último rango queda abierto (end=None).
+# `cuts` son inicios de línea donde también se corta (límites de partición).
+def _chunks(path: str, chunk_bytes: int, cuts: Tuple[int, ...] = ()) -> List[Tuple[int, Optional[int]]]:
+    size = os.path.getsize(path)
+    bounds = [0] if chunk_bytes <= 0 or size <= chunk_bytes else list(range(0, size, chunk_bytes))
+    bounds = sorted(set(bounds).union(c for c in cuts if 0 < c < size))
+    return [(s, bounds[i + 1] if i + 1 < len(bounds) else None) for i, s in enumerate(bounds)]
 
-    if bg_rows:
-        _stage(cur, "tmp_bg2", "tconst varchar(20), primarytitle text, genre varchar(64)")
-        _stage_fill(cur, "tmp_bg2", bg_rows, page_size=2000)
-        cur.execute(f"""
-            INSERT INTO {_qualified("basics_genres")} (tconst, primarytitle, genre)
-            SELECT tconst, primarytitle, genre
-            FROM tmp_bg2 t
-            WHERE EXISTS (SELECT 1 FROM {_qualified("title_basics")} b WHERE b.tconst = t.tconst)
-            ON CONFLICT (tconst, genre) DO NOTHING
-        """)
-        ins_bg += len(bg_rows)
-        bg_rows.clear()
-        conn.commit()
 
-    return ins_tb, ins_bg
+# --------------------------------------------------------------------
+# Checkpoints
+# --------------------------------------------------------------------
+# Tabla de control en el mismo schema: una fila por trozo de cada tarea con el
+# offset hasta el que ya hay commit. --resume retoma cada trozo desde ahí.
+CHECKPOINT_TABLE = "carga_checkpoint"
+
+def _ensure_checkpoint_table(cur):
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {_qualified(CHECKPOINT_TABLE)} (
+            task           text        NOT NULL,
+            chunk_start    bigint      NOT NULL,
+            chunk_end      bigint      NULL,      -- NULL = hasta el final del archivo
+            file           text        NOT NULL,
+            fingerprint    text        NOT NULL,
+            byte_offset    bigint      NOT NULL,
+            lines_read     bigint      NOT NULL DEFAULT 0,   -- lineas del TSV hasta byte_offset
+            done           boolean     NOT NULL DEFAULT false,
+            updated_at     timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (task, chunk_start)
+        )
+    """)
+    # antes se llamaba rows_committed, pero cuenta también huérfanas y filas sin cambios
+    cur.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = %s AND table_name = %s AND column_name = 'rows_committed'
+    """, (SCHEMA, CHECKPOINT_TABLE))
+    if cur.fetchone():
+        cur.execute(f"ALTER TABLE {_qualified(CHECKPOINT_TABLE)} RENAME COLUMN rows_committed TO lines_read")
+
+# Huella barata del archivo: tamaño + sha1 del primer y último MB.
+def _fingerprint(path: str) -> str:
+    size = os.path.getsize(path)
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        h.update(f.read(1 << 20))
+        if size > 2 << 20:
+            f.seek(-(1 << 20), os.SEEK_END)
+            h.update(f.read())
+    return f"{size}:{h.hexdigest()}"
+
+def _save_checkpoint(cur, chunk: "_Chunk", done: bool = False):
+    cur.execute(f"""
+        UPDATE {_qualified(CHECKPOINT_TABLE)}
+        SET byte_offset = %s, lines_read = %s, done = %s, updated_at = now()
+        WHERE task = %s AND chunk_start = %s
+    """, (chunk.pos, chunk.lines, done, chunk.task, chunk.start))
+
+# Rango de un TSV que procesa un worker. batches() va dejando en pos/lines el
+# offset y las filas leídas hasta el bloque actual, que es lo que se guarda en
+# cada commit. Con `keys` (modo delta) solo pasan las filas cuya llave cambió.
+class _Chunk:
+    def __init__(self, task: str, mode: str, start: int, end: Optional[int],
+                 offset: Optional[int] = None, lines: int = 0, prefilter: bool = True,
+                 keys: Optional[set] = None):
+        self.task = task
+        self.path = os.path.join(BASE_DIR, TASKS[task][0])
+        self.mode = mode
+        self.start = start
+        self.end = end
+        self.pos = start if offset is None else offset
+        self.lines = lines
+        self.prefilter = prefilter
+        self.keys = keys
+        self.width = DELTA_KEY_WIDTH.get(TASKS[task][0], 1)
+        self.index = {name: i for i, name in enumerate(_tsv_header(self.path))}
+
+    def batches(self):
+        for pos, rows in _iter_tsv(self.path, self.pos, self.end):
+            self.pos = pos
+            self.lines += len(rows)
+            if self.keys is not None:
+                rows = [r for r in rows if _line_key(r, self.width) in self.keys]
+            yield rows
+
+    # Transpone un bloque y devuelve las columnas pedidas por nombre; una columna
+    # que no está en el encabezado sale entera como \N.
+    def columns(self, rows: List[List[str]], *names: str) -> List[tuple]:
+        if not rows:
+            return [() for _ in names]
+        cols = list(zip(*rows))
+        missing = (NULL,) * len(rows)
+        return [cols[self.index[n]] if n in self.index else missing for n in names]
 
 
-# name_basics -> inserta siempre; si primaryname viene \N, se rellena con '\N'.
-# name_professions -> filtrado por EXISTS en name_basics
-# name_known_for -> filtrado por EXISTS en name_basics y title_basics
-def _load_name_basics_professions_known(cur, conn) -> Tuple[int, int, int]:
-    path = os.path.join(BASE_DIR, "name.basics.tsv")
-    nb_rows, np_rows, nk_rows = [], [], []
-    ins_nb = ins_np = ins_nk = 0
-
-    with open(path, "r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f, delimiter="\t")
-        for row in reader:
-            nconst = row["nconst"]
-            primaryname = _none(row["primaryName"]) or r"\N"
-            birthyear = _to_year(row["birthYear"])
-            deathyear = _to_year(row["deathYear"])
-
-            nb_rows.append((nconst, primaryname, birthyear, deathyear))
-
-            for prof in _split_csv(row.get("primaryProfession")):
-                np_rows.append((nconst, prof))
-            for tconst in _split_csv(row.get("knownForTitles")):
-                nk_rows.append((nconst, tconst))
-
-            if len(nb_rows) >= BATCH_SMALL:
-                sql_nb = f"""
-                    INSERT INTO {_qualified("name_basics")}
-                    (nconst, primaryname, birthyear, deathyear)
-                    VALUES %s
-                    ON CONFLICT (nconst) DO NOTHING
-                """
-                ins_nb += _execute_values(cur, sql_nb, nb_rows, page_size=1000)
-                nb_rows.clear()
-                conn.commit()
-
-            if len(np_rows) >= BATCH_MED:
-                if nb_rows:
-                    sql_nb = f"""
-                        INSERT INTO {_qualified("name_basics")}
-                        (nconst, primaryname, birthyear, deathyear)
-                        VALUES %s
-                        ON CONFLICT (nconst) DO NOTHING
-                    """
-                    ins_nb += _execute_values(cur, sql_nb, nb_rows, page_size=1000)
-                    nb_rows.clear()
-                    conn.commit()
-
-                _stage(cur, "tmp_np", "nconst varchar(20), profession varchar(64)")
-                _stage_fill(cur, "tmp_np", np_rows, page_size=2000)
-                cur.execute(f"""
-                    INSERT INTO {_qualified("name_professions")} (nconst, profession)
-                    SELECT t.nconst, t.profession
-                    FROM tmp_np t
-                    WHERE EXISTS (SELECT 1 FROM {_qualified("name_basics")} nb WHERE nb.nconst = t.nconst)
-                    ON CONFLICT (nconst, profession) DO NOTHING
-                """)
-                ins_np += len(np_rows)
-                np_rows.clear()
-                conn.commit()
-
-            if len(nk_rows) >= BATCH_MED:
-                if nb_rows:
-                    sql_nb = f"""
-                        INSERT INTO {_qualified("name_basics")}
-                        (nconst, primaryname, birthyear, deathyear)
-                        VALUES %s
-                        ON CONFLICT (nconst) DO NOTHING
-                    """
-                    ins_nb += _execute_values(cur, sql_nb, nb_rows, page_size=1000)
-                    nb_rows.clear()
-                    conn.commit()
-
-                _stage(cur, "tmp_nk", "nconst varchar(20), tconst varchar(20)")
-                _stage_fill(cur, "tmp_nk", nk_rows, page_size=2000)
-                cur.execute(f"""
-                    INSERT INTO {_qualified("name_known_for")} (nconst, tconst)
-                    SELECT t.nconst, t.tconst
-                    FROM tmp_nk t
-                    WHERE EXISTS (SELECT 1 FROM {_qualified("name_basics")} nb WHERE nb.nconst = t.nconst)
-                      AND EXISTS (SELECT 1 FROM {_qualified("title_basics")} tb WHERE tb.tconst = t.tconst)
-                    ON CONFLICT (nconst, tconst) DO NOTHING
-                """)
-                ins_nk += len(nk_rows)
-                nk_rows.clear()
-                conn.commit()
-
-    if nb_rows:
-        sql_nb = f"""
-            INSERT INTO {_qualified("name_basics")}
-            (nconst, primaryname, birthyear, deathyear)
-            VALUES %s
-            ON CONFLICT (nconst) DO NOTHING
-        """
-        ins_nb += _execute_values(cur, sql_nb, nb_rows, page_size=1000)
-        nb_rows.clear()
-        conn.commit()
+# --------------------------------------------------------------------
+# Conjuntos de llaves (prefiltro de FKs en el cliente)
+# --------------------------------------------------------------------
+# Tablas padre -> (columna PK, prefijo de los ids de IMDb)
+KEY_TABLES = {
+    "title_basics": ("tconst", "tt"),
+    "name_basics":  ("nconst", "nm"),
+}
 
-    if np_rows:
-        _stage(cur, "tmp_np2", "nconst varchar(20), profession varchar(64)")
-        _stage_fill(cur, "tmp_np2", np_rows, page_size=2000)
-        cur.execute(f"""
-            INSERT INTO {_qualified("name_professions")} (nconst, profession)
-            SELECT t.nconst, t.profession
-            FROM tmp_np2 t
-            WHERE EXISTS (SELECT 1 FROM {_qualified("name_basics")} nb WHERE nb.nconst = t.nconst)
-            ON CONFLICT (nconst, profession) DO NOTHING
-        """)
-        ins_np += len(np_rows)
-        np_rows.clear()
-        conn.commit()
+# Conjunto de ids tt1234567 / nm1234567 guardado como bitmap sobre la parte
+# numérica (~1 bit por id posible: 10M títulos caben en ~1.3 MB). Los ids que no
+# tienen la forma canónica (prefijo + al menos 7 dígitos con ceros a la izquierda)
+# van a un set aparte para que no haya falsos positivos.
+class _KeySet:
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.bits = bytearray()
+        self.other = set()
+        self.size = 0
+
+    def _num(self, key: str) -> Optional[int]:
+        if key.startswith(self.prefix):
+            digits = key[2:]
+            if digits.isdigit():
+                n = int(digits)
+                if digits == f"{n:07d}":
+                    return n
+        return None
 
-    if nk_rows:
-        _stage(cur, "tmp_nk2", "nconst varchar(20), tconst varchar(20)")
-        _stage_fill(cur, "tmp_nk2", nk_rows, page_size=2000)
-        cur.execute(f"""
-            INSERT INTO {_qualified("name_known_for")} (nconst, tconst)
-            SELECT t.nconst, t.tconst
-            FROM tmp_nk2 t
-            WHERE EXISTS (SELECT 1 FROM {_qualified("name_basics")} nb WHERE nb.nconst = t.nconst)
-              AND EXISTS (SELECT 1 FROM {_qualified("title_basics")} tb WHERE tb.tconst = t.tconst)
-            ON CONFLICT (nconst, tconst) DO NOTHING
-        """)
-        ins_nk += len(nk_rows)
-        nk_rows.clear()
+    def add(self, key: str):
+        n = self._num(key)
+        self.size += 1
+        if n is None:
+            self.other.add(key)
+            return
+        i = n >> 3
+        if i >= len(self.bits):
+            self.bits.extend(bytes(i - len(self.bits) + 1 + (i >> 2)))
+        self.bits[i] |= 1 << (n & 7)
+
+    def __contains__(self, key: str) -> bool:
+        n = self._num(key)
+        if n is None:
+            return key in self.other
+        i = n >> 3
+        return i < len(self.bits) and (self.bits[i] >> (n & 7)) & 1 == 1
+
+# Ids con forma canónica, los únicos que tienen número en LAYOUT=partitioned.
+# Va en los checks de _TableBuffer como un conjunto más: los demás se descartan.
+class _IdForm(_KeySet):
+    def __contains__(self, key: str) -> bool:
+        return self._num(key) is not None
+
+_ID_FORMS = {"tt": _IdForm("tt"), "nm": _IdForm("nm")}
+
+# Cache por proceso. Solo se piden llaves de tablas padre de la tarea actual, y el
+# planificador no la lanza hasta que esas tablas terminaron de cargarse.
+_KEYSETS: Dict[str, _KeySet] = {}
+
+def _keyset(conn, table: str) -> _KeySet:
+    ks = _KEYSETS.get(table)
+    if ks is None:
+        col, prefix = KEY_TABLES[table]
+        ks = _KeySet(prefix)
+        t0 = time.perf_counter()
+        with conn.cursor(name=f"keys_{table}") as cur:   # cursor de servidor: no trae todo de golpe
+            cur.itersize = 200000
+            cur.execute(f"SELECT {col} FROM {_qualified(table)}")
+            for (key,) in cur:
+                ks.add(key)
         conn.commit()
+        print(f"  llaves {table}: {ks.size} en {time.perf_counter() - t0:.1f}s "
+              f"({len(ks.bits) / 1024 / 1024:.1f} MB)")
+        _KEYSETS[table] = ks
+    return ks
 
-    return ins_nb, ins_np, ins_nk
+
+# --------------------------------------------------------------------
+# Buffers de carga
+# --------------------------------------------------------------------
+# Conteos por tabla: (insertadas, huérfanas descartadas en el cliente, repetidas/filtradas en BD)
+Counts = Dict[str, Tuple[int, int, int]]
+
+# Un _TableBuffer acumula las filas de una tabla destino. Al volcarse:
+#   - sin filtro y en modo values: INSERT ... VALUES directo (como antes)
+#   - con filtro o en modo copy: tabla temporal + INSERT ... SELECT WHERE <filtro>
+# Con prefiltro, `checks` son (posición de columna, llaves del padre): las filas
+# huérfanas se descartan en add() y el filtro EXISTS del servidor ya no se usa.
+# NULL no viola una FK, así que un valor None pasa el chequeo.
+class _TableBuffer:
+    def __init__(self, table: str, cols: Tuple[str, ...], kinds: Tuple[str, ...], ddl: str,
+                 conflict: str, where: Optional[str] = None, batch: int = BATCH_MED,
+                 mode: str = LOAD_MODE, checks: Optional[List[Tuple[int, _KeySet]]] = None,
+                 update: Tuple[str, ...] = ()):
+        self.table = table
+        self.cols = cols
+        self.kinds = kinds
+        self.ddl = ddl
+        self.conflict = conflict
+        self.update = update
+        self.where = where
+        self.mode = mode
+        self.checks = (checks or []) + [(i, _ID_FORMS[k]) for i, k in enumerate(kinds) if k in _ID_FORMS]
+        self.batch = BATCH_COPY if mode == "copy" else batch
+        self.rows: list = []
+        self.buf = io.StringIO()
+        self.pending = 0
+        self.sent = 0
+        self.inserted = 0
+        self.rejected = 0
+        self.seconds = 0.0
+
+    # Recibe columnas crudas del TSV (mismo orden que `cols`), descarta huérfanas,
+    # convierte según `kinds` y devuelve qué filas quedaron.
+    def add_many(self, columns: List[list]) -> List[bool]:
+        n = len(columns[0])
+        keep = [True] * n
+        for i, keys in self.checks:
+            keep = [k and (v == NULL or v in keys) for k, v in zip(keep, columns[i])]
+        kept = sum(keep)
+        if kept < n:
+            self.rejected += n - kept
+            columns = [[v for v, k in zip(c, keep) if k] for c in columns]
+        if not kept:
+            return keep
+
+        if self.mode == "copy":
+            conv = [_copy(k, c) for k, c in zip(self.kinds, columns)]
+            self.buf.write("\n".join(map("\t".join, zip(*conv))))
+            self.buf.write("\n")
+        else:
+            conv = [_typed(k, c) for k, c in zip(self.kinds, columns)]
+            self.rows.extend(zip(*conv))
+        self.pending += kept
+        return keep
+
+    def full(self) -> bool:
+        if self.pending >= self.batch:
+            return True
+        return self.mode == "copy" and self.buf.tell() >= COPY_BUFFER_BYTES
+
+    # Con `update` las filas existentes se actualizan solo si algún valor cambió
+    # (las iguales no generan versiones nuevas ni cuentan como insertadas).
+    def _on_conflict(self) -> str:
+        if not self.update:
+            return f"ON CONFLICT ({self.conflict}) DO NOTHING"
+        new = ", ".join(f"EXCLUDED.{c}" for c in self.update)
+        old = ", ".join(f"{self.table}.{c}" for c in self.update)
+        sets = ", ".join(f"{c} = EXCLUDED.{c}" for c in self.update)
+        return (f"ON CONFLICT ({self.conflict}) DO UPDATE SET {sets} "
+                f"WHERE ({old}) IS DISTINCT FROM ({new})")
+
+    def flush(self, cur) -> int:
+        if not self.pending:
+            return 0
+        t0 = time.perf_counter()
+        target = _qualified(self.table)
+        cols = ", ".join(self.cols)
+
+        if self.where is None and self.mode != "copy":
+            # por páginas a mano para sumar el rowcount de cada sentencia
+            for i in range(0, len(self.rows), 1000):
+                _execute_values(cur, f"""
+                    INSERT INTO {target} ({cols})
+                    VALUES %s
+                    {self._on_conflict()}
+                """, self.rows[i:i + 1000], page_size=1000)
+                self.inserted += max(cur.rowcount, 0)
+        else:
+            temp = f"tmp_{self.table}"
+            _stage(cur, temp, self.ddl)
+            if self.mode == "copy":
+                _stage_copy(cur, temp, self.cols, self.buf)
+            else:
+                _stage_fill(cur, temp, self.rows, page_size=2000)
+            where = f"WHERE {self.where}" if self.where else ""
+            cur.execute(f"""
+                INSERT INTO {target} ({cols})
+                SELECT {cols}
+                FROM {temp} t
+                {where}
+                {self._on_conflict()}
+            """)
+            self.inserted += max(cur.rowcount, 0)
+
+        sent = self.pending
+        self.sent += sent
+        self.rows.clear()
+        self.buf = io.StringIO()
+        self.pending = 0
+        self.seconds += time.perf_counter() - t0
+        return sent
+
+
+# Agrupa los buffers que salen de un mismo TSV. Se vuelcan juntos y en el orden
+# en que se declararon (padres antes que hijos), con un único commit por lote.
+class _Stager:
+    def __init__(self, cur, conn, chunk: "_Chunk"):
+        self.cur = cur
+        self.conn = conn
+        self.chunk = chunk
+        self.mode = chunk.mode
+        self.tables: List[_TableBuffer] = []
+        self.started = time.perf_counter()
+
+    # `keys` = {posición de columna: tabla padre}. Con prefiltro se resuelve a
+    # conjuntos de llaves en memoria; sin él se usa el filtro `where` en el servidor.
+    # keys={} indica que el padre sale de la misma línea y no hace falta chequear.
+    # Las columnas de INT_IDS pasan a enteros (tipo y tabla temporal) según LAYOUT.
+    def table(self, table: str, cols: Tuple[str, ...], kinds: Tuple[str, ...], ddl: str,
+              conflict: str, where: Optional[str] = None, batch: int = BATCH_MED,
+              keys: Optional[Dict[int, str]] = None, update: Tuple[str, ...] = ()) -> _TableBuffer:
+        ids = _int_ids(table)
+        if ids:
+            kinds = tuple(ids.get(c, k) for c, k in zip(cols, kinds))
+            for c in ids:
+                ddl = re.sub(rf"\b{c} varchar\(20\)", f"{c} integer", ddl)
+        checks = None
+        if self.chunk.prefilter and keys is not None:
+            checks = [(i, _keyset(self.conn, parent)) for i, parent in keys.items()]
+            where = None
+        tb = _TableBuffer(table, cols, kinds, ddl, conflict, where=where, batch=batch,
+                          mode=self.mode, checks=checks, update=update)
+        self.tables.append(tb)
+        return tb
+
+    def full(self) -> bool:
+        return any(t.full() for t in self.tables)
+
+    # El checkpoint viaja en la misma transacción que el lote: si el commit
+    # falla, ni las filas ni el offset quedan guardados.
+    def flush(self):
+        for t in self.tables:
+            t.flush(self.cur)
+        _save_checkpoint(self.cur, self.chunk)
+        self.conn.commit()
+
+    def counts(self) -> Counts:
+        return {t.table: (t.inserted, t.rejected, t.sent - t.inserted) for t in self.tables}
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        for t in self.tables:
+            db_rate = t.sent / t.seconds if t.seconds else 0.0
+            print(f"  [{self.mode}] {t.table}: {t.sent} filas enviadas, {t.inserted} insertadas, "
+                  f"{t.rejected} huérfanas en {elapsed:.1f}s "
+                  f"-> {t.sent / elapsed:,.0f} filas/s (BD: {db_rate:,.0f} filas/s)")
+
+
+# --------------------------------------------------------------------
+# Loaders
+# --------------------------------------------------------------------
+# Los filtros EXISTS de cada tabla se usan con --no-prefilter; por defecto se
+# resuelven en el cliente con las llaves de `keys` antes de enviar nada.
+# Cada loader recorre el archivo por bloques y pasa columnas enteras a los
+# buffers; la conversión de tipos la hace el buffer según `kinds`.
+# Las tablas con una fila por línea del TSV hacen upsert (`update`): recargar un
+# dump nuevo actualiza lo que cambió. Las que salen de listas (géneros,
+# profesiones, types, ...) solo insertan; en modo delta se borran antes las de
+# las llaves cambiadas (DELTA_TABLES).
+
+# Inserta primero title_basics y luego basics_genres; basics_genres se filtra por EXISTS.
+# Rellena NOT NULL con defaults si vienen \N.
+def _load_title_basics_and_genres(cur, conn, chunk: "_Chunk") -> Counts:
+    st = _Stager(cur, conn, chunk)
+    tb = st.table("title_basics",
+                  ("tconst", "titletype", "primarytitle", "originaltitle", "isadult",
+                   "startyear", "endyear", "runtimeminutes"),
+                  ("raw", "text!", "text!", "text!", "bool01", "int", "int", "int"),
+                  "tconst varchar(20), titletype varchar(64), primarytitle text, originaltitle text, "
+                  "isadult boolean, startyear smallint, endyear smallint, runtimeminutes int",
+                  conflict="tconst", batch=BATCH_SMALL,
+                  update=("titletype", "primarytitle", "originaltitle", "isadult",
+                          "startyear", "endyear", "runtimeminutes"))
+    bg = st.table("basics_genres", ("tconst", "primarytitle", "genre"), ("raw", "text!", "raw"),
+                  "tconst varchar(20), primarytitle text, genre varchar(64)",
+                  conflict="tconst, genre",
+                  where=_exists("title_basics", "p.tconst = t.tconst"), keys={})
+
+    for rows in chunk.batches():
+        cols = chunk.columns(rows, "tconst", "titleType", "primaryTitle", "originalTitle",
+                             "isAdult", "startYear", "endYear", "runtimeMinutes", "genres")
+        tb.add_many(cols[:8])
+        bg.add_many(_explode(cols[8], cols[0], cols[2]))
+
+        if st.full():
+            st.flush()
+
+    st.flush()
+    st.report()
+    return st.counts()
+
+
+# name_basics -> inserta siempre; si primaryname viene \N, se rellena con '\N'.
+# name_professions -> filtrado por EXISTS en name_basics
+def _load_name_basics_and_professions(cur, conn, chunk: "_Chunk") -> Counts:
+    st = _Stager(cur, conn, chunk)
+    nb = st.table("name_basics", ("nconst", "primaryname", "birthyear", "deathyear"),
+                  ("raw", "text!", "int", "int"),
+                  "nconst varchar(20), primaryname text, birthyear smallint, deathyear smallint",
+                  conflict="nconst", batch=BATCH_SMALL,
+                  update=("primaryname", "birthyear", "deathyear"))
+    np_ = st.table("name_professions", ("nconst", "profession"), ("raw", "raw"),
+                   "nconst varchar(20), profession varchar(64)",
+                   conflict="nconst, profession",
+                   where=_exists("name_basics", "p.nconst = t.nconst"), keys={})
+
+    for rows in chunk.batches():
+        cols = chunk.columns(rows, "nconst", "primaryName", "birthYear", "deathYear",
+                             "primaryProfession")
+        nb.add_many(cols[:4])
+        np_.add_many(_explode(cols[4], cols[0]))
+
+        if st.full():
+            st.flush()
+
+    st.flush()
+    st.report()
+    return st.counts()
+
+
+# name_known_for -> filtrado por EXISTS en name_basics y title_basics.
+# Va en una pasada aparte sobre name.basics.tsv porque depende de ambas tablas base.
+def _load_name_known_for(cur, conn, chunk: "_Chunk") -> Counts:
+    st = _Stager(cur, conn, chunk)
+    nk = st.table("name_known_for", ("nconst", "tconst"), ("raw", "raw"),
+                  "nconst varchar(20), tconst varchar(20)",
+                  conflict="nconst, tconst",
+                  where=_exists("name_basics", "p.nconst = t.nconst")
+                  + " AND " + _exists("title_basics", "p.tconst = t.tconst"),
+                  keys={0: "name_basics", 1: "title_basics"})
+
+    for rows in chunk.batches():
+        nconst, known = chunk.columns(rows, "nconst", "knownForTitles")
+        nk.add_many(_explode(known, nconst))
+
+        if st.full():
+            st.flush()
+
+    st.flush()
+    st.report()
+    return st.counts()
 
 
 # akas -> filtrado por EXISTS en title_basics
 # aka_types/aka_attributes -> filtrado por EXISTS en akas (padre compuesto)
 # Rellena NOT NULL de 'title' con '\N' si viene nulo.
-def _load_title_akas_and_parts(cur, conn) -> Tuple[int, int, int]:
-    path = os.path.join(BASE_DIR, "title.akas.tsv")
-    aka_rows, typ_rows, att_rows = [], [], []
-    ins_aka = ins_typ = ins_att = 0
-
-    with open(path, "r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f, delimiter="\t")
-        for row in reader:
-            titleid = row["titleId"]
-            ordering = _to_int(row["ordering"])
-            title = _none(row["title"]) or r"\N"
-            region = _none(row.get("region"))
-            isoriginaltitle = _to_bool_01(row.get("isOriginalTitle"))
-
-            aka_rows.append((titleid, ordering, title, region, isoriginaltitle))
-            for t in _split_csv(row.get("types")):
-                typ_rows.append((titleid, ordering, t))
-            for a in _split_csv(row.get("attributes")):
-                att_rows.append((titleid, ordering, a))
-
-            if len(aka_rows) >= BATCH_SMALL:
-                _stage(cur, "tmp_aka", "titleid varchar(20), ordering int, title text, region varchar(64), isoriginaltitle boolean")
-                _stage_fill(cur, "tmp_aka", aka_rows, page_size=1000)
-                cur.execute(f"""
-                    INSERT INTO {_qualified("akas")} (titleid, ordering, title, region, isoriginaltitle)
-                    SELECT t.titleid, t.ordering, t.title, t.region, t.isoriginaltitle
-                    FROM tmp_aka t
-                    WHERE EXISTS (SELECT 1 FROM {_qualified("title_basics")} b WHERE b.tconst = t.titleid)
-                    ON CONFLICT (titleid, ordering) DO NOTHING
-                """)
-                ins_aka += len(aka_rows)
-                aka_rows.clear()
-                conn.commit()
-
-            if len(typ_rows) >= BATCH_MED:
-                _stage(cur, "tmp_typ", "titleid varchar(20), ordering int, type text")
-                _stage_fill(cur, "tmp_typ", typ_rows, page_size=2000)
-                cur.execute(f"""
-                    INSERT INTO {_qualified("aka_types")} (titleid, ordering, type)
-                    SELECT t.titleid, t.ordering, t.type
-                    FROM tmp_typ t
-                    WHERE EXISTS (
-                      SELECT 1 FROM {_qualified("akas")} a
-                      WHERE a.titleid = t.titleid AND a.ordering = t.ordering
-                    )
-                    ON CONFLICT (titleid, ordering, type) DO NOTHING
-                """)
-                ins_typ += len(typ_rows)
-                typ_rows.clear()
-                conn.commit()
-
-            if len(att_rows) >= BATCH_MED:
-                _stage(cur, "tmp_att", "titleid varchar(20), ordering int, attribute text")
-                _stage_fill(cur, "tmp_att", att_rows, page_size=2000)
-                cur.execute(f"""
-                    INSERT INTO {_qualified("aka_attributes")} (titleid, ordering, attribute)
-                    SELECT t.titleid, t.ordering, t.attribute
-                    FROM tmp_att t
-                    WHERE EXISTS (
-                      SELECT 1 FROM {_qualified("akas")} a
-                      WHERE a.titleid = t.titleid AND a.ordering = t.ordering
-                    )
-                    ON CONFLICT (titleid, ordering, attribute) DO NOTHING
-                """)
-                ins_att += len(att_rows)
-                att_rows.clear()
-                conn.commit()
-
-    if aka_rows:
-        _stage(cur, "tmp_aka2", "titleid varchar(20), ordering int, title text, region varchar(64), isoriginaltitle boolean")
-        _stage_fill(cur, "tmp_aka2", aka_rows, page_size=1000)
-        cur.execute(f"""
-            INSERT INTO {_qualified("akas")} (titleid, ordering, title, region, isoriginaltitle)
-            SELECT t.titleid, t.ordering, t.title, t.region, t.isoriginaltitle
-            FROM tmp_aka2 t
-            WHERE EXISTS (SELECT 1 FROM {_qualified("title_basics")} b WHERE b.tconst = t.titleid)
-            ON CONFLICT (titleid, ordering) DO NOTHING
-        """)
-        ins_aka += len(aka_rows)
-        aka_rows.clear()
-        conn.commit()
+def _load_title_akas_and_parts(cur, conn, chunk: "_Chunk") -> Counts:
+    st = _Stager(cur, conn, chunk)
+    in_akas = _exists("akas", "p.titleid = t.titleid AND p.ordering = t.ordering")
+    aka = st.table("akas", ("titleid", "ordering", "title", "region", "isoriginaltitle"),
+                   ("raw", "int", "text!", "text", "bool01"),
+                   "titleid varchar(20), ordering int, title text, region varchar(64), isoriginaltitle boolean",
+                   conflict="titleid, ordering", batch=BATCH_SMALL,
+                   update=("title", "region", "isoriginaltitle"),
+                   where=_exists("title_basics", "p.tconst = " + _id_out("akas", "titleid", "t.titleid")),
+                   keys={0: "title_basics"})
+    typ = st.table("aka_types", ("titleid", "ordering", "type"), ("raw", "int", "raw"),
+                   "titleid varchar(20), ordering int, type text",
+                   conflict="titleid, ordering, type", where=in_akas, keys={})
+    att = st.table("aka_attributes", ("titleid", "ordering", "attribute"), ("raw", "int", "raw"),
+                   "titleid varchar(20), ordering int, attribute text",
+                   conflict="titleid, ordering, attribute", where=in_akas, keys={})
+
+    for rows in chunk.batches():
+        cols = chunk.columns(rows, "titleId", "ordering", "title", "region", "isOriginalTitle",
+                             "types", "attributes")
+        keep = aka.add_many(cols[:5])
+        typ.add_many(_explode(cols[5], cols[0], cols[1], keep=keep))
+        att.add_many(_explode(cols[6], cols[0], cols[1], keep=keep))
+
+        if st.full():
+            st.flush()
+
+    st.flush()
+    st.report()
+    return st.counts()
 
-    if typ_rows:
-        _stage(cur, "tmp_typ2", "titleid varchar(20), ordering int, type text")
-        _stage_fill(cur, "tmp_typ2", typ_rows, page_size=2000)
-        cur.execute(f"""
-            INSERT INTO {_qualified("aka_types")} (titleid, ordering, type)
-            SELECT t.titleid, t.ordering, t.type
-            FROM tmp_typ2 t
-            WHERE EXISTS (
-              SELECT 1 FROM {_qualified("akas")} a
-              WHERE a.titleid = t.titleid AND a.ordering = t.ordering
-            )
-            ON CONFLICT (titleid, ordering, type) DO NOTHING
-        """)
-        ins_typ += len(typ_rows)
-        typ_rows.clear()
-        conn.commit()
 
-    if att_rows:
-        _stage(cur, "tmp_att2", "titleid varchar(20), ordering int, attribute text")
-        _stage_fill(cur, "tmp_att2", att_rows, page_size=2000)
-        cur.execute(f"""
-            INSERT INTO {_qualified("aka_attributes")} (titleid, ordering, attribute)
-            SELECT t.titleid, t.ordering, t.attribute
-            FROM tmp_att2 t
-            WHERE EXISTS (
-              SELECT 1 FROM {_qualified("akas")} a
-              WHERE a.titleid = t.titleid AND a.ordering = t.ordering
-            )
-            ON CONFLICT (titleid, ordering, attribute) DO NOTHING
-        """)
-        ins_att += len(att_rows)
-        att_rows.clear()
-        conn.commit()
+# crew_directors / crew_writers -> filtrado por EXISTS en title_basics y name_basics
+def _load_title_crew(cur, conn, chunk: "_Chunk") -> Counts:
+    st = _Stager(cur, conn, chunk)
+    both = (_exists("title_basics", "p.tconst = t.tconst")
+            + " AND " + _exists("name_basics", "p.nconst = t.nconst"))
+    both_keys = {0: "title_basics", 1: "name_basics"}
+    cd = st.table("crew_directors", ("tconst", "nconst"), ("raw", "raw"),
+                  "tconst varchar(20), nconst varchar(20)",
+                  conflict="tconst, nconst", where=both, keys=both_keys)
+    cw = st.table("crew_writers", ("tconst", "nconst"), ("raw", "raw"),
+                  "tconst varchar(20), nconst varchar(20)",
+                  conflict="tconst, nconst", where=both, keys=both_keys)
+
+    for rows in chunk.batches():
+        tconst, directors, writers = chunk.columns(rows, "tconst", "directors", "writers")
+        cd.add_many(_explode(directors, tconst))
+        cw.add_many(_explode(writers, tconst))
+
+        if st.full():
+            st.flush()
+
+    st.flush()
+    st.report()
+    return st.counts()
 
-    return ins_aka, ins_typ, ins_att
 
+# episodes -> filtrado por EXISTS en title_basics para tconst y parenttconst
+def _load_title_episode(cur, conn, chunk: "_Chunk") -> Counts:
+    st = _Stager(cur, conn, chunk)
+    ep = st.table("episodes", ("tconst", "parenttconst", "seasonnumber", "episodenumber"),
+                  ("raw", "text", "int", "int"),
+                  "tconst varchar(20), parenttconst varchar(20), seasonnumber int, episodenumber int",
+                  conflict="tconst", batch=BATCH_SMALL,
+                  update=("parenttconst", "seasonnumber", "episodenumber"),
+                  where=_exists("title_basics", "p.tconst = t.tconst")
+                  + " AND (t.parenttconst IS NULL OR "
+                  + _exists("title_basics", "p.tconst = t.parenttconst") + ")",
+                  keys={0: "title_basics", 1: "title_basics"})
 
-# crew_directors / crew_writers -> filtrado por EXISTS en title_basics y name_basics
-def _load_title_crew(cur, conn) -> Tuple[int, int]:
-    path = os.path.join(BASE_DIR, "title.crew.tsv")
-    dir_rows, wri_rows = [], []
-    ins_dir = ins_wri = 0
-
-    with open(path, "r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f, delimiter="\t")
-        for row in reader:
-            tconst = row["tconst"]
-            for d in _split_csv(row.get("directors")):
-                dir_rows.append((tconst, d))
-            for w in _split_csv(row.get("writers")):
-                wri_rows.append((tconst, w))
-
-            if len(dir_rows) >= BATCH_MED:
-                _stage(cur, "tmp_cd", "tconst varchar(20), nconst varchar(20)")
-                _stage_fill(cur, "tmp_cd", dir_rows, page_size=2000)
-                cur.execute(f"""
-                    INSERT INTO {_qualified("crew_directors")} (tconst, nconst)
-                    SELECT t.tconst, t.nconst
-                    FROM tmp_cd t
-                    WHERE EXISTS (SELECT 1 FROM {_qualified("title_basics")} tb WHERE tb.tconst = t.tconst)
-                      AND EXISTS (SELECT 1 FROM {_qualified("name_basics")} nb WHERE nb.nconst = t.nconst)
-                    ON CONFLICT (tconst, nconst) DO NOTHING
-                """)
-                ins_dir += len(dir_rows)
-                dir_rows.clear()
-                conn.commit()
-
-            if len(wri_rows) >= BATCH_MED:
-                _stage(cur, "tmp_cw", "tconst varchar(20), nconst varchar(20)")
-                _stage_fill(cur, "tmp_cw", wri_rows, page_size=2000)
-                cur.execute(f"""
-                    INSERT INTO {_qualified("crew_writers")} (tconst, nconst)
-                    SELECT t.tconst, t.nconst
-                    FROM tmp_cw t
-                    WHERE EXISTS (SELECT 1 FROM {_qualified("title_basics")} tb WHERE tb.tconst = t.tconst)
-                      AND EXISTS (SELECT 1 FROM {_qualified("name_basics")} nb WHERE nb.nconst = t.nconst)
-                    ON CONFLICT (tconst, nconst) DO NOTHING
-                """)
-                ins_wri += len(wri_rows)
-                wri_rows.clear()
-                conn.commit()
-
-    if dir_rows:
-        _stage(cur, "tmp_cd2", "tconst varchar(20), nconst varchar(20)")
-        _stage_fill(cur, "tmp_cd2", dir_rows, page_size=2000)
+    for rows in chunk.batches():
+        ep.add_many(chunk.columns(rows, "tconst", "parentTconst", "seasonNumber", "episodeNumber"))
+
+        if st.full():
+            st.flush()
+
+    st.flush()
+    st.report()
+    return st.counts()
+
+
+# principals -> filtrado por EXISTS en title_basics y name_basics.
+# category es NOT NULL: si viene \N, se rellena '\N'.
+def _load_title_principals(cur, conn, chunk: "_Chunk") -> Counts:
+    st = _Stager(cur, conn, chunk)
+    pr = st.table("principals", ("tconst", "ordering", "nconst", "category", "job", "characters"),
+                  ("raw", "int", "raw", "text!", "text", "text"),
+                  "tconst varchar(20), ordering int, nconst varchar(20), category varchar(64), "
+                  "job varchar(512), characters text",
+                  conflict="tconst, ordering", batch=BATCH_SMALL,
+                  update=("nconst", "category", "job", "characters"),
+                  where=_exists("title_basics", "p.tconst = " + _id_out("principals", "tconst", "t.tconst"))
+                  + " AND " + _exists("name_basics", "p.nconst = " + _id_out("principals", "nconst", "t.nconst")),
+                  keys={0: "title_basics", 2: "name_basics"})
+
+    for rows in chunk.batches():
+        pr.add_many(chunk.columns(rows, "tconst", "ordering", "nconst", "category", "job",
+                                  "characters"))
+
+        if st.full():
+            st.flush()
+
+    st.flush()
+    st.report()
+    return st.counts()
+
+
+# ratings -> filtrado por EXISTS en title_basics.
+# NOT NULL: averagerating y numvotes -> defaults si vienen nulos.
+# Cada cambio de votos marca agg_dirty (trigger de script.sql).
+def _load_title_ratings(cur, conn, chunk: "_Chunk") -> Counts:
+    st = _Stager(cur, conn, chunk)
+    rt = st.table("ratings", ("tconst", "averagerating", "numvotes"), ("raw", "float0", "int0"),
+                  "tconst varchar(20), averagerating numeric, numvotes int",
+                  conflict="tconst", update=("averagerating", "numvotes"),
+                  where=_exists("title_basics", "p.tconst = t.tconst"),
+                  keys={0: "title_basics"})
+
+    for rows in chunk.batches():
+        rt.add_many(chunk.columns(rows, "tconst", "averageRating", "numVotes"))
+
+        if st.full():
+            st.flush()
+
+    st.flush()
+    st.report()
+    return st.counts()
+
+
+# --------------------------------------------------------------------
+# Índices y FKs diferidos
+# --------------------------------------------------------------------
+# Con --defer-indexes se guardan las definiciones de los índices secundarios y de
+# las FKs del schema en una tabla de control, se borran antes de cargar y se
+# recrean al final: índices en paralelo (una conexión por hilo) y FKs como
+# NOT VALID + VALIDATE. Si la carga se cae, las definiciones siguen guardadas y
+# la siguiente corrida con --defer-indexes las restaura al terminar.
+DDL_TABLE = "carga_ddl"
+
+def _ensure_ddl_table(cur):
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {_qualified(DDL_TABLE)} (
+            kind       text NOT NULL,   -- 'index' | 'fk'
+            table_name text NOT NULL,   -- schema.tabla ya entrecomillado
+            name       text NOT NULL,   -- nombre ya entrecomillado
+            definition text NOT NULL,
+            PRIMARY KEY (kind, table_name, name)
+        )
+    """)
+
+def _pending_ddl(conn) -> int:
+    with conn.cursor() as cur:
+        _ensure_ddl_table(cur)
+        cur.execute(f"SELECT count(*) FROM {_qualified(DDL_TABLE)}")
+        n = cur.fetchone()[0]
+    conn.commit()
+    return n
+
+def _saved_ddl(cur, kind: str) -> List[Tuple[str, str, str]]:
+    cur.execute(f"""
+        SELECT table_name, name, definition FROM {_qualified(DDL_TABLE)}
+        WHERE kind = %s ORDER BY table_name, name
+    """, (kind,))
+    return cur.fetchall()
+
+# Guarda (sin pisar lo ya guardado) y borra índices secundarios y FKs.
+# Los índices de PK/UNIQUE se quedan: ON CONFLICT los necesita.
+# Con search_only solo los índices de búsqueda (idx_search_*) de `tables`; lo
+# demás que hubiera en DDL_TABLE no se toca.
+# En tablas particionadas se guarda solo lo del padre (ON ONLY ...): borrarlo
+# borra lo de cada partición y _restore_ddl lo vuelve a armar.
+def _drop_ddl(conn, search_only: bool = False, tables: Tuple[str, ...] = ()):
+    with conn.cursor() as cur:
+        _ensure_ddl_table(cur)
         cur.execute(f"""
-            INSERT INTO {_qualified("crew_directors")} (tconst, nconst)
-            SELECT t.tconst, t.nconst
-            FROM tmp_cd2 t
-            WHERE EXISTS (SELECT 1 FROM {_qualified("title_basics")} tb WHERE tb.tconst = t.tconst)
-              AND EXISTS (SELECT 1 FROM {_qualified("name_basics")} nb WHERE nb.nconst = t.nconst)
-            ON CONFLICT (tconst, nconst) DO NOTHING
-        """)
-        ins_dir += len(dir_rows)
-        dir_rows.clear()
+            INSERT INTO {_qualified(DDL_TABLE)} (kind, table_name, name, definition)
+            SELECT 'index', format('%%I.%%I', n.nspname, ct.relname), format('%%I', ci.relname),
+                   pg_get_indexdef(i.indexrelid)
+            FROM pg_index i
+            JOIN pg_class ci ON ci.oid = i.indexrelid
+            JOIN pg_class ct ON ct.oid = i.indrelid
+            JOIN pg_namespace n ON n.oid = ct.relnamespace
+            WHERE n.nspname = %s
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint c
+                              WHERE c.conindid = i.indexrelid AND c.contype IN ('p', 'u', 'x'))
+              AND NOT EXISTS (SELECT 1 FROM pg_inherits h WHERE h.inhrelid = i.indexrelid)
+              AND (NOT %s OR (starts_with(ci.relname, %s) AND ct.relname = ANY(%s)))
+            UNION ALL
+            SELECT 'fk', format('%%I.%%I', n.nspname, ct.relname), format('%%I', c.conname),
+                   pg_get_constraintdef(c.oid)
+            FROM pg_constraint c
+            JOIN pg_class ct ON ct.oid = c.conrelid
+            JOIN pg_namespace n ON n.oid = ct.relnamespace
+            WHERE n.nspname = %s AND c.contype = 'f' AND c.conparentid = 0 AND NOT %s
+            ON CONFLICT DO NOTHING
+        """, (SCHEMA, search_only, SEARCH_INDEX_PREFIX, list(tables), SCHEMA, search_only))
+
+        fks = [] if search_only else _saved_ddl(cur, "fk")
+        indexes = [(t, n, d) for t, n, d in _saved_ddl(cur, "index")
+                   if not search_only or (n.strip('"').startswith(SEARCH_INDEX_PREFIX)
+                                          and t.rsplit(".", 1)[-1].strip('"') in tables)]
+        for table, name, _ in fks:
+            cur.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {name}")
+        for table, name, _ in indexes:
+            cur.execute(f"DROP INDEX IF EXISTS {SCHEMA}.{name}")
+    conn.commit()
+    print(f"  {len(indexes)} índice(s) y {len(fks)} FK(s) diferidos")
+
+# Tablas con índices de búsqueda que las tareas van a llenar desde vacías
+def _search_tables_to_defer(conn, tasks: List[str]) -> Tuple[str, ...]:
+    out = []
+    with conn.cursor() as cur:
+        for t in tasks:
+            if t in SEARCH_TABLES:
+                cur.execute(f"SELECT NOT EXISTS (SELECT 1 FROM {_qualified(SEARCH_TABLES[t])})")
+                if cur.fetchone()[0]:
+                    out.append(SEARCH_TABLES[t])
+    conn.commit()
+    return tuple(out)
+
+# Corre cada sentencia en un hilo con su propia conexión en autocommit y, si sale
+# bien, borra su fila de la tabla de control (kind=None: no tiene fila propia).
+def _run_ddl_parallel(stmts: List[Tuple[str, str, str, str]], workers: int):
+    def run(item):
+        kind, table, name, sql = item
+        conn = psycopg2.connect(**DB_CONFIG)
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"SET maintenance_work_mem = '{MAINTENANCE_WORK_MEM}'")
+                t0 = time.perf_counter()
+                cur.execute(sql)
+                if kind:
+                    cur.execute(f"""
+                        DELETE FROM {_qualified(DDL_TABLE)}
+                        WHERE kind = %s AND table_name = %s AND name = %s
+                    """, (kind, table, name))
+                print(f"  {name}: {time.perf_counter() - t0:.1f}s")
+        finally:
+            conn.close()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        list(ex.map(run, stmts))
+
+def _partitions(cur, table: str) -> List[str]:
+    cur.execute("""
+        SELECT format('%%I.%%I', n.nspname, c.relname), c.relname
+        FROM pg_inherits h JOIN pg_class c ON c.oid = h.inhrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE h.inhparent = %s::regclass ORDER BY c.relname
+    """, (table,))
+    return cur.fetchall()
+
+# Nombre de tabla o índice, con o sin schema y comillas, como lo escribe pg_get_indexdef
+_IDENT = r'(?:"(?:[^"]|"")+"|[^\s."]+)(?:\.(?:"(?:[^"]|"")+"|[^\s."]+))?'
+
+# Definición del índice de una partición a partir de la del padre (ON ONLY ...)
+def _partition_index_def(definition: str, child: str, part: str) -> str:
+    out, n = re.subn(rf"^(CREATE (?:UNIQUE )?INDEX IF NOT EXISTS ){_IDENT} ON ONLY {_IDENT} ",
+                     lambda m: f"{m.group(1)}{child} ON {part} ", definition)
+    if n != 1:
+        raise RuntimeError(f"definición de índice particionado inesperada: {definition}")
+    return out
+
+def _restore_ddl(conn, workers: int, phases: Dict[str, float]):
+    with conn.cursor() as cur:
+        _ensure_ddl_table(cur)
+        indexes = _saved_ddl(cur, "index")
+        fks = _saved_ddl(cur, "fk")
+    conn.commit()
+
+    # Índices de tablas particionadas: el del padre se crea ON ONLY (vacío), el de
+    # cada partición va en paralelo con el resto y al final se enganchan al padre.
+    with _phase("indices", phases):
+        stmts, attach = [], []
+        with conn.cursor() as cur:
+            for t, n, d in indexes:
+                d = re.sub(r"^CREATE (UNIQUE )?INDEX ", r"CREATE \1INDEX IF NOT EXISTS ", d)
+                if " ON ONLY " not in d:
+                    stmts.append(("index", t, n, d))
+                    continue
+                cur.execute(d)
+                children, base = [], n.strip('"')
+                for part, relname in _partitions(cur, t):
+                    child = f"{base}_{relname}"
+                    children.append(child)
+                    stmts.append((None, part, child, _partition_index_def(d, child, part)))
+                attach.append((t, n, children))
+        conn.commit()
+        _run_ddl_parallel(stmts, workers)
+        with conn.cursor() as cur:
+            for t, n, children in attach:
+                for child in children:
+                    cur.execute(f"ALTER INDEX {SCHEMA}.{n} ATTACH PARTITION {SCHEMA}.{child}")
+                cur.execute(f"""
+                    DELETE FROM {_qualified(DDL_TABLE)}
+                    WHERE kind = 'index' AND table_name = %s AND name = %s
+                """, (t, n))
         conn.commit()
 
-    if wri_rows:
-        _stage(cur, "tmp_cw2", "tconst varchar(20), nconst varchar(20)")
-        _stage_fill(cur, "tmp_cw2", wri_rows, page_size=2000)
-        cur.execute(f"""
-            INSERT INTO {_qualified("crew_writers")} (tconst, nconst)
-            SELECT t.tconst, t.nconst
-            FROM tmp_cw2 t
-            WHERE EXISTS (SELECT 1 FROM {_qualified("title_basics")} tb WHERE tb.tconst = t.tconst)
-              AND EXISTS (SELECT 1 FROM {_qualified("name_basics")} nb WHERE nb.nconst = t.nconst)
-            ON CONFLICT (tconst, nconst) DO NOTHING
-        """)
-        ins_wri += len(wri_rows)
-        wri_rows.clear()
+    # ADD ... NOT VALID es instantáneo (sin escanear); VALIDATE recorre la tabla
+    # sin bloquear escrituras y puede ir en paralelo. Postgres no acepta NOT VALID
+    # en tablas particionadas: esas FKs se agregan completas en la fase paralela.
+    validate = []
+    with _phase("fks_not_valid", phases):
+        with conn.cursor() as cur:
+            for table, name, definition in fks:
+                cur.execute("SELECT 1 FROM pg_constraint WHERE conrelid = %s::regclass AND conname = %s",
+                            (table, name.strip('"')))
+                exists = cur.fetchone() is not None
+                cur.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass", (table,))
+                if not exists and cur.fetchone()[0] == "p":
+                    validate.append(("fk", table, name, f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}"))
+                    continue
+                if not exists:
+                    cur.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition} NOT VALID")
+                validate.append(("fk", table, name, f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}"))
         conn.commit()
+    with _phase("fks_validate", phases):
+        _run_ddl_parallel(validate, workers)
 
-    return ins_dir, ins_wri
+@contextmanager
+def _phase(name: str, phases: Dict[str, float]):
+    print(f"[fase] {name}...")
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = time.perf_counter() - t0
+        print(f"[fase] {name}: {phases[name]:.1f}s")
 
 
-# episodes -> filtrado por EXISTS en title_basics para tconst y parenttconst
-def _load_title_episode(cur, conn) -> int:
-    path = os.path.join(BASE_DIR, "title.episode.tsv")
-    ep_rows = []
-    ins_ep = 0
-
-    with open(path, "r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f, delimiter="\t")
-        for row in reader:
-            tconst = row["tconst"]
-            parent = _none(row["parentTconst"])
-            season = _to_int(row.get("seasonNumber"))
-            epis   = _to_int(row.get("episodeNumber"))
-            ep_rows.append((tconst, parent, season, epis))
-
-            if len(ep_rows) >= BATCH_SMALL:
-                _stage(cur, "tmp_ep", "tconst varchar(20), parenttconst varchar(20), seasonnumber int, episodenumber int")
-                _stage_fill(cur, "tmp_ep", ep_rows, page_size=1000)
-                cur.execute(f"""
-                    INSERT INTO {_qualified("episodes")} (tconst, parenttconst, seasonnumber, episodenumber)
-                    SELECT t.tconst, t.parenttconst, t.seasonnumber, t.episodenumber
-                    FROM tmp_ep t
-                    WHERE EXISTS (SELECT 1 FROM {_qualified("title_basics")} b WHERE b.tconst = t.tconst)
-                      AND (t.parenttconst IS NULL OR EXISTS (SELECT 1 FROM {_qualified("title_basics")} b2 WHERE b2.tconst = t.parenttconst))
-                    ON CONFLICT (tconst) DO NOTHING
-                """)
-                ins_ep += len(ep_rows)
-                ep_rows.clear()
-                conn.commit()
-
-    if ep_rows:
-        _stage(cur, "tmp_ep2", "tconst varchar(20), parenttconst varchar(20), seasonnumber int, episodenumber int")
-        _stage_fill(cur, "tmp_ep2", ep_rows, page_size=1000)
-        cur.execute(f"""
-            INSERT INTO {_qualified("episodes")} (tconst, parenttconst, seasonnumber, episodenumber)
-            SELECT t.tconst, t.parenttconst, t.seasonnumber, t.episodenumber
-            FROM tmp_ep2 t
-            WHERE EXISTS (SELECT 1 FROM {_qualified("title_basics")} b WHERE b.tconst = t.tconst)
-              AND (t.parenttconst IS NULL OR EXISTS (SELECT 1 FROM {_qualified("title_basics")} b2 WHERE b2.tconst = t.parenttconst))
-            ON CONFLICT (tconst) DO NOTHING
-        """)
-        ins_ep += len(ep_rows)
-        ep_rows.clear()
-        conn.commit()
+# --------------------------------------------------------------------
+# Modo delta (manifiesto local por tramos)
+# --------------------------------------------------------------------
+# IMDb publica cada día los TSV completos y casi todo se repite. Con --delta:
+#   1. cada TSV se parte en tramos que dependen del contenido: uno empieza en
+#      cada línea ancla (id terminado en `zeros` ceros, ej. tt0012300 con
+#      zeros=2) y sigue hasta la próxima. Una línea que cambia, aparece o se va
+#      solo altera su tramo; los demás quedan iguales byte a byte, aunque el
+#      archivo no venga ordenado. Las anclas salen de una regex sobre los bytes,
+#      sin partir las líneas.
+#   2. el blake2b de los bytes de cada tramo se compara con el del manifiesto
+#      (DELTA_DIR/<tarea>/index.tsv). Solo los tramos distintos se parten en filas
+#      y se hashean, y sus (llave, hash) se comparan con los guardados de los
+#      tramos anteriores que ya no coinciden: a DELTA_TABLE van solo las llaves
+#      nuevas/cambiadas ('u') y las que ya no están ('d')
+#   3. se borran en bloque las filas de las llaves 'd' y las hijas (géneros,
+#      profesiones, ...) de las 'u', que se vuelven a insertar
+#   4. los loaders de siempre recorren el archivo pero solo envían las líneas 'u'
+#      (upsert)
+#   5. al terminar todo bien index.new reemplaza a index.tsv: los tramos iguales
+#      siguen apuntando a sus hashes de antes y los cambiados a los segmentos
+#      (seg-*.tsv) que escribió esta corrida
+# Si la corrida se cae, index.tsv no cambió: la siguiente recalcula el mismo delta
+# y lo vuelve a aplicar (borrados y upserts son idempotentes).
+# La primera corrida de una tarea (sin manifiesto) es una carga completa que
+# deja la línea base. Memoria: los hashes de los tramos cambiados, no del archivo.
+DELTA_TABLE = "carga_delta"
+# Manifiesto de versiones anteriores, en la base (se borra al pasar al local)
+OLD_MANIFESTS = ("carga_manifest", "carga_manifest_new")
+INDEX_VERSION = "v1"
+
+# Columnas que forman la llave de cada línea (el resto de archivos usan la
+# primera); las de dos columnas se guardan como "<id>:<ordering>"
+DELTA_KEY_WIDTH = {"title.akas.tsv": 2, "title.principals.tsv": 2}
+
+# Por tarea: (tabla, columnas de la llave, ops). Con 'u' se borran las filas de
+# las llaves cambiadas (hijas que el loader reinserta); con 'd' las de las llaves
+# que desaparecieron del dump. En llaves de dos columnas la segunda es `ordering`.
+DELTA_TABLES = {
+    "title_basics":   (("basics_genres", "tconst", "ud"), ("title_basics", "tconst", "d")),
+    "name_basics":    (("name_professions", "nconst", "ud"), ("name_basics", "nconst", "d")),
+    "name_known_for": (("name_known_for", "nconst", "ud"),),
+    "akas":           (("aka_types", "titleid, ordering", "ud"), ("aka_attributes", "titleid, ordering", "ud"),
+                       ("akas", "titleid, ordering", "d")),
+    "crew":           (("crew_directors", "tconst", "ud"), ("crew_writers", "tconst", "ud")),
+    "episodes":       (("episodes", "tconst", "d"),),
+    "principals":     (("principals", "tconst, ordering", "d"),),
+    "ratings":        (("ratings", "tconst", "d"),),
+}
 
-    return ins_ep
+# Filas que apuntan a un título/persona borrado aunque su propia línea siga en
+# otro TSV (las FKs no permitirían borrar el padre). Nietas antes que hijas.
+DELTA_DEPENDENTS = {
+    "title_basics": (("aka_types", "titleid"), ("aka_attributes", "titleid"), ("akas", "titleid"),
+                     ("basics_genres", "tconst"), ("crew_directors", "tconst"), ("crew_writers", "tconst"),
+                     ("episodes", "tconst"), ("episodes", "parenttconst"), ("principals", "tconst"),
+                     ("ratings", "tconst"), ("name_known_for", "tconst")),
+    "name_basics":  (("name_professions", "nconst"), ("name_known_for", "nconst"),
+                     ("crew_directors", "nconst"), ("crew_writers", "nconst"), ("principals", "nconst")),
+}
 
+def _ensure_delta_tables(cur):
+    cur.execute("DROP TABLE IF EXISTS " + ", ".join(_qualified(t) for t in OLD_MANIFESTS))
+    # Tabla de trabajo de una corrida: sin WAL, se recalcula si se pierde
+    cur.execute(f"""
+        CREATE UNLOGGED TABLE IF NOT EXISTS {_qualified(DELTA_TABLE)} (
+            task text    NOT NULL,
+            key  text    NOT NULL,
+            op   "char"  NOT NULL,   -- 'u' nueva o cambiada, 'd' borrada
+            PRIMARY KEY (task, key)
+        )
+    """)
 
-# principals -> filtrado por EXISTS en title_basics y name_basics.
-# category es NOT NULL: si viene \N, se rellena '\N'.
-def _load_title_principals(cur, conn) -> int:
-    path = os.path.join(BASE_DIR, "title.principals.tsv")
-    pr_rows = []
-    ins_pr = 0
-
-    with open(path, "r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f, delimiter="\t")
-        for row in reader:
-            pr_rows.append((
-                row["tconst"],
-                _to_int(row["ordering"]),
-                row["nconst"],
-                _none(row["category"]) or r"\N",
-                _none(row.get("job")),
-                _none(row.get("characters"))
-            ))
-
-            if len(pr_rows) >= BATCH_SMALL:
-                _stage(cur, "tmp_pr", "tconst varchar(20), ordering int, nconst varchar(20), category varchar(64), job varchar(512), characters text")
-                _stage_fill(cur, "tmp_pr", pr_rows, page_size=1000)
-                cur.execute(f"""
-                    INSERT INTO {_qualified("principals")} (tconst, ordering, nconst, category, job, characters)
-                    SELECT t.tconst, t.ordering, t.nconst, t.category, t.job, t.characters
-                    FROM tmp_pr t
-                    WHERE EXISTS (SELECT 1 FROM {_qualified("title_basics")} tb WHERE tb.tconst = t.tconst)
-                      AND EXISTS (SELECT 1 FROM {_qualified("name_basics")} nb WHERE nb.nconst = t.nconst)
-                    ON CONFLICT (tconst, ordering) DO NOTHING
-                """)
-                ins_pr += len(pr_rows)
-                pr_rows.clear()
-                conn.commit()
-
-    if pr_rows:
-        _stage(cur, "tmp_pr2", "tconst varchar(20), ordering int, nconst varchar(20), category varchar(64), job varchar(512), characters text")
-        _stage_fill(cur, "tmp_pr2", pr_rows, page_size=1000)
-        cur.execute(f"""
-            INSERT INTO {_qualified("principals")} (tconst, ordering, nconst, category, job, characters)
-            SELECT t.tconst, t.ordering, t.nconst, t.category, t.job, t.characters
-            FROM tmp_pr2 t
-            WHERE EXISTS (SELECT 1 FROM {_qualified("title_basics")} tb WHERE tb.tconst = t.tconst)
-              AND EXISTS (SELECT 1 FROM {_qualified("name_basics")} nb WHERE nb.nconst = t.nconst)
-            ON CONFLICT (tconst, ordering) DO NOTHING
-        """)
-        ins_pr += len(pr_rows)
-        pr_rows.clear()
-        conn.commit()
+def _line_key(row: List[str], width: int) -> str:
+    return row[0] if width == 1 else ":".join(row[:width])
 
-    return ins_pr
+def _line_hash(row: List[str]) -> int:
+    digest = hashlib.blake2b("\t".join(row).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
 
+# Manifiesto de una tarea: (zeros, hash del encabezado, tramos en orden), cada
+# tramo (nombre, digest, líneas, segmento, offset, largo). El nombre es el id del
+# ancla ("" el tramo antes de la primera; "#n" si el id se repite más adelante) y
+# segmento/offset/largo ubican sus líneas "llave\thash" en DELTA_DIR/<tarea>/.
+# index.tsv: "v1\tzeros\tencabezado" y después un tramo por línea.
+Index = Tuple[int, str, List[tuple]]
 
-# ratings -> filtrado por EXISTS en title_basics.
-# NOT NULL: averagerating y numvotes -> defaults si vienen nulos.
-def _load_title_ratings(cur, conn) -> int:
-    path = os.path.join(BASE_DIR, "title.ratings.tsv")
-    rt_rows = []
-    ins_rt = 0
-
-    with open(path, "r", encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f, delimiter="\t")
-        for row in reader:
-            avg = _to_float(row["averageRating"])
-            votes = _to_int(row["numVotes"])
-            rt_rows.append((
-                row["tconst"],
-                0.0 if avg is None else avg,
-                0   if votes is None else votes
-            ))
-
-            if len(rt_rows) >= BATCH_MED:
-                _stage(cur, "tmp_rt", "tconst varchar(20), averagerating numeric, numvotes int")
-                _stage_fill(cur, "tmp_rt", rt_rows, page_size=2000)
+def _read_index(path: str) -> Optional[Index]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        version, zeros, header = f.readline().rstrip("\n").split("\t")
+        if version != INDEX_VERSION:
+            return None
+        ranges = []
+        for line in f:
+            name, digest, lines, seg, offset, length = line.rstrip("\n").split("\t")
+            ranges.append((name, digest, int(lines), seg, int(offset), int(length)))
+    return int(zeros), header, ranges
+
+def _write_index(path: str, index: Index):
+    zeros, header, ranges = index
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{INDEX_VERSION}\t{zeros}\t{header}\n")
+        f.writelines("\t".join(map(str, r)) + "\n" for r in ranges)
+        f.flush()
+        os.fsync(f.fileno())
+
+# Ceros del ancla: los más que, en el primer MB, dejan tramos de hasta
+# DELTA_RANGE_BYTES en promedio (mínimo 1). Queda fijo en el manifiesto: con
+# otro valor cambiarían todos los tramos.
+def _delta_zeros(path: str) -> int:
+    with open(path, "rb") as f:
+        f.readline()
+        sample = f.read(READ_BLOCK)
+    ids = {line.split(b"\t", 1)[0] for line in sample.split(b"\n") if line}
+    zeros = 1
+    for k in range(2, 10):
+        anchors = sum(1 for i in ids if i.endswith(b"0" * k))
+        if not anchors or len(sample) / anchors > DELTA_RANGE_BYTES:
+            break
+        zeros = k
+    return zeros
+
+def _anchor_re(zeros: int):
+    return re.compile(rb"\n([a-z]{2}[0-9]*" + b"0" * zeros + rb")\t")
+
+# (offset, id) de las líneas ancla que empiezan en [start, end) (pool de procesos)
+def _delta_anchors(path: str, zeros: int, start: int, end: Optional[int]) -> List[Tuple[int, bytes]]:
+    pat = _anchor_re(zeros)
+    stop = os.path.getsize(path) if end is None else end
+    out = []
+    with open(path, "rb") as f:
+        lo = start
+        while lo < stop:
+            hi = min(lo + READ_BLOCK, stop)
+            base = max(lo - 1, 0)   # el \n anterior: la línea que empieza en `lo` cuenta
+            f.seek(base)
+            data = f.read(hi - base + 64)   # + el id de una línea que empieza antes de hi
+            out.extend((base + m.start() + 1, m.group(1)) for m in pat.finditer(data)
+                       if lo <= base + m.start() + 1 < hi)
+            lo = hi
+    return out
+
+# Anclas en orden del archivo -> tramos (nombre, inicio, fin) no vacíos
+def _delta_split(anchors: List[Tuple[int, bytes]], first: int, size: int) -> List[Tuple[str, int, int]]:
+    names, starts, seen, prev = [""], [first], {}, None
+    for pos, ident in anchors:
+        if ident == prev or pos < first:
+            continue   # varias líneas del mismo id (akas, principals): un solo tramo
+        prev = ident
+        name = ident.decode("ascii")
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name}#{seen[name]}")
+        starts.append(pos)
+    ends = starts[1:] + [size]
+    return [(n, s, e) for n, s, e in zip(names, starts, ends) if e > s]
+
+# Compara un grupo de tramos (nombre, inicio, fin, digest anterior o None) con su
+# digest; los distintos se hashean por fila y quedan en el segmento `seg` (pool de
+# procesos). Devuelve por tramo (nombre, digest, líneas, offset, largo, filas):
+# líneas None si no cambió; filas = [(llave, hash)] solo con `keep`.
+def _delta_ranges(path: str, key_width: int, ranges: List[tuple], seg: str, keep: bool) -> List[tuple]:
+    out = []
+    out_f = None
+    try:
+        with open(path, "rb") as f:
+            width = len(f.readline().split(b"\t"))
+            for name, start, end, old in ranges:
+                f.seek(start)
+                data = f.read(end - start)
+                digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+                if digest == old:
+                    out.append((name, digest, None, 0, 0, None))
+                    continue
+                recs = [(_line_key(r, key_width), _line_hash(r)) for r in _parse_rows(data, width)]
+                text = "".join(f"{k}\t{h}\n" for k, h in recs).encode("utf-8")
+                if out_f is None:
+                    out_f = open(seg, "wb")
+                offset = out_f.tell()
+                out_f.write(text)
+                out.append((name, digest, len(recs), offset, len(text), recs if keep else None))
+        if out_f is not None:
+            out_f.flush()
+            os.fsync(out_f.fileno())
+    finally:
+        if out_f is not None:
+            out_f.close()
+    return out
+
+# {llave: hash} de los tramos del manifiesto que se leen (una lectura por tramo)
+def _read_records(tdir: str, ranges: List[tuple]) -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    by_seg: Dict[str, List[tuple]] = {}
+    for r in ranges:
+        by_seg.setdefault(r[3], []).append(r)
+    for seg, rs in by_seg.items():
+        with open(os.path.join(tdir, seg), "rb") as f:
+            for _, _, _, _, offset, length in sorted(rs, key=lambda r: r[4]):
+                f.seek(offset)
+                for line in f.read(length).decode("utf-8").splitlines():
+                    key, h = line.split("\t")
+                    out[key] = int(h)
+    return out
+
+def _pool_map(ex, fn, jobs: List[tuple]) -> list:
+    if ex is None or len(jobs) <= 1:
+        return [fn(*job) for job in jobs]
+    return list(ex.map(fn, *zip(*jobs)))
+
+# Tramos, comparación y DELTA_TABLE de una tarea; deja DELTA_DIR/<tarea>/index.new
+def _delta_task(cur, task: str, ex, workers: int, chunk_bytes: int, run: str) -> Tuple[int, int, bool]:
+    fname = TASKS[task][0]
+    path = os.path.join(BASE_DIR, fname)
+    tdir = os.path.join(DELTA_DIR, task)
+    os.makedirs(tdir, exist_ok=True)
+    old = _read_index(os.path.join(tdir, "index.tsv"))
+    with open(path, "rb") as f:
+        header = hashlib.blake2b(f.readline(), digest_size=16).hexdigest()
+        first = f.tell()
+    size = os.path.getsize(path)
+    zeros = old[0] if old else _delta_zeros(path)
+    # con otro encabezado (columnas nuevas) ningún tramo se da por igual
+    olds = {r[0]: r for r in old[2]} if old and old[1] == header else {}
+
+    anchors = _pool_map(ex, _delta_anchors, [(path, zeros, s, e) for s, e in _chunks(path, chunk_bytes)])
+    ranges = _delta_split([a for part in anchors for a in part], first, size)
+    # grupos de tramos seguidos de ~size/workers bytes (como mucho chunk_bytes)
+    target = max(READ_BLOCK, min(chunk_bytes, size // max(workers, 1)))
+    jobs, group, group_bytes = [], [], 0
+    for name, s, e in ranges:
+        group.append((name, s, e, olds[name][1] if name in olds else None))
+        group_bytes += e - s
+        if group_bytes >= target:
+            jobs.append(group)
+            group, group_bytes = [], 0
+    if group:
+        jobs.append(group)
+    width = DELTA_KEY_WIDTH.get(fname, 1)
+    segs = [f"seg-{run}-{i:05d}.tsv" for i in range(len(jobs))]
+    results = _pool_map(ex, _delta_ranges, [(path, width, g, os.path.join(tdir, seg), old is not None)
+                                             for g, seg in zip(jobs, segs)])
+
+    new_ranges, same, news = [], set(), {}
+    for seg, res in zip(segs, results):
+        for name, digest, lines, offset, length, recs in res:
+            if lines is None:
+                same.add(name)
+                new_ranges.append(olds[name])
+            else:
+                new_ranges.append((name, digest, lines, seg, offset, length))
+                if recs:
+                    news.update(recs)
+    _write_index(os.path.join(tdir, "index.new"), (zeros, header, new_ranges))
+    lines = sum(r[2] for r in new_ranges)
+    changed = len(new_ranges) - len(same)
+
+    cur.execute(f"DELETE FROM {_qualified(DELTA_TABLE)} WHERE task = %s", (task,))
+    if old is None:
+        print(f"  {task}: {lines} líneas en {fname}, sin manifiesto previo "
+              f"(carga completa, queda la línea base en {len(new_ranges)} tramos)")
+        return lines, 0, False
+    prev = _read_records(tdir, [r for r in old[2] if r[0] not in same])
+    ups = [k for k, h in news.items() if prev.get(k) != h]
+    dels = [k for k in prev if k not in news]
+    if ups or dels:
+        ops = [("u", k) for k in ups] + [("d", k) for k in dels]
+        keys = _copy("raw", [k for _, k in ops])
+        buf = io.StringIO("".join(f"{task}\t{k}\t{op}\n" for (op, _), k in zip(ops, keys)))
+        cur.copy_expert(f"COPY {_qualified(DELTA_TABLE)} (task, key, op) FROM STDIN", buf)
+    print(f"  {task}: {lines} líneas en {fname}, {changed} de {len(new_ranges)} tramos distintos, "
+          f"{len(ups)} nuevas/cambiadas, {len(dels)} borradas")
+    return len(ups), len(dels), True
+
+# Calcula el delta de cada tarea en DELTA_TABLE.
+# Devuelve {tarea: (llaves 'u', llaves 'd', hay manifiesto previo)}.
+def _delta_prepare(ctl, tasks: List[str], workers: int, chunk_bytes: int) -> Dict[str, Tuple[int, int, bool]]:
+    run = f"{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+    out = {}
+    ex = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        with ctl.cursor() as cur:
+            _ensure_delta_tables(cur)
+            for t in tasks:
+                out[t] = _delta_task(cur, t, ex, workers, chunk_bytes, run)
+        ctl.commit()
+    finally:
+        if ex is not None:
+            ex.shutdown()
+    return out
+
+def _delta_match(table: str, cols: str) -> str:
+    names = [c.strip() for c in cols.split(",")]
+    if len(names) == 1:
+        return f"x.{names[0]} = {_id_in(table, names[0], 'd.key')}"
+    first = _id_in(table, names[0], "split_part(d.key, ':', 1)")
+    return f"x.{names[0]} = {first} AND x.{names[1]} = split_part(d.key, ':', 2)::int"
+
+# Borra en una transacción, tareas dependientes antes que sus padres. Las tareas
+# sin manifiesto previo no borran nada (todas sus llaves son 'u').
+def _delta_deletes(ctl, prepared: Dict[str, Tuple[int, int, bool]]):
+    delta = _qualified(DELTA_TABLE)
+    with ctl.cursor() as cur:
+        for t in reversed([t for t in TASKS if t in prepared and prepared[t][2]]):
+            for table, cols, ops in DELTA_TABLES[t]:
+                if "d" in ops:
+                    for dep, col in DELTA_DEPENDENTS.get(table, ()):
+                        cur.execute(f"""
+                            DELETE FROM {_qualified(dep)} x USING {delta} d
+                            WHERE d.task = %s AND d.op = 'd' AND x.{col} = {_id_in(dep, col, "d.key")}
+                        """, (t,))
+                        if cur.rowcount:
+                            print(f"  {dep}: {cur.rowcount} filas que apuntaban a {table} borradas")
                 cur.execute(f"""
-                    INSERT INTO {_qualified("ratings")} (tconst, averagerating, numvotes)
-                    SELECT t.tconst, t.averagerating, t.numvotes
-                    FROM tmp_rt t
-                    WHERE EXISTS (SELECT 1 FROM {_qualified("title_basics")} b WHERE b.tconst = t.tconst)
-                    ON CONFLICT (tconst) DO NOTHING
-                """)
-                ins_rt += len(rt_rows)
-                rt_rows.clear()
-                conn.commit()
-
-    if rt_rows:
-        _stage(cur, "tmp_rt2", "tconst varchar(20), averagerating numeric, numvotes int")
-        _stage_fill(cur, "tmp_rt2", rt_rows, page_size=2000)
-        cur.execute(f"""
-            INSERT INTO {_qualified("ratings")} (tconst, averagerating, numvotes)
-            SELECT t.tconst, t.averagerating, t.numvotes
-            FROM tmp_rt2 t
-            WHERE EXISTS (SELECT 1 FROM {_qualified("title_basics")} b WHERE b.tconst = t.tconst)
-            ON CONFLICT (tconst) DO NOTHING
-        """)
-        ins_rt += len(rt_rows)
-        rt_rows.clear()
+                    DELETE FROM {_qualified(table)} x USING {delta} d
+                    WHERE d.task = %s AND d.op = ANY(%s::"char"[]) AND {_delta_match(table, cols)}
+                """, (t, list(ops)))
+                if cur.rowcount:
+                    print(f"  {table}: {cur.rowcount} filas borradas")
+    ctl.commit()
+
+# Cache por proceso de las llaves 'u' de cada tarea; None = sin filtro (ninguna
+# en DELTA_TABLE: carga completa de la línea base, o más de DELTA_MAX_KEYS)
+_DELTA_KEYS: Dict[str, Optional[set]] = {}
+
+def _delta_keys(conn, task: str) -> Optional[set]:
+    if task not in _DELTA_KEYS:
+        keys = None
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT count(*) FROM {_qualified(DELTA_TABLE)} WHERE task = %s AND op = 'u'", (task,))
+            if 0 < cur.fetchone()[0] <= DELTA_MAX_KEYS:
+                cur.execute(f"SELECT key FROM {_qualified(DELTA_TABLE)} WHERE task = %s AND op = 'u'", (task,))
+                keys = {k for (k,) in cur}
         conn.commit()
+        _DELTA_KEYS[task] = keys
+    return _DELTA_KEYS[task]
+
+# index.new pasa a ser el manifiesto. Los segmentos con menos de la mitad en uso
+# se compactan en uno nuevo y los que quedan sin tramos se borran.
+def _commit_index(tdir: str, run: str):
+    new = os.path.join(tdir, "index.new")
+    if not os.path.exists(new):
+        return
+    zeros, header, ranges = _read_index(new)
+    live: Dict[str, int] = {}
+    for r in ranges:
+        live[r[3]] = live.get(r[3], 0) + r[5]
+    sparse = {seg for seg, n in live.items() if n * 2 < os.path.getsize(os.path.join(tdir, seg))}
+    if sparse:
+        packed = f"seg-{run}-c.tsv"
+        with open(os.path.join(tdir, packed), "wb") as out:
+            for i, r in enumerate(ranges):
+                if r[3] in sparse:
+                    with open(os.path.join(tdir, r[3]), "rb") as f:
+                        f.seek(r[4])
+                        data = f.read(r[5])
+                    ranges[i] = r[:3] + (packed, out.tell(), len(data))
+                    out.write(data)
+            out.flush()
+            os.fsync(out.fileno())
+        _write_index(new, (zeros, header, ranges))
+    os.replace(new, os.path.join(tdir, "index.tsv"))
+    used = {r[3] for r in ranges}
+    for name in os.listdir(tdir):
+        if name.startswith("seg-") and name not in used:
+            os.remove(os.path.join(tdir, name))
+
+# El manifiesto pasa a ser el del dump nuevo (solo se reescribieron los tramos
+# que cambiaron) y se vacía DELTA_TABLE
+def _delta_commit(ctl, tasks: List[str]):
+    run = f"{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+    for t in tasks:
+        _commit_index(os.path.join(DELTA_DIR, t), run)
+    with ctl.cursor() as cur:
+        cur.execute(f"DELETE FROM {_qualified(DELTA_TABLE)} WHERE task = ANY(%s)", (list(tasks),))
+    ctl.commit()
 
-    return ins_rt
+
+# --------------------------------------------------------------------
+# Resúmenes de analítica
+# --------------------------------------------------------------------
+# agg_refresh (script.sql) rehace cada resumen en una transacción, así la API
+# sigue leyendo la versión anterior mientras tanto. En modo completo cada resumen
+# va en su hilo con su conexión; el incremental es una sola llamada porque
+# consume agg_dirty para los dos.
+def _refresh_aggregates(conn, tasks: List[str], how: str, phases: Dict[str, float]):
+    if how == "off":
+        return
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regproc(%s)", (f"{SCHEMA}.agg_refresh",))
+        if cur.fetchone()[0] is None:
+            print(f"  {SCHEMA}.agg_refresh no existe (sección ANALÍTICA de script.sql), se omite")
+            return
+    conn.commit()
+    if how == "auto":
+        how = "incremental" if set(tasks) <= {"ratings"} else "full"
+
+    def run(which: Optional[str]):
+        c = psycopg2.connect(**DB_CONFIG)
+        c.autocommit = True
+        try:
+            with c.cursor() as cur:
+                t0 = time.perf_counter()
+                cur.execute(f"SELECT {SCHEMA}.agg_refresh(%s, %s)", (which is None, which))
+                print(f"  {which or 'incremental'}: {cur.fetchone()[0]} filas en {time.perf_counter() - t0:.1f}s")
+        finally:
+            c.close()
+
+    with _phase(f"agregados_{how}", phases):
+        if how == "incremental":
+            run(None)
+        else:
+            # lo marcado hasta aquí queda cubierto por la reconstrucción
+            with conn.cursor() as cur:
+                cur.execute(f"DELETE FROM {SCHEMA}.agg_dirty")
+            conn.commit()
+            with ThreadPoolExecutor(max_workers=len(AGG_SUMMARIES)) as ex:
+                list(ex.map(run, AGG_SUMMARIES))
 
 
 # --------------------------------------------------------------------
@@ -679,67 +1498,306 @@ def health_check() -> str:
     except Exception as e:
         return f"No Conectada: {e}"
 
-def carga_masiva() -> str:
+# Tareas de carga: nombre -> (archivo, loader, tareas de las que depende).
+# Las dependencias son las FKs: nada que apunte a title_basics/name_basics
+# arranca antes de que esas tablas estén completas.
+TASKS = {
+    "title_basics":   ("title.basics.tsv",     _load_title_basics_and_genres,     ()),
+    "name_basics":    ("name.basics.tsv",      _load_name_basics_and_professions, ()),
+    "name_known_for": ("name.basics.tsv",      _load_name_known_for,              ("title_basics", "name_basics")),
+    "akas":           ("title.akas.tsv",       _load_title_akas_and_parts,        ("title_basics",)),
+    "crew":           ("title.crew.tsv",       _load_title_crew,                  ("title_basics", "name_basics")),
+    "episodes":       ("title.episode.tsv",    _load_title_episode,               ("title_basics",)),
+    "principals":     ("title.principals.tsv", _load_title_principals,            ("title_basics", "name_basics")),
+    "ratings":        ("title.ratings.tsv",    _load_title_ratings,               ("title_basics",)),
+}
+
+# Ejecuta un trozo de una tarea con su propia conexión (corre dentro del pool de procesos)
+def _run_chunk(task: str, mode: str, prefilter: bool, delta: bool, start: int, end: Optional[int],
+               offset: int, lines: int) -> Tuple[str, Counts]:
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = False
+    try:
+        keys = _delta_keys(conn, task) if delta else None
+        chunk = _Chunk(task, mode, start, end, offset, lines, prefilter, keys)
+        with conn.cursor() as cur:
+            cur.execute(f"SET search_path TO {SCHEMA}, public;")
+            counts = TASKS[task][1](cur, conn, chunk)
+            _save_checkpoint(cur, chunk, done=True)
+        conn.commit()
+        return task, counts
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+# Límites inferiores de las particiones por rango de `table` (LAYOUT=partitioned)
+def _partition_bounds(cur, table: str) -> List[int]:
+    cur.execute("""
+        SELECT pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits h JOIN pg_class c ON c.oid = h.inhrelid
+        WHERE h.inhparent = %s::regclass
+    """, (_qualified(table),))
+    found = (re.match(r"FOR VALUES FROM \((\d+)\)", b) for b, in cur.fetchall())
+    return sorted(int(m.group(1)) for m in found if m)
+
+# Offset de la primera línea cuyo id es >= cada límite, por búsqueda binaria
+# (los TSV de IMDb vienen ordenados por id). Si el archivo no estuviera ordenado
+# los trozos salen desparejos pero la carga no cambia: se inserta por la tabla padre.
+def _partition_cuts(path: str, bounds: List[int]) -> Tuple[int, ...]:
+    ids = _ID_FORMS["tt"]
+    with open(path, "rb") as f:
+        f.readline()
+        first, size = f.tell(), os.fstat(f.fileno()).st_size
+
+        def line_at(pos: int) -> Tuple[int, Optional[int]]:
+            f.seek(pos - 1)
+            f.readline()
+            start = f.tell()
+            return start, ids._num(f.readline().split(b"\t", 1)[0].decode("utf-8", "replace"))
+
+        cuts = []
+        for b in bounds:
+            lo, hi = first, size
+            while lo < hi:
+                mid = (lo + hi) // 2
+                start, n = line_at(mid)
+                if start >= size or (n is not None and n >= b):
+                    hi = mid
+                else:
+                    lo = mid + 1
+            cut = line_at(lo)[0]
+            if first < cut < size:
+                cuts.append(cut)
+    return tuple(cuts)
+
+# Devuelve los trozos pendientes de una tarea como (start, end, offset, líneas leídas).
+# Con resume reutiliza el reparto guardado si la huella del archivo coincide;
+# si no, borra lo guardado y registra un reparto nuevo desde el byte 0.
+def _plan_chunks(ctl, task: str, chunk_bytes: int, resume: bool) -> List[Tuple[int, Optional[int], int, int]]:
+    fname = TASKS[task][0]
+    fp = _fingerprint(os.path.join(BASE_DIR, fname))
+    table = _qualified(CHECKPOINT_TABLE)
+    with ctl.cursor() as cur:
+        if resume:
+            cur.execute(f"""
+                SELECT chunk_start, chunk_end, byte_offset, lines_read, done, fingerprint
+                FROM {table} WHERE task = %s ORDER BY chunk_start
+            """, (task,))
+            saved = cur.fetchall()
+            if saved and all(r[5] == fp for r in saved):
+                pending = [(s, e, off, n) for s, e, off, n, done, _ in saved if not done]
+                print(f"  {task}: reanudando {len(pending)} de {len(saved)} trozo(s) "
+                      f"({sum(r[3] for r in saved)} líneas ya leídas y confirmadas)")
+                return pending
+            if saved:
+                print(f"  {task}: {fname} cambió desde el último checkpoint, se carga desde cero")
+
+        cur.execute(f"DELETE FROM {table} WHERE task = %s", (task,))
+        # Con tablas particionadas cada trozo cae en una sola partición: los
+        # workers no se pisan en las mismas páginas ni en los mismos índices.
+        cuts = ()
+        if _int_ids(task):
+            cuts = _partition_cuts(os.path.join(BASE_DIR, fname), _partition_bounds(cur, task))
+        chunks = _chunks(os.path.join(BASE_DIR, fname), chunk_bytes, cuts)
+        execute_values(cur, f"""
+            INSERT INTO {table} (task, chunk_start, chunk_end, file, fingerprint, byte_offset)
+            VALUES %s
+        """, [(task, s, e, fname, fp, s) for s, e in chunks])
+    ctl.commit()
+    return [(s, e, s, 0) for s, e in chunks]
+
+# Planificador: lanza cada tarea cuando sus dependencias terminaron, partiendo los
+# archivos grandes en trozos que se cargan en paralelo. Dependencias fuera de la
+# selección se asumen ya cargadas.
+def _schedule(tasks: List[str], mode: str, workers: int, chunk_bytes: int,
+              resume: bool = False, prefilter: bool = True, delta: bool = False) -> Counts:
+    waiting = {t: {d for d in TASKS[t][2] if d in tasks} for t in tasks}
+    totals: Counts = {}
+    left: Dict[str, int] = {}
+    _KEYSETS.clear()  # en modo secuencial el cache vive en este proceso
+    _DELTA_KEYS.clear()
+
+    def finish(task: str):
+        print(f"OK {task}")
+        for deps in waiting.values():
+            deps.discard(task)
+
+    ctl = psycopg2.connect(**DB_CONFIG)
+    try:
+        with ctl.cursor() as cur:
+            _ensure_checkpoint_table(cur)
+        ctl.commit()
+
+        def ready() -> List[tuple]:
+            jobs = []
+            while True:
+                now = [t for t, deps in waiting.items() if not deps]
+                if not now:
+                    return jobs
+                for t in now:
+                    del waiting[t]
+                    chunks = _plan_chunks(ctl, t, chunk_bytes, resume)
+                    left[t] = len(chunks)
+                    if not chunks:
+                        finish(t)  # ya estaba completa según el checkpoint
+                        continue
+                    print(f"Cargando {t} ({len(chunks)} trozo(s))...")
+                    jobs.extend((t, mode, prefilter, delta) + c for c in chunks)
+
+        def done(task: str, counts: Counts):
+            for table, c in counts.items():
+                prev = totals.get(table, (0, 0, 0))
+                totals[table] = tuple(a + b for a, b in zip(prev, c))
+            left[task] -= 1
+            if left[task] == 0:
+                finish(task)
+
+        if workers <= 1:
+            jobs = ready()
+            while jobs:
+                for job in jobs:
+                    done(*_run_chunk(*job))
+                jobs = ready()
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as ex:
+                running = {ex.submit(_run_chunk, *job): job[0] for job in ready()}
+                try:
+                    while running:
+                        finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                        for fut in finished:
+                            running.pop(fut)
+                            done(*fut.result())
+                        for job in ready():
+                            running[ex.submit(_run_chunk, *job)] = job[0]
+                except Exception:
+                    ex.shutdown(wait=True, cancel_futures=True)
+                    raise
+    finally:
+        ctl.close()
+
+    if waiting:
+        raise RuntimeError(f"Dependencias sin resolver: {sorted(waiting)}")
+    return totals
+
+def carga_masiva(mode: str = LOAD_MODE, workers: int = WORKERS,
+                 tasks: Optional[List[str]] = None, resume: bool = False,
+                 defer_indexes: bool = DEFER_INDEXES, prefilter: bool = PREFILTER,
+                 stats: Optional[dict] = None, aggregates: str = AGGREGATES,
+                 delta: bool = DELTA) -> str:
+    # `stats` (opcional) se llena con los conteos por tabla y los tiempos por fase
+    tasks = list(tasks or TASKS)
+    phases: Dict[str, float] = {}
     conn = None
+    deferred = False   # hay definiciones en DDL_TABLE sin restaurar
     try:
         print(f"BASE_DIR: {BASE_DIR}")
         print(f"SCHEMA: {SCHEMA}")
+        print(f"MODO: {mode}, WORKERS: {workers}, TAREAS: {', '.join(tasks)}"
+              + (" (reanudando)" if resume else "")
+              + (" (índices/FKs diferidos)" if defer_indexes else "")
+              + (" (prefiltro de FKs en cliente)" if prefilter else "")
+              + (" (delta contra el manifiesto)" if delta else "")
+              + (" (akas/principals particionadas, ids enteros)" if LAYOUT == "partitioned" else ""))
+        t0 = time.perf_counter()
+        # Lo que dejó sin restaurar una corrida anterior: si no, esta cargaría en
+        # tablas sin índices ni FKs. Con --defer-indexes se restaura al final.
         conn = psycopg2.connect(**DB_CONFIG)
-        conn.autocommit = False
-        with conn.cursor() as cur:
-            cur.execute(f"SET search_path TO {SCHEMA}, public;")
-
-            print("Cargando title_basics y basics_genres...") # los comentamos porque se supone que estos ya estan hechos completamnete
-            #ins_tb, ins_bg = _load_title_basics_and_genres(cur, conn)
-            #print(f"OK title_basics={ins_tb}, basics_genres={ins_bg}")
-
-            print("Cargando name_basics, name_professions y name_known_for...")
-            #ins_nb, ins_np, ins_nk = _load_name_basics_professions_known(cur, conn)
-            #print(f"OK name_basics={ins_nb}, name_professions={ins_np}, name_known_for={ins_nk}")
-
-            print("Cargando akas, aka_types y aka_attributes...")
-            #ins_aka, ins_typ, ins_att = _load_title_akas_and_parts(cur, conn)
-            #print(f"OK akas={ins_aka}, aka_types={ins_typ}, aka_attributes={ins_att}")
-
-            print("Cargando crew_directors y crew_writers...")
-            #ins_dir, ins_wri = _load_title_crew(cur, conn)
-            #print(f"OK crew_directors={ins_dir}, crew_writers={ins_wri}")
-
-            print("Cargando episodes...")
-            ins_ep = _load_title_episode(cur, conn)
-            print(f"OK episodes={ins_ep}")
-
-            print("Cargando principals...")
-            ins_pr = _load_title_principals(cur, conn)
-            print(f"OK principals={ins_pr}")
-
-            print("Cargando ratings...")
-            ins_rt = _load_title_ratings(cur, conn)
-            print(f"OK ratings={ins_rt}")
-
-        conn.commit()
-        print("Commit final realizado.")
-
-        resumen = (
-            #f"title_basics: {ins_tb}, basics_genres: {ins_bg}, "
-            #f"name_basics: {ins_nb}, name_professions: {ins_np}, name_known_for: {ins_nk}, "
-            #f"akas: {ins_aka}, aka_types: {ins_typ}, aka_attributes: {ins_att}, "
-            #f"crew_directors: {ins_dir}, crew_writers: {ins_wri}, "
-            f"episodes: {ins_ep}, principals: {ins_pr}, ratings: {ins_rt}"
-        )
-        print("Resumen inserts (ON CONFLICT DO NOTHING + filtros EXISTS):")
-        print(resumen)
+        if _pending_ddl(conn) and not defer_indexes:
+            with _phase("restaurar_pendientes", phases):
+                _restore_ddl(conn, workers, {})
+        load, changed = tasks, tasks
+        if delta:
+            # antes de diferir índices: los borrados por llave los necesitan
+            with _phase("delta_hashes", phases):
+                prepared = _delta_prepare(conn, tasks, workers, CHUNK_BYTES)
+            with _phase("delta_borrados", phases):
+                _delta_deletes(conn, prepared)
+            load = [t for t in tasks if prepared[t][0]]
+            changed = [t for t in tasks if prepared[t][0] or prepared[t][1]]
+
+        # un delta toca pocas filas: reconstruir los GIN de búsqueda costaría más
+        search_tables: Tuple[str, ...] = ()
+        if DEFER_SEARCH and not defer_indexes and not delta and set(load) & set(SEARCH_TABLES):
+            search_tables = _search_tables_to_defer(conn, load)
+        defer_search = bool(search_tables)
+        if defer_indexes or defer_search:
+            with _phase("drop_indices_fks" if defer_indexes else "drop_indices_busqueda", phases):
+                _drop_ddl(conn, search_only=defer_search, tables=search_tables)
+                deferred = True
+
+        with _phase("carga", phases):
+            totals = _schedule(load, mode, workers, CHUNK_BYTES, resume, prefilter, delta)
+        load_secs = max(phases["carga"], 1e-9)
+
+        if defer_indexes or defer_search:
+            _restore_ddl(conn, workers, phases)
+            deferred = False
+
+        if delta:
+            with _phase("delta_manifiesto", phases):
+                _delta_commit(conn, tasks)
+
+        if aggregates != "off":
+            conn = conn or psycopg2.connect(**DB_CONFIG)
+            _refresh_aggregates(conn, changed, aggregates, phases)
+
+        print(f"Resumen inserts (upsert / ON CONFLICT DO NOTHING + filtro de FKs) en {load_secs:.1f}s:")
+        for table, (ins, orphans, skipped) in totals.items():
+            print(f"  {table}: {ins} insertadas/actualizadas ({ins / load_secs:,.0f} filas/s), "
+                  f"{orphans} huérfanas descartadas, {skipped} sin cambios/filtradas en BD")
+        print(f"Tiempos por fase (total {time.perf_counter() - t0:.1f}s):")
+        for name, secs in phases.items():
+            print(f"  {name}: {secs:.1f}s")
+        if stats is not None:
+            stats.update(tables=totals, phases=phases, load_secs=load_secs,
+                         total_secs=time.perf_counter() - t0)
         return "datos cargados correctamente"
     except Exception as e:
-        if conn:
-            conn.rollback()
         print(f"Error al procesar los datos de entrada: {e}")
         return "Error al procesar los datos de entrada"
     finally:
         if conn:
             conn.close()
+        if deferred:
+            # la corrida falló con índices/FKs borrados: se intenta dejarlos como estaban
+            print("Restaurando índices/FKs diferidos...")
+            try:
+                conn = psycopg2.connect(**DB_CONFIG)
+                try:
+                    _restore_ddl(conn, workers, {})
+                finally:
+                    conn.close()
+            except Exception as e:
+                print(f"No se pudieron restaurar ({e}): quedan en {SCHEMA}.{DDL_TABLE} "
+                      "y se restauran al empezar la próxima corrida")
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Carga masiva de los TSV de IMDb")
+    parser.add_argument("--mode", choices=("values", "copy"), default=LOAD_MODE,
+                        help="values = execute_values (original), copy = COPY FROM STDIN")
+    parser.add_argument("--workers", type=int, default=WORKERS,
+                        help="procesos en paralelo (1 = secuencial en este proceso)")
+    parser.add_argument("--only", default="",
+                        help=f"tareas separadas por coma ({', '.join(TASKS)})")
+    parser.add_argument("--resume", action="store_true",
+                        help=f"retoma desde los checkpoints de {SCHEMA}.{CHECKPOINT_TABLE}")
+    parser.add_argument("--defer-indexes", action="store_true", default=DEFER_INDEXES,
+                        help="borra índices secundarios y FKs durante la carga y los recrea al final")
+    parser.add_argument("--no-prefilter", dest="prefilter", action="store_false", default=PREFILTER,
+                        help="filtra huérfanas con EXISTS en el servidor en vez de llaves en memoria")
+    parser.add_argument("--delta", action="store_true", default=DELTA,
+                        help=f"aplica solo lo que cambió desde la última corrida (manifiesto en {DELTA_DIR})")
+    parser.add_argument("--aggregates", choices=("auto", "full", "incremental", "off"), default=AGGREGATES,
+                        help="refresco de los resúmenes agg_* al terminar (auto = incremental si solo ratings)")
+    args = parser.parse_args()
+
+    only = [t.strip() for t in args.only.split(",") if t.strip()] or None
+    if only and set(only) - set(TASKS):
+        parser.error(f"tareas desconocidas: {sorted(set(only) - set(TASKS))}")
+
     print(health_check())
-    print(carga_masiva())
+    print(carga_masiva(args.mode, args.workers, only, args.resume, args.defer_indexes,
+                       args.prefilter, aggregates=args.aggregates, delta=args.delta))
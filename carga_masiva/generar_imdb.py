@@ -0,0 +1,336 @@
+import os
+import math
+import random
+import time
+import shutil
+import argparse
+from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+
+# --------------------------------------------------------------------
+# Generador de un subconjunto sintético de IMDb (los 7 TSV que lee carga_masiva)
+# --------------------------------------------------------------------
+# Mismos encabezados, \N para nulos y listas separadas por coma. Las llaves son
+# consistentes entre archivos (tt1..ttN, nm1..nmM) salvo una fracción `orphans`
+# que apunta a títulos/personas que no existen, como en los dumps reales.
+#
+# Escala de 10k a 100M filas: cada archivo se parte en rangos de ids que generan
+# varios procesos en archivos .part (escritura en streaming, memoria constante)
+# y al final se concatenan en orden. El resultado depende solo de --seed y de
+# los tamaños, no de la cantidad de procesos.
+# Los archivos quedan ordenados por su llave, como los de IMDb (carga_masiva
+# parte por rangos de bytes y de ids): las líneas propias huérfanas (tt > N)
+# van en un .part aparte y se escriben después de todas las válidas.
+NULL = "\\N"
+
+HEADERS = {
+    "title.basics.tsv": "tconst\ttitleType\tprimaryTitle\toriginalTitle\tisAdult\tstartYear\tendYear\truntimeMinutes\tgenres",
+    "name.basics.tsv": "nconst\tprimaryName\tbirthYear\tdeathYear\tprimaryProfession\tknownForTitles",
+    "title.akas.tsv": "titleId\tordering\ttitle\tregion\tlanguage\ttypes\tattributes\tisOriginalTitle",
+    "title.crew.tsv": "tconst\tdirectors\twriters",
+    "title.episode.tsv": "tconst\tparentTconst\tseasonNumber\tepisodeNumber",
+    "title.principals.tsv": "tconst\tordering\tnconst\tcategory\tjob\tcharacters",
+    "title.ratings.tsv": "tconst\taverageRating\tnumVotes",
+}
+
+# Distribuciones aproximadas a las de los dumps públicos (pesos relativos)
+TITLE_TYPES = {"tvEpisode": 76, "short": 9, "movie": 6.7, "video": 2.7, "tvMovie": 1.5,
+               "tvMiniSeries": 0.6, "tvSpecial": 0.5, "videoGame": 0.4, "tvShort": 0.1}
+SERIES_EVERY = 40   # 1 de cada 40 títulos es tvSeries (~2.5%): padres de los episodios
+GENRES = {"Drama": 19, "Comedy": 14, "Short": 9, "Documentary": 9, "Talk-Show": 7, "Family": 5,
+          "Romance": 5, "News": 5, "Reality-TV": 5, "Animation": 4, "Action": 3, "Crime": 3,
+          "Adventure": 3, "Music": 3, "Game-Show": 2, "Fantasy": 1.5, "Thriller": 1.5,
+          "Mystery": 1.5, "Sci-Fi": 1, "History": 1, "Horror": 1, "Sport": 1, "Biography": 1,
+          "Adult": 1, "Musical": 0.5, "War": 0.5, "Western": 0.3, "Film-Noir": 0.05}
+GENRES_PER_TITLE = {0: 8, 1: 52, 2: 22, 3: 18}
+PROFESSIONS = {"actor": 30, "actress": 19, "miscellaneous": 9, "producer": 8, "writer": 7,
+               "camera_department": 5, "director": 5, "editor": 2.5, "cinematographer": 2.5,
+               "composer": 2, "sound_department": 2, "art_department": 2, "music_department": 2,
+               "make_up_department": 1.5, "visual_effects": 1}
+PROFESSIONS_PER_NAME = {0: 15, 1: 55, 2: 20, 3: 10}
+CATEGORIES = {"actor": 25, "actress": 17, "self": 14, "writer": 10, "director": 8, "producer": 8,
+              "cinematographer": 3, "composer": 3, "editor": 3, "production_designer": 1,
+              "casting_director": 1, "archive_footage": 1, "archive_sound": 0.2}
+JOBS = {"writer": ["written by", "screenplay", "story", "creator"],
+        "producer": ["producer", "executive producer", "co-producer"],
+        "director": [NULL], "composer": [NULL], "editor": [NULL]}
+PRINCIPALS_PER_TITLE = {1: 8, 2: 9, 3: 9, 4: 10, 5: 10, 6: 10, 7: 10, 8: 9, 9: 9, 10: 16}
+AKAS_PER_TITLE = {1: 40, 2: 20, 3: 12, 4: 8, 5: 6, 6: 5, 7: 4, 8: 5}
+DIRECTORS_PER_TITLE = {0: 30, 1: 60, 2: 10}
+WRITERS_PER_TITLE = {0: 45, 1: 35, 2: 15, 3: 5}
+REGIONS = {"US": 20, "\\N": 15, "GB": 8, "FR": 7, "DE": 7, "ES": 6, "IT": 5, "JP": 5, "IN": 5,
+           "MX": 4, "BR": 4, "CA": 3, "RU": 3, "AR": 2, "XWW": 2}
+AKA_TYPES = {"\\N": 55, "imdbDisplay": 30, "original": 8, "alternative": 4, "working": 3}
+RATED_FRACTION = 0.14   # ~1.4M calificaciones para ~10M títulos
+NAMES_PER_TITLE = 1.3
+
+
+def _mean(weights: Dict[int, float]) -> float:
+    return sum(k * w for k, w in weights.items()) / sum(weights.values())
+
+# Filas esperadas (en los 7 archivos) por cada título; sirve para --rows
+ROWS_PER_TITLE = (1 + _mean(AKAS_PER_TITLE) + 1 + _mean(PRINCIPALS_PER_TITLE) + RATED_FRACTION
+                  + TITLE_TYPES["tvEpisode"] / sum(TITLE_TYPES.values()) + NAMES_PER_TITLE)
+
+CHUNK_IDS = 200_000   # títulos (o personas) por unidad de trabajo
+
+
+class _Picker:
+    """random.choices con los acumulados precalculados (lo más caro es la tabla)."""
+    def __init__(self, weights: Dict):
+        self.values = list(weights)
+        self.cum = []
+        total = 0.0
+        for w in weights.values():
+            total += w
+            self.cum.append(total)
+
+    def one(self, rnd: random.Random):
+        return rnd.choices(self.values, cum_weights=self.cum)[0]
+
+    def many(self, rnd: random.Random, k: int):
+        return rnd.choices(self.values, cum_weights=self.cum, k=k)
+
+
+def _tt(i: int) -> str:
+    return f"tt{i:07d}"
+
+def _nm(i: int) -> str:
+    return f"nm{i:07d}"
+
+def _unit(i: int, seed: int) -> float:
+    """Uniforme determinística en [0, 1) para el id i (mezcla de enteros, sin estado)."""
+    x = (i * 0x9E3779B1 + seed * 0x85EBCA77) & 0xFFFFFFFF
+    x ^= x >> 16
+    x = (x * 0x7FEB352D) & 0xFFFFFFFF
+    x ^= x >> 15
+    x = (x * 0x846CA68B) & 0xFFFFFFFF
+    x ^= x >> 16
+    return x / 4294967296.0
+
+_TYPES = _Picker(TITLE_TYPES)
+
+def title_type(i: int, seed: int) -> str:
+    """Tipo del título i: igual en todos los archivos y procesos."""
+    if i % SERIES_EVERY == 0:
+        return "tvSeries"
+    u = _unit(i, seed) * _TYPES.cum[-1]
+    for value, c in zip(_TYPES.values, _TYPES.cum):
+        if u < c:
+            return value
+    return _TYPES.values[-1]
+
+
+# --------------------------------------------------------------------
+# Generadores por archivo: cada uno produce las líneas de un rango de ids
+# --------------------------------------------------------------------
+class _Gen:
+    def __init__(self, titles: int, names: int, seed: int, orphans: float, rnd: random.Random):
+        self.titles, self.names, self.seed, self.orphans, self.rnd = titles, names, seed, orphans, rnd
+        self.genres, self.genre_n = _Picker(GENRES), _Picker(GENRES_PER_TITLE)
+        self.profs, self.prof_n = _Picker(PROFESSIONS), _Picker(PROFESSIONS_PER_NAME)
+        self.cats, self.princ_n = _Picker(CATEGORIES), _Picker(PRINCIPALS_PER_TITLE)
+        self.aka_n, self.regions, self.aka_types = _Picker(AKAS_PER_TITLE), _Picker(REGIONS), _Picker(AKA_TYPES)
+        self.dir_n, self.wri_n = _Picker(DIRECTORS_PER_TITLE), _Picker(WRITERS_PER_TITLE)
+
+    # referencias: a veces huérfanas (ids fuera de rango)
+    def tt_ref(self) -> str:
+        r = self.rnd
+        return _tt(self.titles + r.randint(1, 1000) if r.random() < self.orphans else r.randint(1, self.titles))
+
+    def tt_own(self, i: int) -> str:
+        return _tt(self.titles + i) if self.rnd.random() < self.orphans else _tt(i)
+
+    def nm_ref(self) -> str:
+        r = self.rnd
+        return _nm(self.names + r.randint(1, 1000) if r.random() < self.orphans else r.randint(1, self.names))
+
+    def title_basics(self, lo: int, hi: int):
+        r = self.rnd
+        for i in range(lo, hi):
+            ttype = title_type(i, self.seed)
+            sy = r.randint(1900, 2025)
+            series = ttype in ("tvSeries", "tvMiniSeries")
+            n = self.genre_n.one(r)
+            genres = ",".join(sorted(set(self.genres.many(r, n)))) if n else NULL
+            runtime = r.randint(20, 60) if ttype == "tvEpisode" else r.randint(5, 180)
+            yield "\t".join((_tt(i), ttype, f"Title {i}", f"Title {i}" if r.random() < 0.9 else f"Original {i}",
+                             "1" if r.random() < 0.02 else "0",
+                             NULL if r.random() < 0.07 else str(sy),
+                             str(min(2025, sy + r.randint(0, 12))) if series and r.random() < 0.5 else NULL,
+                             NULL if r.random() < 0.6 else str(runtime), genres))
+
+    def name_basics(self, lo: int, hi: int):
+        r = self.rnd
+        for i in range(lo, hi):
+            by = r.randint(1880, 2005)
+            n = self.prof_n.one(r)
+            profs = ",".join(dict.fromkeys(self.profs.many(r, n))) if n else NULL
+            known = ",".join(self.tt_ref() for _ in range(r.choice((0, 1, 2, 3, 4, 4, 4)))) or NULL
+            yield "\t".join((_nm(i), f"Person {i}", NULL if r.random() < 0.8 else str(by),
+                             str(min(2025, by + r.randint(20, 95))) if r.random() < 0.05 else NULL, profs, known))
+
+    def title_akas(self, lo: int, hi: int):
+        r = self.rnd
+        for i in range(lo, hi):
+            tid = self.tt_own(i)
+            for o in range(1, self.aka_n.one(r) + 1):
+                yield "\t".join((tid, str(o), f"Title {i}" if o == 1 else f"Aka {i}-{o}",
+                                 self.regions.one(r), NULL, self.aka_types.one(r), NULL,
+                                 "1" if o == 1 else "0"))
+
+    def title_crew(self, lo: int, hi: int):
+        r = self.rnd
+        for i in range(lo, hi):
+            directors = ",".join(self.nm_ref() for _ in range(self.dir_n.one(r))) or NULL
+            writers = ",".join(self.nm_ref() for _ in range(self.wri_n.one(r))) or NULL
+            yield "\t".join((_tt(i), directors, writers))
+
+    def title_episode(self, lo: int, hi: int):
+        r = self.rnd
+        series = max(1, self.titles // SERIES_EVERY)
+        for i in range(lo, hi):
+            if title_type(i, self.seed) != "tvEpisode":
+                continue
+            if r.random() < self.orphans:
+                parent = _tt(self.titles + r.randint(1, 1000))
+            else:
+                parent = _tt(SERIES_EVERY * r.randint(1, series)) if self.titles >= SERIES_EVERY else _tt(1)
+            known = r.random() > 0.2
+            yield "\t".join((self.tt_own(i), parent, str(r.randint(1, 15)) if known else NULL,
+                             str(r.randint(1, 30)) if known else NULL))
+
+    def title_principals(self, lo: int, hi: int):
+        r = self.rnd
+        for i in range(lo, hi):
+            tid = self.tt_own(i)
+            for o in range(1, self.princ_n.one(r) + 1):
+                cat = self.cats.one(r)
+                job = r.choice(JOBS[cat]) if cat in JOBS else NULL
+                chars = f'["Character {o}"]' if cat in ("actor", "actress", "self") else NULL
+                yield "\t".join((tid, str(o), self.nm_ref(), cat, job, chars))
+
+    def title_ratings(self, lo: int, hi: int):
+        r = self.rnd
+        for i in range(lo, hi):
+            if r.random() < RATED_FRACTION:
+                rating = min(10.0, max(1.0, r.gauss(6.9, 1.3)))
+                votes = max(5, int(r.lognormvariate(4.0, 1.8)))
+                yield "\t".join((self.tt_own(i), f"{rating:.1f}", str(votes)))
+
+
+FILES = {   # archivo -> (método de _Gen, ids que recorre)
+    "title.basics.tsv": ("title_basics", "titles"),
+    "name.basics.tsv": ("name_basics", "names"),
+    "title.akas.tsv": ("title_akas", "titles"),
+    "title.crew.tsv": ("title_crew", "titles"),
+    "title.episode.tsv": ("title_episode", "titles"),
+    "title.principals.tsv": ("title_principals", "titles"),
+    "title.ratings.tsv": ("title_ratings", "titles"),
+}
+
+
+def _work(job: Tuple) -> Tuple[str, int, int]:
+    """Escribe los .part de un rango de ids (válidas y huérfanas propias) y
+    devuelve (archivo, lo, filas)."""
+    out_dir, name, lo, hi, titles, names, seed, orphans = job
+    rnd = random.Random(f"{seed}:{name}:{lo}")
+    gen = _Gen(titles, names, seed, orphans, rnd)
+    method = getattr(gen, FILES[name][0])
+    last = titles if FILES[name][1] == "titles" else names
+    n = 0
+    with open(_part(out_dir, name, lo), "w", encoding="utf-8", newline="\n") as f, \
+         open(_part(out_dir, name, lo, ORPHAN_PART), "w", encoding="utf-8", newline="\n") as fo:
+        bufs: Tuple[List[str], List[str]] = ([], [])
+        for line in method(lo, hi):
+            bufs[int(line[2:line.index("\t")]) > last].append(line)
+            if len(bufs[0]) + len(bufs[1]) >= 10_000:
+                for out, buf in zip((f, fo), bufs):
+                    if buf:
+                        out.write("\n".join(buf) + "\n")
+                        n += len(buf)
+                        buf.clear()
+        for out, buf in zip((f, fo), bufs):
+            if buf:
+                out.write("\n".join(buf) + "\n")
+                n += len(buf)
+    return name, lo, n
+
+ORPHAN_PART = "orphans"
+
+def _part(out_dir: str, name: str, lo: int, kind: str = "part") -> str:
+    return os.path.join(out_dir, f"{name}.{lo:012d}.{kind}")
+
+
+def sizes_for_rows(rows: int) -> Tuple[int, int]:
+    """Títulos y personas para obtener ~rows filas entre los 7 archivos."""
+    titles = max(1, math.ceil(rows / ROWS_PER_TITLE))
+    return titles, max(1, round(titles * NAMES_PER_TITLE))
+
+
+def generar(out_dir: str, titles: int = 10_000, names: int = 8_000, seed: int = 1,
+            orphans: float = 0.01, workers: int = 0, files=None) -> dict:
+    """Escribe los TSV en out_dir y devuelve las filas generadas por archivo."""
+    os.makedirs(out_dir, exist_ok=True)
+    files = list(files or FILES)
+    counts = {"titles": titles, "names": names}
+    jobs = [(out_dir, name, lo, min(lo + CHUNK_IDS, counts[FILES[name][1]] + 1),
+             titles, names, seed, orphans)
+            for name in files
+            for lo in range(1, counts[FILES[name][1]] + 1, CHUNK_IDS)]
+    # los rangos más caros (principals, akas) primero para repartir mejor
+    order = {n: k for k, n in enumerate(("title.principals.tsv", "title.akas.tsv", "name.basics.tsv"))}
+    jobs.sort(key=lambda j: order.get(j[1], len(order)))
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(jobs) == 1:
+        results = [_work(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as ex:
+            results = list(ex.map(_work, jobs))
+
+    rows = {name: 0 for name in files}
+    parts: Dict[str, List[int]] = {name: [] for name in files}
+    for name, lo, n in results:
+        rows[name] += n
+        parts[name].append(lo)
+    for name in files:
+        with open(os.path.join(out_dir, name), "wb") as out:
+            out.write((HEADERS[name] + "\n").encode("utf-8"))
+            for kind in ("part", ORPHAN_PART):
+                for lo in sorted(parts[name]):
+                    path = _part(out_dir, name, lo, kind)
+                    with open(path, "rb") as f:
+                        shutil.copyfileobj(f, out, 16 << 20)
+                    os.remove(path)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera TSV sintéticos con el formato de IMDb")
+    parser.add_argument("--out", default=os.getenv("IMDB_DATA_DIR", "data_sintetica"))
+    parser.add_argument("--rows", type=int, default=0,
+                        help="filas totales aproximadas (calcula --titles y --names)")
+    parser.add_argument("--titles", type=int, default=10_000)
+    parser.add_argument("--names", type=int, default=0, help=f"por defecto {NAMES_PER_TITLE} por título")
+    parser.add_argument("--orphans", type=float, default=0.01,
+                        help="fracción de llaves que apuntan a títulos/personas inexistentes")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=0, help="procesos (0 = núcleos disponibles)")
+    parser.add_argument("--only", default="", help="archivos separados por coma (por defecto los 7)")
+    args = parser.parse_args()
+
+    titles, names = sizes_for_rows(args.rows) if args.rows else (args.titles, args.names)
+    names = names or max(1, round(titles * NAMES_PER_TITLE))
+    only = [f.strip() for f in args.only.split(",") if f.strip()] or None
+    if only and set(only) - set(FILES):
+        parser.error(f"archivos desconocidos: {sorted(set(only) - set(FILES))}")
+
+    t0 = time.perf_counter()
+    rows = generar(args.out, titles, names, args.seed, args.orphans, args.workers, only)
+    secs = time.perf_counter() - t0
+    for name, n in rows.items():
+        print(f"{name}: {n} filas")
+    total = sum(rows.values())
+    print(f"Total: {total} filas ({titles} títulos, {names} personas) en {secs:.1f}s "
+          f"({total / max(secs, 1e-9):,.0f} filas/s)")
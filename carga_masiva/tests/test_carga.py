@@ -0,0 +1,145 @@
+# tests/test_carga.py
+# Conversión por columnas, cortes de chunks y _KeySet, sin base de datos.
+import os
+
+import carga_masiva as cm
+
+NULL = cm.NULL
+VALUES = ["abc", " abc ", "\tabc", "", " ", NULL, f" {NULL} ", "a\\b", " a\\b ",
+          "0", "1", " 1", "1 ", "01", "2", "-3", " 42 ", "4.5", "x", "１"]
+
+
+# Lo que guardaba la carga original fila por fila, por tipo de columna.
+def _baseline(kind: str, v: str):
+    if kind == "text":
+        return cm._none(v)
+    if kind == "text!":
+        return cm._none(v) or NULL
+    if kind == "int":
+        return cm._to_int(v)
+    if kind == "int0":
+        return cm._to_int(v) or 0
+    if kind == "bool01":
+        return cm._to_bool_01(v)
+    if kind == "float0":
+        return cm._to_float(v) or 0.0
+    raise AssertionError(kind)
+
+# Cómo se escribe en COPY text el valor que dio _baseline.
+def _as_copy(x) -> str:
+    if x is None:
+        return NULL
+    if isinstance(x, bool):
+        return "t" if x else "f"
+    return str(x).replace("\\", "\\\\")
+
+KINDS = ["text", "text!", "int", "int0", "bool01", "float0"]
+
+def test_typed_matches_baseline():
+    for kind in KINDS:
+        assert cm._typed(kind, VALUES) == [_baseline(kind, v) for v in VALUES], kind
+
+def test_copy_matches_baseline():
+    for kind in KINDS:
+        got = cm._copy(kind, VALUES)
+        if kind in ("int", "int0"):  # '01' va tal cual: Postgres lo lee como 1
+            got = [NULL if x == NULL else str(int(x)) for x in got]
+        assert got == [_as_copy(_baseline(kind, v)) for v in VALUES], kind
+
+
+def _write_tsv(path, n: int):
+    lines = ["tconst\tprimaryTitle"] + [f"tt{i:07d}\t{'x' * (i % 13)}" for i in range(n)]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return [line.split("\t") for line in lines[1:]]
+
+def test_iter_tsv_chunks_read_each_line_once(tmp_path):
+    path = tmp_path / "t.tsv"
+    expected = _write_tsv(path, 500)
+    size = path.stat().st_size
+    for chunk_bytes in (1, 7, 64, 333, size - 1, size, 0):
+        for block in (5, 64, 1 << 16):
+            rows, last = [], 0
+            for start, end in cm._chunks(str(path), chunk_bytes):
+                for pos, batch in cm._iter_tsv(str(path), start, end, block):
+                    rows.extend(batch)
+                    last = pos
+            assert rows == expected, (chunk_bytes, block)
+            assert last == size
+
+def test_iter_tsv_cuts_and_short_rows(tmp_path):
+    path = tmp_path / "t.tsv"
+    path.write_bytes(b"a\tb\tc\n1\t2\t3\r\n4\t5\n6\t7\t8")
+    cuts = (path.read_bytes().index(b"4"),)
+    chunks = cm._chunks(str(path), 0, cuts)
+    assert len(chunks) == 2
+    got = [[r for _, batch in cm._iter_tsv(str(path), s, e) for r in batch] for s, e in chunks]
+    assert got == [[["1", "2", "3"]], [["4", "5", NULL], ["6", "7", "8"]]]
+
+
+def test_keyset_canonical_and_other_ids():
+    ks = cm._KeySet("tt")
+    for key in ("tt0000001", "tt9999999", "tt10000000", "tt001", "tt00000001", "nm0000001", "tt12a4567"):
+        ks.add(key)
+    assert ks.size == 7
+    for key in ("tt0000001", "tt9999999", "tt10000000", "tt001", "tt00000001", "nm0000001", "tt12a4567"):
+        assert key in ks
+    for key in ("tt0000002", "tt1", "tt0000000", "tt99999999", "tt0001", "nm0000002", ""):
+        assert key not in ks
+    assert ks.other == {"tt001", "tt00000001", "nm0000001", "tt12a4567"}
+
+
+# Modo delta sin base: DELTA_TABLE se reemplaza por un cursor que guarda el COPY.
+class _Cur:
+    def __init__(self):
+        self.ops = {}
+
+    def execute(self, sql, params=None):
+        pass
+
+    def copy_expert(self, sql, buf):
+        for line in buf.getvalue().splitlines():
+            _, key, op = line.split("\t")
+            self.ops[key] = op
+
+def _ratings(path, rows):
+    path.write_text("tconst\taverageRating\tnumVotes\n"
+                    + "".join(f"tt{i:07d}\t{r}\t{v}\n" for i, r, v in rows), encoding="utf-8")
+
+def _delta(tmp_path, monkeypatch, rows, run):
+    monkeypatch.setattr(cm, "BASE_DIR", str(tmp_path))
+    monkeypatch.setattr(cm, "DELTA_DIR", str(tmp_path / "manifest"))
+    _ratings(tmp_path / "title.ratings.tsv", rows)
+    cur = _Cur()
+    u, d, had = cm._delta_task(cur, "ratings", None, 1, 4096, run)
+    cm._commit_index(str(tmp_path / "manifest" / "ratings"), run)
+    return cur.ops, (u, d, had)
+
+def test_anchors_do_not_depend_on_chunks(tmp_path):
+    path = tmp_path / "title.ratings.tsv"
+    _ratings(path, [(i, 5.0, i) for i in range(1, 3000)])
+    whole = cm._delta_anchors(str(path), 2, 0, None)
+    assert len(whole) == 29 and all(ident.endswith(b"00") for _, ident in whole)
+    for chunk_bytes in (7, 1000, 4096):
+        parts = [a for s, e in cm._chunks(str(path), chunk_bytes) for a in cm._delta_anchors(str(path), 2, s, e)]
+        assert parts == whole
+
+def test_delta_only_changed_keys(tmp_path, monkeypatch):
+    rows = [(i, 5.0, i) for i in range(1, 5000)]
+    ops, (u, d, had) = _delta(tmp_path, monkeypatch, rows, "r0")
+    assert (u, d, had) == (len(rows), 0, False) and not ops   # línea base: carga completa
+
+    ops, res = _delta(tmp_path, monkeypatch, rows, "r1")
+    assert res == (0, 0, True) and not ops
+
+    new = [r for r in rows if r[0] not in (10, 2500)]           # bajas (2500 es ancla)
+    new = [(i, 7.5, v) if i in (1, 1234, 4999) else (i, r, v) for i, r, v in new]
+    new += [(6000, 8.0, 1), (3000, 1.0, 1)]                    # altas, fuera de orden
+    ops, res = _delta(tmp_path, monkeypatch, new, "r2")
+    assert ops == {"tt0000001": "u", "tt0001234": "u", "tt0004999": "u", "tt0006000": "u",
+                   "tt0003000": "u", "tt0000010": "d", "tt0002500": "d"}
+    assert res == (5, 2, True)
+
+    ops, res = _delta(tmp_path, monkeypatch, new, "r3")
+    assert res == (0, 0, True)
+    segs = [n for n in os.listdir(tmp_path / "manifest" / "ratings") if n.startswith("seg-")]
+    assert segs and not os.path.exists(tmp_path / "manifest" / "ratings" / "index.new")
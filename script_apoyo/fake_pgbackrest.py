@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# fake_pgbackrest.py
+# Imita lo que usa app/backup_scheduler.py de pgBackRest para probar sin Docker:
+#   fake_pgbackrest.py --stanza=S --type=full|diff|incr [...] backup
+#   fake_pgbackrest.py [--stanza=S] --output=json info
+# Guarda los backups en un JSON (FAKE_PGBACKREST_STATE) con el mismo formato de
+# `info --output=json` (label, type, timestamp, info.size/delta, repository, archive).
+#
+#   PGBACKREST_CMD="python script_apoyo/fake_pgbackrest.py"
+#   FAKE_PGBACKREST_SECONDS=0.2   duración simulada de cada backup
+#   FAKE_PGBACKREST_FAIL=0.0      probabilidad de que un backup falle (exit 1)
+import os
+import sys
+import json
+import time
+import fcntl
+import random
+from datetime import datetime, timezone
+
+STATE = os.getenv("FAKE_PGBACKREST_STATE", "/tmp/fake_pgbackrest.json")
+SECONDS = float(os.getenv("FAKE_PGBACKREST_SECONDS", "0.2"))
+FAIL = float(os.getenv("FAKE_PGBACKREST_FAIL", "0"))
+DB_SIZE = 2 * 1024 ** 3
+SUFFIX = {"full": "F", "diff": "D", "incr": "I"}
+
+
+def _opts(argv):
+    opts, cmd = {}, None
+    for a in argv:
+        if a.startswith("--"):
+            k, _, v = a[2:].partition("=")
+            opts[k] = v
+        else:
+            cmd = a
+    return opts, cmd
+
+def _label(ts: int, type_: str, backups) -> str:
+    stamp = datetime.fromtimestamp(ts, timezone.utc).strftime("%Y%m%d-%H%M%S")
+    fulls = [b for b in backups if b["type"] == "full"]
+    if type_ == "full" or not fulls:
+        return stamp + "F"
+    return f"{fulls[-1]['label']}_{stamp}{SUFFIX[type_]}"
+
+def backup(state: dict, stanza: str, type_: str, start: int):
+    backups = state.setdefault(stanza, [])
+    if not any(b["type"] == "full" for b in backups):
+        type_ = "full"   # como pgBackRest: sin full previo, diff/incr pasan a full
+    stop = max(int(time.time()), backups[-1]["timestamp"]["stop"] + 1 if backups else 0)
+    delta = DB_SIZE if type_ == "full" else random.randint(1, 64) * 1024 ** 2
+    repo_prev = backups[-1]["info"]["repository"]["size"] if backups else 0
+    seg = len(backups) * 2 + 1
+    backups.append({
+        "label": _label(stop, type_, backups), "type": type_,
+        "timestamp": {"start": start, "stop": stop},
+        "info": {"size": DB_SIZE, "delta": delta,
+                 "repository": {"size": repo_prev + delta // 4, "delta": delta // 4}},
+        "archive": {"start": f"{1:08X}{0:08X}{seg:08X}", "stop": f"{1:08X}{0:08X}{seg + 1:08X}"},
+        "prior": backups[-1]["label"] if backups and type_ != "full" else None,
+    })
+    print(f"INFO: backup command end: completed successfully ({backups[-1]['label']})")
+
+def info(state: dict, stanza):
+    names = [stanza] if stanza else sorted(state)
+    print(json.dumps([{"name": n, "backup": state.get(n, []),
+                       "status": {"code": 0, "message": "ok"}} for n in names]))
+
+
+def main():
+    opts, cmd = _opts(sys.argv[1:])
+    start = int(time.time())
+    if cmd == "backup":
+        time.sleep(SECONDS)   # fuera del candado: las stanzas corren en paralelo
+        if random.random() < FAIL:
+            print("ERROR: [056]: backup simulado falló", file=sys.stderr)
+            sys.exit(1)
+    with open(STATE, "a+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)   # varias stanzas pueden correr a la vez
+        f.seek(0)
+        raw = f.read()
+        state = json.loads(raw) if raw.strip() else {}
+        if cmd == "backup":
+            backup(state, opts["stanza"], opts.get("type", "incr"), start)
+            f.seek(0)
+            f.truncate()
+            json.dump(state, f)
+        elif cmd == "info":
+            info(state, opts.get("stanza"))
+        else:
+            print(f"ERROR: comando no soportado: {cmd}", file=sys.stderr)
+            sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
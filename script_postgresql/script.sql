@@ -161,7 +161,177 @@ CREATE INDEX IF NOT EXISTS idx_cd_tconst        ON crew_directors(tconst);
 CREATE INDEX IF NOT EXISTS idx_cd_nconst        ON crew_directors(nconst);
 CREATE INDEX IF NOT EXISTS idx_cw_tconst        ON crew_writers(tconst);
 CREATE INDEX IF NOT EXISTS idx_cw_nconst        ON crew_writers(nconst);
-CREATE INDEX IF NOT EXISTS idx_ep_parent        ON episodes(parentTconst);
+-- (parentTconst, temporada, episodio, tconst): paginación por llave de /titles/{tconst}/episodes
+-- Reemplaza a idx_ep_parent(parentTconst): en bases ya creadas se borra el viejo
+DROP INDEX IF EXISTS idx_ep_parent;
+CREATE INDEX IF NOT EXISTS idx_ep_parent_seek   ON episodes(parentTconst, COALESCE(seasonNumber, 2147483647),
+                                                        COALESCE(episodeNumber, 2147483647), tconst);
 CREATE INDEX IF NOT EXISTS idx_pr_tconst        ON principals(tconst);
-CREATE INDEX IF NOT EXISTS idx_pr_nconst        ON principals(nconst);
+-- (nconst, tconst, ordering): paginación por llave de /names/{nconst}/filmography
+-- Reemplaza a idx_pr_nconst(nconst)
+DROP INDEX IF EXISTS idx_pr_nconst;
+CREATE INDEX IF NOT EXISTS idx_pr_nconst_seek   ON principals(nconst, tconst, ordering);
 CREATE INDEX IF NOT EXISTS idx_nf_tconst        ON name_known_for(tconst);
+
+-- ====================================================================
+-- BÚSQUEDA (GET /search)
+-- ====================================================================
+-- El tsvector se guarda en una columna generada (STORED): la búsqueda lo lee
+-- del índice y la puntuación de los candidatos lo lee de la fila, sin volver a
+-- llamar a to_tsvector. Cuesta un to_tsvector por fila en el COPY y agregar la
+-- columna reescribe la tabla una vez. Los trigramas van en GiST (gist_trgm_ops):
+-- a diferencia de GIN, devuelve las filas ya ordenadas por distancia (<->), así
+-- el LIMIT de cada fuente corta sin puntuar todas las coincidencias.
+-- carga_masiva borra los idx_search_* antes de llenar una tabla vacía y los
+-- reconstruye en paralelo al final (IMDB_DEFER_SEARCH=1, por defecto).
+-- 'simple': títulos en muchos idiomas, sin stemming.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE title_basics ADD COLUMN IF NOT EXISTS primaryTitle_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple', primaryTitle)) STORED;
+ALTER TABLE akas         ADD COLUMN IF NOT EXISTS title_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple', title)) STORED;
+ALTER TABLE name_basics  ADD COLUMN IF NOT EXISTS primaryName_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple', primaryName)) STORED;
+
+-- Reemplazan a los índices de expresión anteriores (GIN sobre to_tsvector(...) y
+-- GIN gin_trgm_ops sobre lower(...))
+DROP INDEX IF EXISTS idx_search_tb_tsv, idx_search_tb_trgm, idx_search_aka_tsv,
+                     idx_search_aka_trgm, idx_search_nb_tsv, idx_search_nb_trgm;
+CREATE INDEX IF NOT EXISTS idx_search_tb_doc   ON title_basics USING gin (primaryTitle_tsv);
+CREATE INDEX IF NOT EXISTS idx_search_tb_knn   ON title_basics USING gist (lower(primaryTitle) gist_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_search_aka_doc  ON akas         USING gin (title_tsv);
+CREATE INDEX IF NOT EXISTS idx_search_aka_knn  ON akas         USING gist (lower(title) gist_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_search_nb_doc   ON name_basics  USING gin (primaryName_tsv);
+CREATE INDEX IF NOT EXISTS idx_search_nb_knn   ON name_basics  USING gist (lower(primaryName) gist_trgm_ops);
+
+-- ====================================================================
+-- ANALÍTICA (GET /analytics/genres, GET /analytics/top)
+-- ====================================================================
+-- Resúmenes de ratings × basics_genres × title_basics por (género, año).
+-- agg_genre_year guarda sumas (no promedios) para que la API pueda juntar años
+-- y calcular promedio simple y ponderado por votos sin perder precisión. Son tablas (no MATERIALIZED VIEW) para poder recalcular solo los grupos que
+-- cambiaron; startYear = 0 agrupa los títulos sin año. carga_masiva llama a
+-- agg_refresh al terminar: completo tras una carga general, incremental cuando
+-- solo se cargó ratings.
+CREATE TABLE IF NOT EXISTS agg_genre_year (
+    genre           varchar(64)  NOT NULL,
+    startYear       smallint     NOT NULL,
+    titles          integer      NOT NULL,
+    rated           integer      NOT NULL,   -- títulos con rating
+    votes           bigint       NOT NULL,
+    ratingSum       numeric      NOT NULL,   -- suma de averageRating
+    weightedSum     numeric      NOT NULL,   -- suma de averageRating * numVotes
+    PRIMARY KEY (genre, startYear)
+);
+
+-- Los AGG_TOP_N mejor puntuados de cada (género, año) con al menos AGG_MIN_VOTES votos
+CREATE TABLE IF NOT EXISTS agg_top_rated (
+    genre         varchar(64)   NOT NULL,
+    startYear     smallint      NOT NULL,
+    pos           smallint      NOT NULL,
+    tconst        varchar(20)   NOT NULL,
+    primaryTitle  varchar(1024) NOT NULL,
+    averageRating numeric(3,1)  NOT NULL,
+    numVotes      integer       NOT NULL,
+    PRIMARY KEY (genre, startYear, pos)
+);
+
+-- tconst con ratings insertados/actualizados/borrados desde el último refresh
+CREATE TABLE IF NOT EXISTS agg_dirty (
+    tconst varchar(20) PRIMARY KEY
+);
+
+-- Un INSERT por sentencia (tablas de transición), no por fila: un lote de
+-- 50.000 ratings agrega una sola sentencia.
+CREATE OR REPLACE FUNCTION agg_mark_dirty() RETURNS trigger
+LANGUAGE plpgsql SET search_path FROM CURRENT AS $$
+BEGIN
+    INSERT INTO agg_dirty (tconst)
+    SELECT DISTINCT tconst FROM changed
+    ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END $$;
+
+CREATE OR REPLACE TRIGGER trg_ratings_agg_ins AFTER INSERT ON ratings
+    REFERENCING NEW TABLE AS changed FOR EACH STATEMENT EXECUTE FUNCTION agg_mark_dirty();
+CREATE OR REPLACE TRIGGER trg_ratings_agg_upd AFTER UPDATE ON ratings
+    REFERENCING NEW TABLE AS changed FOR EACH STATEMENT EXECUTE FUNCTION agg_mark_dirty();
+CREATE OR REPLACE TRIGGER trg_ratings_agg_del AFTER DELETE ON ratings
+    REFERENCING OLD TABLE AS changed FOR EACH STATEMENT EXECUTE FUNCTION agg_mark_dirty();
+
+-- Recalcula los resúmenes en una sola transacción: los lectores ven la versión
+-- anterior hasta el commit, nunca una tabla vacía.
+--   incremental = true  -> consume agg_dirty y rehace solo sus (género, año)
+--   incremental = false -> rehace todo; `which` ('genre_year' | 'top_rated')
+--                          limita a un resumen para correrlos en paralelo
+-- Devuelve las filas escritas.
+CREATE OR REPLACE FUNCTION agg_refresh(incremental boolean, which text DEFAULT NULL) RETURNS bigint
+LANGUAGE plpgsql SET search_path FROM CURRENT AS $$
+DECLARE
+    AGG_TOP_N     CONSTANT integer := 50;
+    AGG_MIN_VOTES CONSTANT integer := 100;
+    n bigint := 0;
+    m bigint;
+BEGIN
+    CREATE TEMP TABLE IF NOT EXISTS agg_groups (genre varchar(64), startYear smallint) ON COMMIT DROP;
+    TRUNCATE agg_groups;
+    IF incremental THEN
+        WITH taken AS (DELETE FROM agg_dirty RETURNING tconst)
+        INSERT INTO agg_groups
+        SELECT DISTINCT g.genre, COALESCE(t.startYear, 0)
+        FROM taken d
+        JOIN basics_genres g ON g.tconst = d.tconst
+        JOIN title_basics t ON t.tconst = d.tconst;
+        ANALYZE agg_groups;
+    ELSIF which IS NULL THEN
+        DELETE FROM agg_dirty;
+    END IF;
+
+    IF which IS NULL OR which = 'genre_year' THEN
+        IF incremental THEN
+            DELETE FROM agg_genre_year a USING agg_groups x
+            WHERE a.genre = x.genre AND a.startYear = x.startYear;
+        ELSE
+            DELETE FROM agg_genre_year;
+        END IF;
+        INSERT INTO agg_genre_year (genre, startYear, titles, rated, votes, ratingSum, weightedSum)
+        SELECT g.genre, COALESCE(t.startYear, 0), count(*), count(r.tconst), COALESCE(sum(r.numVotes), 0),
+               COALESCE(sum(r.averageRating), 0), COALESCE(sum(r.averageRating * r.numVotes), 0)
+        FROM basics_genres g
+        JOIN title_basics t ON t.tconst = g.tconst
+        LEFT JOIN ratings r ON r.tconst = g.tconst
+        WHERE NOT incremental
+           OR (g.genre, COALESCE(t.startYear, 0)) IN (SELECT genre, startYear FROM agg_groups)
+        GROUP BY 1, 2;
+        GET DIAGNOSTICS m = ROW_COUNT;
+        n := n + m;
+    END IF;
+
+    IF which IS NULL OR which = 'top_rated' THEN
+        IF incremental THEN
+            DELETE FROM agg_top_rated a USING agg_groups x
+            WHERE a.genre = x.genre AND a.startYear = x.startYear;
+        ELSE
+            DELETE FROM agg_top_rated;
+        END IF;
+        INSERT INTO agg_top_rated (genre, startYear, pos, tconst, primaryTitle, averageRating, numVotes)
+        SELECT genre, startYear, pos, tconst, primaryTitle, averageRating, numVotes
+        FROM (
+            SELECT g.genre, COALESCE(t.startYear, 0) AS startYear, g.tconst, t.primaryTitle,
+                   r.averageRating, r.numVotes,
+                   row_number() OVER (PARTITION BY g.genre, COALESCE(t.startYear, 0)
+                                      ORDER BY r.averageRating DESC, r.numVotes DESC, g.tconst) AS pos
+            FROM ratings r
+            JOIN basics_genres g ON g.tconst = r.tconst
+            JOIN title_basics t ON t.tconst = r.tconst
+            WHERE r.numVotes >= AGG_MIN_VOTES
+              AND (NOT incremental
+                   OR (g.genre, COALESCE(t.startYear, 0)) IN (SELECT genre, startYear FROM agg_groups))
+        ) ranked
+        WHERE pos <= AGG_TOP_N;
+        GET DIAGNOSTICS m = ROW_COUNT;
+        n := n + m;
+    END IF;
+    RETURN n;
+END $$;
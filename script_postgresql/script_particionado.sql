@@ -0,0 +1,93 @@
+-- ====================================================================
+-- VARIANTE PARTICIONADA: AKAS (+ TYPES/ATTRIBUTES) Y PRINCIPALS
+-- ====================================================================
+-- Opcional. Correr DESPUÉS de script.sql (y correcciones.sql) con esas tablas
+-- vacías: las borra y las vuelve a crear así:
+--   * ids enteros: tconst/titleId/nconst guardan solo la parte numérica
+--     (tt0000001 -> 1, nm0000123 -> 123). 4 bytes en vez de un varchar de
+--     10+ bytes en cada fila y en cada índice.
+--   * particionadas por rango del id del título (bloques de 2.000.000). Los
+--     títulos nuevos caen en las últimas particiones: las viejas casi no cambian,
+--     así VACUUM, los índices y los incrementales de pgBackRest (que copian por
+--     archivo) se quedan en las particiones que sí se tocaron.
+--   * sin FK hacia title_basics/name_basics (los tipos ya no coinciden): las
+--     huérfanas las filtra carga_masiva, igual que con las FKs originales.
+-- carga_masiva y la API leen este esquema con IMDB_LAYOUT=partitioned.
+SET search_path TO imdb;
+
+-- Conversión entre el id de IMDb y su número. IMMUTABLE: con una constante el
+-- planner la resuelve antes de planear y usa los índices. Solo la forma canónica
+-- (prefijo + al menos 7 dígitos, sin ceros de más) tiene número.
+CREATE OR REPLACE FUNCTION imdb_num(id text) RETURNS integer
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT CASE WHEN id ~ '^[a-z]{2}([0-9]{7}|[1-9][0-9]{7,8})$' THEN substr(id, 3)::integer END
+$$;
+
+CREATE OR REPLACE FUNCTION imdb_id(prefix text, num integer) RETURNS text
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT prefix || CASE WHEN num < 10000000 THEN lpad(num::text, 7, '0') ELSE num::text END
+$$;
+
+DROP TABLE IF EXISTS aka_types, aka_attributes, akas, principals CASCADE;
+
+CREATE TABLE akas (
+    titleId         integer       NOT NULL,
+    ordering        integer       NOT NULL,
+    title           text          NOT NULL,
+    region          varchar(64)   NULL,
+    isOriginalTitle boolean       NOT NULL,
+    title_tsv       tsvector      GENERATED ALWAYS AS (to_tsvector('simple', title)) STORED,
+    PRIMARY KEY (titleId, ordering)
+) PARTITION BY RANGE (titleId);
+
+CREATE TABLE aka_types (
+    titleId  integer NOT NULL,
+    ordering integer NOT NULL,
+    type     text    NOT NULL,
+    PRIMARY KEY (titleId, ordering, type),
+    FOREIGN KEY (titleId, ordering) REFERENCES akas(titleId, ordering)
+) PARTITION BY RANGE (titleId);
+
+CREATE TABLE aka_attributes (
+    titleId   integer NOT NULL,
+    ordering  integer NOT NULL,
+    attribute text    NOT NULL,
+    PRIMARY KEY (titleId, ordering, attribute),
+    FOREIGN KEY (titleId, ordering) REFERENCES akas(titleId, ordering)
+) PARTITION BY RANGE (titleId);
+
+CREATE TABLE principals (
+    tconst     integer      NOT NULL,
+    ordering   integer      NOT NULL,
+    nconst     integer      NOT NULL,
+    category   varchar(64)  NOT NULL,
+    job        varchar(512) NULL,
+    characters text         NULL,
+    PRIMARY KEY (tconst, ordering)
+) PARTITION BY RANGE (tconst);
+
+-- <tabla>_p00 .. <tabla>_p19 cubren tt0000000 a tt39999999; lo que pase de ahí
+-- cae en <tabla>_pdef hasta que se agreguen particiones.
+DO $$
+DECLARE
+    step  CONSTANT integer := 2000000;
+    parts CONSTANT integer := 20;
+    t text;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['akas', 'aka_types', 'aka_attributes', 'principals'] LOOP
+        FOR i IN 0 .. parts - 1 LOOP
+            EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%s) TO (%s)',
+                           t || '_p' || lpad(i::text, 2, '0'), t, i * step, (i + 1) * step);
+        END LOOP;
+        EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I DEFAULT', t || '_pdef', t);
+    END LOOP;
+END $$;
+
+-- idx_aka_titleId, idx_types_titleId, idx_attrs_titleId e idx_pr_tconst no hacen
+-- falta: la PK ya empieza por esa columna.
+-- (nconst, tconst, ordering): paginación por llave de /names/{nconst}/filmography
+CREATE INDEX IF NOT EXISTS idx_pr_nconst_seek  ON principals(nconst, tconst, ordering);
+
+-- BÚSQUEDA (GET /search), igual que en script.sql
+CREATE INDEX IF NOT EXISTS idx_search_aka_doc  ON akas USING gin (title_tsv);
+CREATE INDEX IF NOT EXISTS idx_search_aka_knn  ON akas USING gist (lower(title) gist_trgm_ops);